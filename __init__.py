@@ -1,4 +1 @@
-# ai_model/__init__.py
-from .model_loader import ModelLoader
-from .fine_tune import FineTuner
-from .backend.ai_model.integrations_manager import AIAssistant
+# This file is intentionally left blank to mark the directory as a package.
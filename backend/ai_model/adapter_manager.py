@@ -0,0 +1,177 @@
+# ai_model/adapter_manager.py
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from ai_model.inference_engine import find_inference_engine
+from ai_model.model_loader import ModelLoader
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/adapter_manager.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+ADAPTER_CACHE_SIZE = int(os.getenv('ADAPTER_CACHE_SIZE', '64'))
+USER_MODEL_DIR = os.getenv('USER_MODEL_DIR', './models')
+
+# peft's name for "no adapter" in a mixed-adapter batch
+BASE_ADAPTER = '__base__'
+# Zero-initialized adapter that stays active, so calls without adapter_names behave like the base model
+PLACEHOLDER_ADAPTER = 'base'
+
+
+def adapter_path(user_id):
+    return os.path.join(USER_MODEL_DIR, f'user_{user_id}')
+
+
+def has_adapter(user_id):
+    """Whether FineTuner saved a LoRA adapter (rather than a full model) for the user."""
+    return os.path.exists(os.path.join(adapter_path(user_id), 'adapter_config.json'))
+
+
+def adapter_version(user_id):
+    """Changes whenever the user's adapter is retrained: the newest modification time of its files."""
+    path = adapter_path(user_id)
+    try:
+        return max(entry.stat().st_mtime_ns for entry in os.scandir(path) if entry.is_file())
+    except (OSError, ValueError):
+        return 0
+
+
+class AdapterManager:
+    """
+    Serves every user's LoRA adapter from one shared base model.
+
+    The base model is wrapped in a PeftModel once; user adapters (a few MB each at r=8)
+    are loaded into it on first use and unloaded least recently used first beyond
+    max_adapters, skipping adapters in use. Requests name their adapter per row through
+    peft's adapter_names, so one batch can mix users with different adapters and users
+    without one, and nothing is ever swapped globally. get_peft_model injects LoRA layers
+    into the model it wraps, so the manager works on its own copy of the base model rather
+    than the instance ModelLoader shares between assistants.
+
+    Each trained version of an adapter is loaded under its own name, so a retrain never
+    changes the weights behind a name: requests already running finish on the old version,
+    and the engine's cached session prefixes (keyed by adapter name) are not reused across
+    versions. Superseded versions are unloaded as soon as their last lease ends. Loading
+    and unloading modify the shared model, so when an InferenceEngine serves it they run
+    on the engine's thread between decode steps.
+
+    Args:
+        base_model: A causal LM no one else uses; it is modified in place.
+        max_adapters (int): Most adapters kept loaded.
+    """
+
+    def __init__(self, base_model, max_adapters=ADAPTER_CACHE_SIZE):
+        from peft import LoraConfig, TaskType, get_peft_model
+
+        self.max_adapters = max_adapters
+        placeholder = LoraConfig(task_type=TaskType.CAUSAL_LM, inference_mode=True, r=8, lora_alpha=32, lora_dropout=0.0)
+        self.model = get_peft_model(base_model, placeholder, adapter_name=PLACEHOLDER_ADAPTER)
+        self.model.eval()
+        self._loaded = OrderedDict()  # adapter name -> lease count, least recently used first
+        self._owners = {}  # adapter name -> user_id
+        self._stale = set()  # loaded names superseded by a newer version
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def adapter_name(user_id, version=0):
+        return f'user_{user_id}_v{version}'
+
+    def _apply(self, fn):
+        """Runs a change to the shared model where no forward pass can observe it half done."""
+        engine = find_inference_engine(self.model)
+        return engine.call(fn) if engine is not None else fn()
+
+    @contextmanager
+    def lease(self, user_id):
+        """
+        Yields the adapter name to generate with for user_id, loading it if needed.
+
+        Yields BASE_ADAPTER for users without a fine-tuned adapter. The adapter cannot be
+        evicted until the lease ends.
+        """
+        if not has_adapter(user_id):
+            yield BASE_ADAPTER
+            return
+        name = self.adapter_name(user_id, adapter_version(user_id))
+        with self._lock:
+            if name not in self._loaded:
+                self._apply(lambda: self.model.load_adapter(adapter_path(user_id), adapter_name=name, is_trainable=False))
+                self._loaded[name] = 0
+                self._owners[name] = user_id
+                logger.info(f"Loaded adapter {name} for user {user_id} ({len(self._loaded)} loaded).")
+                self._supersede(user_id, name)
+                self._evict()
+            self._loaded.move_to_end(name)
+            self._loaded[name] += 1
+        try:
+            yield name
+        finally:
+            with self._lock:
+                if name in self._loaded:
+                    self._loaded[name] -= 1
+                self._evict()
+
+    def _supersede(self, user_id, current):
+        for name, owner in self._owners.items():
+            if owner == user_id and name != current:
+                self._stale.add(name)
+
+    def _evict(self):
+        for name in [name for name in self._stale if not self._loaded.get(name)]:
+            self._unload(name)
+        for name in [name for name, leases in self._loaded.items() if not leases]:
+            if len(self._loaded) <= self.max_adapters:
+                break
+            self._unload(name)
+
+    def _unload(self, name):
+        del self._loaded[name]
+        del self._owners[name]
+        self._stale.discard(name)
+        try:
+            self._apply(lambda: self.model.delete_adapter(name))
+            logger.info(f"Unloaded adapter {name}.")
+        except Exception as e:
+            logger.error(f"Error unloading adapter {name}: {e}")
+
+    def reload(self, user_id):
+        """
+        Retires the user's loaded adapter after a retrain.
+
+        The next lease loads the new version. The old one is unloaded now if idle, or
+        when its last lease ends.
+        """
+        with self._lock:
+            self._supersede(user_id, self.adapter_name(user_id, adapter_version(user_id)))
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': len(self._loaded),
+                'max_adapters': self.max_adapters,
+                'in_use': sum(1 for leases in self._loaded.values() if leases),
+            }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_adapter_manager(create=True):
+    """The process-wide AdapterManager over its own base model copy; None if not created and create is False."""
+    global _manager
+    if _manager is None and create:
+        with _manager_lock:
+            if _manager is None:
+                # A private copy: wrapping the cached model would put LoRA layers under every
+                # assistant and engine using it
+                _, base_model = ModelLoader.load_base_model(fresh=True)
+                _manager = AdapterManager(base_model)
+    return _manager
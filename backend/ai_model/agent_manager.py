@@ -2,7 +2,7 @@ from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_community.vectorstores import DeepLake
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain.tools import BaseTool
 from langchain.agents import initialize_agent, Tool, AgentType
 from langchain.schema import (
@@ -13,9 +13,30 @@ from langchain.schema import (
 from pydantic import BaseModel, Field
 from .tools.agents import web_search_agent_tool,  execute_code_agent_tool
 from models import User
+from cortex.embeddings import get_embedding_engine
 from utils.database import db
 import os
 
+# max_seq_length from the model's sentence_bert_config.json, which HuggingFaceEmbeddings
+# (sentence-transformers) truncated at; the bare tokenizer would allow 512 tokens
+SENTENCE_TRANSFORMERS_MAX_SEQ_LENGTH = 256
+
+class SharedHuggingFaceEmbeddings(Embeddings):
+    """LangChain embeddings backed by the process-wide EmbeddingEngine."""
+
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", normalize_embeddings=True,
+                 max_seq_length=SENTENCE_TRANSFORMERS_MAX_SEQ_LENGTH):
+        self.engine = get_embedding_engine(model_name, max_seq_length)
+        self.normalize_embeddings = normalize_embeddings
+
+    def embed_documents(self, texts):
+        # LangChain's Embeddings interface expects plain lists
+        return self.engine.embed(list(texts), normalize=self.normalize_embeddings).tolist()
+
+    def embed_query(self, text):
+        return self.engine.embed([text], normalize=self.normalize_embeddings)[0].tolist()
+
+
 class AgentManager:
     def __init__(self, user_id):
         self.user = self.get_user(user_id)
@@ -25,11 +46,13 @@ class AgentManager:
         return User.query.get(user_id)
 
     def setup_agent(self):
-        # Set up embeddings
-        self.embeddings = HuggingFaceEmbeddings(
+        # Set up embeddings on the shared model. The sentence-transformers pipeline for
+        # all-MiniLM-L6-v2 truncates at 256 tokens and ends in a Normalize layer; doing the
+        # same here keeps the vectors identical to what HuggingFaceEmbeddings produced for
+        # existing datasets.
+        self.embeddings = SharedHuggingFaceEmbeddings(
             model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': False}
+            normalize_embeddings=True
         )
 
         # Set up DeepLake
@@ -90,7 +113,7 @@ class AgentManager:
         
         return tools
 
-    def chat_with_model(self, user_input: str) -> str:
+    def build_messages(self, user_input: str):
         # Append user input to conversation history
         self.conversation_history.append(HumanMessage(content=user_input))
 
@@ -104,29 +127,56 @@ class AgentManager:
             system_prompt += f"\nUse the following context to help answer the user's question:\n{context}"
 
         # Prepare messages
-        messages = [SystemMessage(content=system_prompt)] + self.conversation_history
+        return [SystemMessage(content=system_prompt)] + self.conversation_history
+
+    def handle_tool_calls(self, response, messages):
+        for tool_call in response.tool_calls:
+            for tool in self.tools:
+                if tool.name == tool_call['name']:
+                    tool_output = tool.run(**tool_call['args'])
+                    tool_message = Tool(
+                        content=tool_output,
+                        tool_name=tool.name,
+                        tool_call_id=tool_call['id'],
+                    )
+                    self.conversation_history.append(tool_message)
+                    final_response = self.chat_model_with_tools(messages + [tool_message])
+                    self.conversation_history.append(final_response)
+                    return final_response.content
+
+    def chat_with_model(self, user_input: str) -> str:
+        messages = self.build_messages(user_input)
 
         # Send messages to chat model
         response = self.chat_model_with_tools(messages)
 
         # Handle tool calls if any
         if hasattr(response, 'tool_calls') and response.tool_calls:
-            for tool_call in response.tool_calls:
-                for tool in self.tools:
-                    if tool.name == tool_call['name']:
-                        tool_output = tool.run(**tool_call['args'])
-                        tool_message = Tool(
-                            content=tool_output,
-                            tool_name=tool.name,
-                            tool_call_id=tool_call['id'],
-                        )
-                        self.conversation_history.append(tool_message)
-                        final_response = self.chat_model_with_tools(messages + [tool_message])
-                        self.conversation_history.append(final_response)
-                        return final_response.content
+            return self.handle_tool_calls(response, messages)
         else:
             self.conversation_history.append(response)
             return response.content
 
+    def stream_chat_with_model(self, user_input: str):
+        """
+        Streaming counterpart of chat_with_model: yields text chunks as the chat model produces them.
+
+        If the model asks for a tool instead, the tool runs and the final answer is yielded whole.
+        """
+        messages = self.build_messages(user_input)
+        response = None
+        for chunk in self.chat_model_with_tools.stream(messages):
+            response = chunk if response is None else response + chunk
+            if isinstance(chunk.content, str) and chunk.content:
+                yield chunk.content
+        if response is None:
+            return
+        if getattr(response, 'tool_calls', None):
+            final_content = self.handle_tool_calls(response, messages)
+            if final_content:
+                yield final_content
+        else:
+            self.conversation_history.append(response)
+
 def get_agent_manager(user_id):
     return AgentManager(user_id)
\ No newline at end of file
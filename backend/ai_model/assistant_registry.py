@@ -0,0 +1,245 @@
+# ai_model/assistant_registry.py
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/assistant_registry.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+ASSISTANT_MAX_USERS = int(os.getenv('ASSISTANT_MAX_USERS', '32'))
+# Budget for memory held per user (fine-tuned weights); shared base models are not counted
+ASSISTANT_MEMORY_BUDGET_MB = float(os.getenv('ASSISTANT_MEMORY_BUDGET_MB', '8192'))
+ASSISTANT_IDLE_SECONDS = float(os.getenv('ASSISTANT_IDLE_SECONDS', '1800'))
+# How often each warm user's old memory turns are consolidated; 0 turns it off
+MEMORY_CONSOLIDATE_SECONDS = float(os.getenv('MEMORY_CONSOLIDATE_SECONDS', '3600'))
+
+
+class _Entry:
+    def __init__(self):
+        self.assistant = None
+        self.footprint = 0
+        self.last_used = time.monotonic()
+        self.consolidated_at = None
+        self.leases = 0
+        # Serializes construction and requests for one user; the assistant's context is not thread-safe
+        self.lock = threading.Lock()
+        # Set once an evicted entry's assistant has finished closing
+        self.closed = threading.Event()
+
+
+class AssistantRegistry:
+    """
+    Keeps warm per-user AIAssistant instances.
+
+    Building an assistant loads its model, Cortex stores and personalization state, so
+    instances are reused across requests. The base LM, embedding model and Whisper are
+    process-wide singletons shared by every assistant; what each user holds alone (a
+    fine-tuned model) counts against memory_budget_mb. Users are evicted least recently
+    used first when the budget or max_users is exceeded, and after idle_seconds without a
+    request. The sweeper also consolidates each warm user's memory every
+    consolidate_seconds, so the hot memory tier does not grow without bound. Assistants in
+    use by a request are never evicted, and a user's new assistant
+    is not built until their evicted one has finished closing, so the two never share the
+    user's memory journal and stores.
+
+    Args:
+        factory (Callable): Builds an assistant for a user id; defaults to AIAssistant.
+        max_users (int): Most assistants kept warm at once.
+        memory_budget_mb (float): Total per-user memory allowed across warm assistants.
+        idle_seconds (float): Evict users idle for longer than this.
+        consolidate_seconds (float): Interval between memory consolidations per user; 0 disables.
+    """
+
+    def __init__(self, factory=None, max_users=ASSISTANT_MAX_USERS, memory_budget_mb=ASSISTANT_MEMORY_BUDGET_MB,
+                 idle_seconds=ASSISTANT_IDLE_SECONDS, consolidate_seconds=MEMORY_CONSOLIDATE_SECONDS):
+        if factory is None:
+            from ai_model.integrations_manager import AIAssistant
+            factory = AIAssistant
+        self.factory = factory
+        self.max_users = max_users
+        self.memory_budget = memory_budget_mb * 2 ** 20
+        self.idle_seconds = idle_seconds
+        self.consolidate_seconds = consolidate_seconds
+        self._entries = OrderedDict()
+        # user_id -> entry evicted but still closing
+        self._closing = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = threading.Thread(target=self._sweep, name='assistant-registry-sweeper', daemon=True)
+        self._sweeper.start()
+
+    @contextmanager
+    def lease(self, user_id):
+        """
+        Yields the user's warm assistant, building it on first use.
+
+        Requests for the same user are serialized; different users run concurrently.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = self._entries[user_id] = _Entry()
+            self._entries.move_to_end(user_id)
+            entry.leases += 1
+            closing = self._closing.get(user_id)
+        try:
+            with entry.lock:
+                if entry.assistant is None:
+                    if closing is not None:
+                        closing.closed.wait()
+                    started = time.perf_counter()
+                    entry.assistant = self.factory(user_id)
+                    entry.footprint = self._footprint(entry.assistant)
+                    logger.info(
+                        f"Built assistant for user {user_id} in {time.perf_counter() - started:.1f}s "
+                        f"({entry.footprint / 2 ** 20:.0f} MiB private)."
+                    )
+                yield entry.assistant
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                entry.last_used = time.monotonic()
+                if entry.assistant is None and not entry.leases and self._entries.get(user_id) is entry:
+                    # Construction failed; let the next request retry from scratch
+                    del self._entries[user_id]
+            self._enforce_budget()
+
+    @staticmethod
+    def _footprint(assistant) -> int:
+        try:
+            return assistant.memory_footprint()
+        except Exception as e:
+            logger.warning(f"Could not measure assistant memory: {e}")
+            return 0
+
+    def _evictable(self):
+        # Least recently used first, skipping assistants in use or still being built
+        return [
+            (user_id, entry) for user_id, entry in self._entries.items()
+            if entry.leases == 0 and entry.assistant is not None
+        ]
+
+    def _enforce_budget(self):
+        evicted = []
+        with self._lock:
+            candidates = self._evictable()
+            total = sum(entry.footprint for entry in self._entries.values())
+            count = sum(1 for entry in self._entries.values() if entry.assistant is not None)
+            for user_id, entry in candidates:
+                if total <= self.memory_budget and count <= self.max_users:
+                    break
+                self._detach(user_id, entry)
+                total -= entry.footprint
+                count -= 1
+                evicted.append((user_id, entry, 'budget'))
+        self._close(evicted)
+
+    def _sweep(self):
+        while not self._stop.wait(max(min(self.idle_seconds / 4, 60.0), 1.0)):
+            self.evict_idle()
+            self.consolidate_due()
+
+    def consolidate_due(self):
+        """Consolidates the memory of every warm user not consolidated for consolidate_seconds."""
+        if self.consolidate_seconds <= 0:
+            return
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for user_id, entry in self._entries.items():
+                if entry.assistant is None or not hasattr(entry.assistant, 'consolidate_memory'):
+                    continue
+                if entry.consolidated_at is None or now - entry.consolidated_at >= self.consolidate_seconds:
+                    # Held like a lease so the assistant is not evicted and closed meanwhile
+                    entry.leases += 1
+                    due.append((user_id, entry))
+        for user_id, entry in due:
+            try:
+                result = entry.assistant.consolidate_memory()
+                logger.info(f"Consolidated memory for user {user_id}: {result}.")
+            except Exception as e:
+                logger.error(f"Error consolidating memory for user {user_id}: {e}")
+            finally:
+                with self._lock:
+                    entry.leases -= 1
+                    entry.consolidated_at = time.monotonic()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            evicted = [
+                (user_id, entry, 'idle') for user_id, entry in self._evictable()
+                if now - entry.last_used > self.idle_seconds
+            ]
+            for user_id, entry, _ in evicted:
+                self._detach(user_id, entry)
+        self._close(evicted)
+
+    def evict(self, user_id):
+        """Drops a user's assistant, e.g. after their model was fine-tuned again."""
+        with self._lock:
+            entry = self._entries.get(str(user_id))
+            if entry is None or entry.leases:
+                return False
+            self._detach(str(user_id), entry)
+        self._close([(str(user_id), entry, 'explicit')])
+        return True
+
+    def _detach(self, user_id, entry):
+        # Called with self._lock held; lease() waits on the entry until _close() is done
+        del self._entries[user_id]
+        self._closing[user_id] = entry
+
+    def _close(self, evicted):
+        for user_id, entry, reason in evicted:
+            try:
+                if hasattr(entry.assistant, 'close'):
+                    entry.assistant.close()
+            except Exception as e:
+                logger.error(f"Error closing assistant for user {user_id}: {e}")
+            finally:
+                with self._lock:
+                    if self._closing.get(user_id) is entry:
+                        del self._closing[user_id]
+                entry.closed.set()
+            logger.info(f"Evicted assistant for user {user_id} ({reason}).")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': sum(1 for entry in self._entries.values() if entry.assistant is not None),
+                'max_users': self.max_users,
+                'private_bytes': sum(entry.footprint for entry in self._entries.values()),
+                'memory_budget_bytes': int(self.memory_budget),
+                'in_use': sum(1 for entry in self._entries.values() if entry.leases),
+            }
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            evicted = [(user_id, entry, 'shutdown') for user_id, entry in self._entries.items() if entry.assistant is not None]
+            for user_id, entry, _ in evicted:
+                self._closing[user_id] = entry
+            self._entries.clear()
+        self._close(evicted)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_assistant_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AssistantRegistry()
+    return _registry
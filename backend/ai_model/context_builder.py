@@ -0,0 +1,96 @@
+# ai_model/context_builder.py
+import os
+from collections import OrderedDict
+
+# Most prompt tokens spent on system prompt, history, memories and the new input together
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '512'))
+CONTEXT_TOKEN_CACHE_SIZE = int(os.getenv('CONTEXT_TOKEN_CACHE_SIZE', '256'))
+ASSISTANT_SYSTEM_PROMPT = os.getenv('ASSISTANT_SYSTEM_PROMPT', '')
+
+
+class ContextBuilder:
+    """
+    Assembles prompt token ids within a fixed token budget.
+
+    Every piece (system prompt, a turn, a memory) is tokenized once and its ids are cached,
+    so a new turn only tokenizes the new user input and whatever was not seen before; the
+    budget is counted by adding piece lengths, never by re-encoding the whole prompt. The
+    budget is filled in priority order: the system prompt and the new input always, then
+    recent turns newest first (stopping at the first that does not fit, so history stays
+    contiguous), then memories by score. The prompt keeps the stable parts first (system
+    prompt, then turns) so consecutive prompts share a long token prefix.
+
+    Args:
+        tokenizer: Tokenizer of the model the prompt is for.
+        budget (int): Most tokens in the prompt.
+        system_prompt (str): Text placed before everything else.
+        cache_size (int): Most pieces whose token ids are kept.
+    """
+
+    def __init__(self, tokenizer, budget=CONTEXT_TOKEN_BUDGET, system_prompt=ASSISTANT_SYSTEM_PROMPT,
+                 cache_size=CONTEXT_TOKEN_CACHE_SIZE):
+        self.tokenizer = tokenizer
+        self.budget = budget
+        self.system_prompt = system_prompt
+        self.cache_size = cache_size
+        self._ids = OrderedDict()
+
+    def encode(self, text):
+        """Token ids of text, from the cache when it was tokenized before."""
+        ids = self._ids.get(text)
+        if ids is not None:
+            self._ids.move_to_end(text)
+            return ids
+        ids = self.tokenizer.encode(text, add_special_tokens=False)
+        self._ids[text] = ids
+        while len(self._ids) > self.cache_size:
+            self._ids.popitem(last=False)
+        return ids
+
+    @staticmethod
+    def format_turn(user_input, assistant_response):
+        return f"User: {user_input}\nAssistant: {assistant_response}\n"
+
+    def build(self, user_input, turns=(), memories=None):
+        """
+        Returns the prompt token ids for user_input.
+
+        Args:
+            user_input (str): The new message.
+            turns: Earlier (user, assistant) pairs, oldest first, or their pre-tokenized ids.
+            memories (dict): Retrieval results with 'text' and optionally 'score'.
+
+        Returns:
+            List[int]: Prompt token ids, at most budget long.
+        """
+        system_ids = self.encode(f"{self.system_prompt}\n") if self.system_prompt else []
+        input_ids = self.encode(f"User: {user_input}\nAssistant:")
+        remaining = self.budget - len(system_ids) - len(input_ids)
+        if remaining < 0:
+            # The input alone is over budget: keep its end, which holds the question and the cue
+            input_ids = input_ids[-max(self.budget - len(system_ids), 1):]
+            return system_ids + input_ids
+
+        turn_ids = []
+        for turn in reversed(list(turns)):
+            ids = turn if isinstance(turn, list) else self.encode(self.format_turn(*turn))
+            if len(ids) > remaining:
+                break
+            turn_ids.append(ids)
+            remaining -= len(ids)
+        turn_ids.reverse()
+
+        memory_ids = []
+        if memories and memories.get('text'):
+            scores = memories.get('score') or [0.0] * len(memories['text'])
+            for _, text in sorted(zip(scores, memories['text']), key=lambda item: item[0], reverse=True):
+                ids = self.encode(f"{text}\n")
+                if len(ids) <= remaining:
+                    memory_ids.append(ids)
+                    remaining -= len(ids)
+
+        prompt = list(system_ids)
+        for ids in turn_ids + memory_ids:
+            prompt.extend(ids)
+        prompt.extend(input_ids)
+        return prompt
@@ -1,16 +1,117 @@
 # ai_model/context_manager.py
+import json
+
+from ai_model.context_builder import ContextBuilder
+
+
+class Turn:
+    __slots__ = ('user', 'assistant', 'token_ids')
+
+    def __init__(self, user, assistant, token_ids=None):
+        self.user = user
+        self.assistant = assistant
+        self.token_ids = token_ids
+
+
 class ContextManager:
-    def __init__(self, max_history=5):
+    """
+    The last max_history turns of a conversation, in a fixed-size ring buffer.
+
+    When the buffer is full, a new turn overwrites the slot of the oldest one, so append
+    and eviction are O(1) and the history always holds max_history turns. With a tokenizer, each turn is tokenized once when it is added and
+    its ids are kept next to the text; token_ids() and input_tensor() then assemble the
+    history without re-tokenizing. to_dict()/from_dict() restore a session on another worker.
+    """
+
+    __slots__ = ('max_history', 'tokenizer', '_turns', '_start', '_size')
+
+    def __init__(self, max_history=5, tokenizer=None):
         self.max_history = max_history
-        self.history = []
+        self.tokenizer = tokenizer
+        self._turns = [None] * max_history
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
 
     def update_history(self, user_input, assistant_response):
-        self.history.append({"user": user_input, "assistant": assistant_response})
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
+        token_ids = None
+        if self.tokenizer is not None:
+            token_ids = self.tokenizer.encode(
+                ContextBuilder.format_turn(user_input, assistant_response), add_special_tokens=False
+            )
+        self._append(Turn(user_input, assistant_response, token_ids))
+
+    def _append(self, turn):
+        if not self.max_history:
+            return
+        if self._size == self.max_history:
+            # Full: overwrite the oldest turn
+            self._turns[self._start] = turn
+            self._start = (self._start + 1) % self.max_history
+            return
+        self._turns[(self._start + self._size) % self.max_history] = turn
+        self._size += 1
+
+    def turns(self):
+        """Turns, oldest first."""
+        for i in range(self._size):
+            yield self._turns[(self._start + i) % self.max_history]
+
+    @property
+    def history(self):
+        return [{"user": turn.user, "assistant": turn.assistant} for turn in self.turns()]
+
+    def clear(self):
+        self._turns = [None] * self.max_history
+        self._start = 0
+        self._size = 0
 
     def get_context(self):
-        context = ""
-        for turn in self.history:
-            context += f"User: {turn['user']}\nAssistant: {turn['assistant']}\n"
-        return context
+        return "".join(ContextBuilder.format_turn(turn.user, turn.assistant) for turn in self.turns())
+
+    def token_ids(self):
+        """Token ids of the whole history, from the ids stored with each turn."""
+        ids = []
+        for turn in self.turns():
+            ids.extend(self._turn_ids(turn))
+        return ids
+
+    def _turn_ids(self, turn):
+        if turn.token_ids is None:
+            # Restored without ids, or added before a tokenizer was set
+            turn.token_ids = self.tokenizer.encode(ContextBuilder.format_turn(turn.user, turn.assistant), add_special_tokens=False)
+        return turn.token_ids
+
+    def turn_token_ids(self):
+        """Per-turn token ids, oldest first, as accepted by ContextBuilder.build."""
+        return [self._turn_ids(turn) for turn in self.turns()]
+
+    def input_tensor(self, suffix_ids=None, device=None):
+        """History ids plus suffix_ids as a (1, n) LongTensor ready for the model."""
+        import torch
+        return torch.tensor([self.token_ids() + list(suffix_ids or [])], dtype=torch.long, device=device)
+
+    def to_dict(self):
+        return {
+            "max_history": self.max_history,
+            "turns": [
+                {"user": turn.user, "assistant": turn.assistant, "token_ids": turn.token_ids}
+                for turn in self.turns()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data, tokenizer=None):
+        manager = cls(data.get("max_history", 5), tokenizer)
+        for turn in data.get("turns", []):
+            manager._append(Turn(turn["user"], turn["assistant"], turn.get("token_ids")))
+        return manager
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, payload, tokenizer=None):
+        return cls.from_dict(json.loads(payload), tokenizer)
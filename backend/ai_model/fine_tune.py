@@ -5,6 +5,7 @@ from torch.utils.data import Dataset
 from transformers import Trainer, TrainingArguments
 from peft import get_peft_model, LoraConfig, TaskType
 from ai_model.model_loader import ModelLoader
+from ai_model.adapter_manager import get_adapter_manager
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -16,7 +17,9 @@ logger.addHandler(handler)
 class FineTuner:
     def __init__(self, user_id, base_model_name='EleutherAI/gpt-neo-1.3B'):
         self.user_id = user_id
-        self.tokenizer, self.model = ModelLoader.load_base_model(base_model_name)
+        # LoRA training needs the full-precision torch weights whatever the serving backend is,
+        # and its own copy: get_peft_model and train() modify the model in place
+        self.tokenizer, self.model = ModelLoader.load_base_model(base_model_name, backend='torch', fresh=True)
 
     def fine_tune(self, training_data):
         try:
@@ -55,6 +58,10 @@ class FineTuner:
             trainer.train()
             trainer.save_model(f'./models/user_{self.user_id}')
             logger.info(f"Model fine-tuned and saved for user {self.user_id}.")
+            adapters = get_adapter_manager(create=False)
+            if adapters is not None:
+                # Serve the new adapter from the next request on
+                adapters.reload(self.user_id)
         except Exception as e:
             logger.error(f"Error during fine-tuning: {e}")
             raise
@@ -0,0 +1,648 @@
+# ai_model/inference_engine.py
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import torch
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/inference_engine.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '8'))
+INFERENCE_BLOCK_SIZE = int(os.getenv('INFERENCE_BLOCK_SIZE', '16'))
+# Memory reserved for the paged KV cache pool, per model
+INFERENCE_KV_CACHE_MB = float(os.getenv('INFERENCE_KV_CACHE_MB', '1024'))
+# Sessions whose prompt KV blocks are kept for reuse by their next turn; freed LRU first under pressure
+INFERENCE_MAX_CACHED_SESSIONS = int(os.getenv('INFERENCE_MAX_CACHED_SESSIONS', '64'))
+
+
+class BlockAllocator:
+    """Free list over the fixed-size blocks of the KV cache pool."""
+
+    def __init__(self, num_blocks):
+        self.num_blocks = num_blocks
+        self._free = list(range(num_blocks - 1, -1, -1))
+
+    @property
+    def available(self):
+        return len(self._free)
+
+    def allocate(self):
+        return self._free.pop() if self._free else None
+
+    def release(self, blocks):
+        self._free.extend(reversed(blocks))
+
+
+class PagedKVCache:
+    """
+    Keys and values of every running sequence, stored in fixed-size blocks.
+
+    Each layer has one preallocated pool of shape (num_blocks, heads, block_size, head_dim).
+    A sequence owns a block table (its list of block indices), so memory is allocated one
+    block at a time as it grows and returned as soon as it finishes; no sequence reserves
+    space for its maximum length up front, and there is no fragmentation between requests.
+    """
+
+    def __init__(self, num_layers, num_heads, head_dim, block_size, num_blocks, dtype, device):
+        self.block_size = block_size
+        shape = (num_blocks, num_heads, block_size, head_dim)
+        self.keys = [torch.zeros(shape, dtype=dtype, device=device) for _ in range(num_layers)]
+        self.values = [torch.zeros(shape, dtype=dtype, device=device) for _ in range(num_layers)]
+        self.allocator = BlockAllocator(num_blocks)
+
+    @staticmethod
+    def block_bytes(num_layers, num_heads, head_dim, block_size, dtype):
+        return 2 * num_layers * num_heads * block_size * head_dim * torch.tensor([], dtype=dtype).element_size()
+
+    def blocks_for(self, length):
+        return math.ceil(length / self.block_size)
+
+    def write(self, block_table, start, layer_kv):
+        """Stores per-layer (key, value) tensors of shape (heads, n, head_dim) at positions start..start+n-1."""
+        n = layer_kv[0][0].shape[1]
+        position = start
+        while position < start + n:
+            block = block_table[position // self.block_size]
+            offset = position % self.block_size
+            count = min(self.block_size - offset, start + n - position)
+            source = slice(position - start, position - start + count)
+            for layer, (key, value) in enumerate(layer_kv):
+                self.keys[layer][block, :, offset:offset + count] = key[:, source]
+                self.values[layer][block, :, offset:offset + count] = value[:, source]
+            position += count
+
+    def gather(self, block_tables, lengths):
+        """
+        Assembles a left-padded legacy past_key_values for a batch of sequences.
+
+        Returns:
+            tuple: Per layer, (keys, values) of shape (batch, heads, max(lengths), head_dim).
+        """
+        max_length = max(lengths)
+        past = []
+        for layer in range(len(self.keys)):
+            pool_keys, pool_values = self.keys[layer], self.values[layer]
+            _, heads, _, head_dim = pool_keys.shape
+            keys = pool_keys.new_zeros((len(lengths), heads, max_length, head_dim))
+            values = pool_values.new_zeros((len(lengths), heads, max_length, head_dim))
+            for row, (table, length) in enumerate(zip(block_tables, lengths)):
+                blocks = torch.tensor(table[:self.blocks_for(length)], device=pool_keys.device)
+                # (blocks, heads, block_size, head_dim) -> (heads, blocks * block_size, head_dim)
+                seq_keys = pool_keys.index_select(0, blocks).transpose(0, 1).reshape(heads, -1, head_dim)
+                seq_values = pool_values.index_select(0, blocks).transpose(0, 1).reshape(heads, -1, head_dim)
+                keys[row, :, max_length - length:] = seq_keys[:, :length]
+                values[row, :, max_length - length:] = seq_values[:, :length]
+            past.append((keys, values))
+        return tuple(past)
+
+
+class GenerationRequest:
+    """
+    One queued generation. Iterate it to receive decoded text chunks as they are produced.
+
+    Cached positions always equal len(prompt_ids) + len(generated) - 1: the newest sampled
+    token is the next decode step's input.
+    """
+
+    def __init__(self, prompt_ids, max_new_tokens, temperature, top_p, top_k, eos_token_id, session_id=None,
+                 adapter_name=None):
+        self.prompt_ids = list(prompt_ids)
+        self.session_id = session_id
+        self.adapter_name = adapter_name
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.top_k = top_k
+        self.eos_token_id = eos_token_id
+        self.generated = []
+        self.block_table = []
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+        self.first_token_at = None
+        self.reused_tokens = 0
+        self._chunks = queue.Queue()
+        self._emitted_text = ''
+
+    @property
+    def cached_length(self):
+        return len(self.prompt_ids) + len(self.generated) - 1
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __iter__(self):
+        try:
+            while True:
+                chunk = self._chunks.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            # The consumer stopped early (e.g. the client disconnected)
+            self.cancel()
+
+
+class InferenceEngine:
+    """
+    Continuous (iteration-level) batching over one causal LM.
+
+    A scheduler thread owns the model. Every iteration it admits waiting requests while the
+    batch and the KV cache pool have room (prefilling each new prompt), then runs a single
+    decode step for all running sequences together over one left-padded batch cache: the
+    model produces one token per sequence, appends its keys/values to that cache, and only
+    the new position is copied into each sequence's blocks. The batch cache is carried from
+    step to step and is only rebuilt from the paged pool when sequences join. Finished
+    sequences leave the batch immediately and new ones join on the next step, so a long
+    reply never holds up short ones. When the pool runs out, the most recently admitted
+    sequence is preempted: its blocks are freed and it is re-queued to be recomputed.
+
+    Requests that carry a session_id keep their blocks after finishing. The session's next
+    prompt reuses the cached keys/values of its longest common token prefix (the system
+    prompt and earlier turns) and only the new suffix is prefilled, so prefill cost follows
+    the size of the new turn rather than the length of the conversation. Cached sessions
+    are freed least recently used first when the pool runs short.
+
+    Reuse only happens when consecutive prompts actually share their beginning. Anything
+    that changes the start of the prompt (an edited system prompt, or history that slides
+    by one turn per request once ContextManager's buffer is full or ContextBuilder's token
+    budget trims it) leaves only the part before the change in common, and the rest of the
+    prompt is prefilled again.
+
+    With a PeftModel from AdapterManager, each request may name a LoRA adapter; the
+    names are passed per row as adapter_names, so one decode step serves users with
+    different adapters together. Changes to the model itself (loading or unloading an
+    adapter) go through call(), which runs them on the scheduler thread between steps.
+
+    Args:
+        model: A Hugging Face causal LM.
+        tokenizer: Its tokenizer, used to stream decoded text.
+        max_batch_size (int): Most sequences decoded together.
+        block_size (int): Tokens per KV cache block.
+        kv_cache_mb (float): Size of the KV cache pool.
+        max_cached_sessions (int): Most sessions whose prefix blocks are kept.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 block_size=INFERENCE_BLOCK_SIZE, kv_cache_mb=INFERENCE_KV_CACHE_MB,
+                 max_cached_sessions=INFERENCE_MAX_CACHED_SESSIONS):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.block_size = block_size
+        self.kv_cache_mb = kv_cache_mb
+        self.max_cached_sessions = max_cached_sessions
+        self.max_positions = getattr(model.config, 'max_position_embeddings', 2048)
+        self.cache = None
+        self._waiting = deque()
+        self._running = []
+        # (requests, cached lengths, past_key_values, attention mask) of the last decode step
+        self._batch = None
+        # session_id -> (token ids whose KV is cached, block table, adapter name), least recently used first
+        self._sessions = OrderedDict()
+        # (callable, Future) pairs run on the scheduler thread between steps
+        self._commands = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name='inference-engine', daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt_ids, max_new_tokens=256, temperature=0.7, top_p=0.95, top_k=50, session_id=None,
+               adapter_name=None):
+        """
+        Queues a prompt and returns a GenerationRequest that streams its text.
+
+        Pass a session_id to reuse the KV cache of the session's previous prompt prefix, and
+        an adapter_name to generate with one of the model's loaded LoRA adapters.
+        """
+        # Keep the newest context when the prompt and reply would not fit the position embeddings
+        budget = max(self.max_positions - max_new_tokens, 1)
+        request = GenerationRequest(
+            list(prompt_ids)[-budget:], max_new_tokens, temperature, top_p, top_k, self.tokenizer.eos_token_id,
+            session_id, adapter_name
+        )
+        with self._cond:
+            self._waiting.append(request)
+            self._cond.notify()
+        return request
+
+    def generate_stream(self, prompt_ids, **sampling):
+        return iter(self.submit(prompt_ids, **sampling))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'waiting': len(self._waiting),
+                'running': len(self._running),
+                'free_blocks': self.cache.allocator.available if self.cache is not None else None,
+                'total_blocks': self.cache.allocator.num_blocks if self.cache is not None else None,
+                'cached_sessions': len(self._sessions),
+            }
+
+    def drop_session(self, session_id):
+        """Frees the cached prefix of a session that has ended."""
+        with self._cond:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self.cache.allocator.release(entry[1])
+
+    def call(self, fn):
+        """
+        Runs fn on the scheduler thread between two steps and returns its result.
+
+        Use it for anything that modifies the model, so no forward pass sees it half done.
+        """
+        if threading.current_thread() is self._thread:
+            return fn()
+        future = Future()
+        with self._cond:
+            stopped = self._stop
+            if not stopped:
+                self._commands.append((fn, future))
+                self._cond.notify()
+        if stopped:
+            # Once the thread has exited nothing else runs the model
+            self._thread.join()
+            return fn()
+        return future.result()
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join()
+
+    # Scheduler
+
+    def _loop(self):
+        with torch.inference_mode():
+            while True:
+                with self._cond:
+                    while not self._stop and not self._waiting and not self._running and not self._commands:
+                        self._cond.wait()
+                    if self._stop:
+                        break
+                self._run_commands()
+                try:
+                    self._admit()
+                    if self._running:
+                        self._decode_step()
+                except Exception as e:
+                    logger.error(f"Inference step failed: {e}")
+                    for request in self._running:
+                        self._finish(request, error=e)
+                    self._running = []
+                    self._batch = None
+                # Under gevent's monkey-patching this thread is a greenlet; yield so request
+                # handlers and streaming consumers run between steps
+                time.sleep(0)
+        for request in list(self._waiting) + self._running:
+            self._finish(request, error=RuntimeError("Inference engine stopped"))
+        self._run_commands()
+
+    def _run_commands(self):
+        with self._cond:
+            commands, self._commands = self._commands, deque()
+        for fn, future in commands:
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+
+    def _admit(self):
+        while len(self._running) < self.max_batch_size:
+            with self._cond:
+                if not self._waiting:
+                    return
+                request = self._waiting[0]
+                ids = request.prompt_ids + request.generated
+                if not request.cancelled and self.cache is not None and not self._make_room(request, len(ids)):
+                    return
+                self._waiting.popleft()
+            if request.cancelled:
+                self._finish(request)
+                continue
+            try:
+                self._prefill(request, ids)
+            except Exception as e:
+                # Fail only this prompt (e.g. too long for the model); the running batch carries on
+                logger.error(f"Prefill failed: {e}")
+                self._finish(request, error=e)
+
+    def _make_room(self, request, length):
+        needed = self.cache.blocks_for(length + 1)
+        if needed > self.cache.allocator.num_blocks:
+            return True  # Never fits; admitted so _prefill can fail it instead of blocking the queue
+        own = self._sessions[request.session_id][1] if request.session_id in self._sessions else []
+        while self.cache.allocator.available + len(own) < needed and self._evict_session(keep=request.session_id):
+            pass
+        return self.cache.allocator.available + len(own) >= needed
+
+    def _evict_session(self, keep=None):
+        with self._cond:
+            for session_id in self._sessions:
+                if session_id != keep:
+                    table = self._sessions.pop(session_id)[1]
+                    self.cache.allocator.release(table)
+                    return True
+        return False
+
+    def _claim_prefix(self, request, ids):
+        """Takes the session's cached blocks covering the longest common prefix with ids."""
+        with self._cond:
+            entry = self._sessions.pop(request.session_id, None) if request.session_id is not None else None
+        if entry is None or self.cache is None:
+            return 0, []
+        cached_ids, table, adapter_name = entry
+        if adapter_name != request.adapter_name:
+            # Keys/values computed under another adapter are not reusable; AdapterManager names
+            # each trained version of an adapter differently, so this also covers a retrain
+            self.cache.allocator.release(table)
+            return 0, []
+        # At least one token is always prefilled so the model produces next-token logits
+        limit = min(len(cached_ids), len(ids) - 1)
+        common = 0
+        while common < limit and cached_ids[common] == ids[common]:
+            common += 1
+        keep = self.cache.blocks_for(common)
+        self.cache.allocator.release(table[keep:])
+        return common, table[:keep]
+
+    def _store_session(self, request):
+        length = max(request.cached_length, 0)
+        keep = self.cache.blocks_for(length)
+        self.cache.allocator.release(request.block_table[keep:])
+        with self._cond:
+            previous = self._sessions.pop(request.session_id, None)
+            if previous is not None:
+                self.cache.allocator.release(previous[1])
+            self._sessions[request.session_id] = (
+                (request.prompt_ids + request.generated)[:length], request.block_table[:keep], request.adapter_name
+            )
+            while len(self._sessions) > self.max_cached_sessions:
+                _, (_, table, _) = self._sessions.popitem(last=False)
+                self.cache.allocator.release(table)
+
+    def _prefill(self, request, ids):
+        prefix_length, block_table = self._claim_prefix(request, ids)
+        # Owned by the request from here on, so _finish releases the blocks if prefill fails
+        request.block_table = block_table
+        device = self.model.device
+        kwargs = self._adapter_kwargs([request])
+        if prefix_length:
+            # Only the suffix is run through the model, attending over the session's cached prefix
+            kwargs.update(
+                past_key_values=self._to_cache(self.cache.gather([block_table], [prefix_length])),
+                attention_mask=torch.ones((1, len(ids)), dtype=torch.long, device=device),
+                position_ids=torch.arange(prefix_length, len(ids), device=device).unsqueeze(0),
+            )
+        outputs = self.model(input_ids=torch.tensor([ids[prefix_length:]], device=device), use_cache=True, **kwargs)
+        layer_kv = self._legacy(outputs.past_key_values)
+        if self.cache is None:
+            self._create_cache(layer_kv)
+        needed = self.cache.blocks_for(len(ids)) - len(block_table)
+        if needed > self.cache.allocator.available:
+            self._finish(request, error=RuntimeError("Prompt does not fit in the KV cache"))
+            return
+        request.block_table = block_table + [self.cache.allocator.allocate() for _ in range(needed)]
+        request.reused_tokens = prefix_length
+        suffix_length = len(ids) - prefix_length
+        self.cache.write(
+            request.block_table, prefix_length,
+            [(key[0, :, -suffix_length:], value[0, :, -suffix_length:]) for key, value in layer_kv]
+        )
+        self._append_token(request, outputs.logits[0, -1])
+        if not self._finished(request):
+            self._running.append(request)
+
+    def _create_cache(self, layer_kv):
+        key = layer_kv[0][0]
+        num_layers, num_heads, head_dim = len(layer_kv), key.shape[1], key.shape[3]
+        block_bytes = PagedKVCache.block_bytes(num_layers, num_heads, head_dim, self.block_size, key.dtype)
+        num_blocks = max(int(self.kv_cache_mb * 2 ** 20 // block_bytes), 1)
+        self.cache = PagedKVCache(num_layers, num_heads, head_dim, self.block_size, num_blocks, key.dtype, key.device)
+        logger.info(
+            f"KV cache pool: {num_blocks} blocks of {self.block_size} tokens "
+            f"({num_blocks * self.block_size} tokens, {num_blocks * block_bytes / 2 ** 20:.0f} MiB)."
+        )
+
+    def _reserve_decode_blocks(self):
+        # Every running sequence needs a slot for the token it is about to cache
+        for request in list(self._running):
+            if request not in self._running:
+                continue
+            position = request.cached_length
+            while position // self.block_size >= len(request.block_table):
+                block = self.cache.allocator.allocate()
+                if block is None and self._evict_session():
+                    continue
+                if block is None:
+                    victim = self._running[-1]
+                    self._preempt(victim)
+                    if victim is request:
+                        break
+                    continue
+                request.block_table.append(block)
+
+    def _preempt(self, request):
+        self._running.remove(request)
+        self.cache.allocator.release(request.block_table)
+        request.block_table = []
+        with self._cond:
+            # Recomputed from prompt + generated tokens when blocks free up
+            self._waiting.appendleft(request)
+        logger.info(f"Preempted a sequence at {request.cached_length} cached tokens; KV cache is full.")
+
+    def _decode_step(self):
+        for request in [request for request in self._running if request.cancelled]:
+            self._running.remove(request)
+            self._finish(request)
+        self._reserve_decode_blocks()
+        if not self._running:
+            return
+        batch = list(self._running)
+        lengths = [request.cached_length for request in batch]
+        device = self.model.device
+        input_ids = torch.tensor([[request.generated[-1]] for request in batch], device=device)
+        position_ids = torch.tensor([[length] for length in lengths], device=device)
+        past, attention_mask = self._batch_cache(batch, lengths)
+        attention_mask = torch.cat(
+            [attention_mask, torch.ones((len(batch), 1), dtype=attention_mask.dtype, device=device)], dim=1
+        )
+        outputs = self.model(
+            input_ids=input_ids,
+            past_key_values=past,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            use_cache=True,
+            **self._adapter_kwargs(batch)
+        )
+        layer_kv = self._legacy(outputs.past_key_values)
+        # Keep the model's cache for the next step; the pool only receives the new position
+        self._batch = (batch, [length + 1 for length in lengths], outputs.past_key_values, attention_mask)
+        for row, request in enumerate(batch):
+            self.cache.write(
+                request.block_table, lengths[row],
+                [(key[row, :, -1:], value[row, :, -1:]) for key, value in layer_kv]
+            )
+            self._append_token(request, outputs.logits[row, -1])
+        self._running = [request for request in self._running if not self._finished(request)]
+        if not self._running:
+            self._batch = None
+
+    def _batch_cache(self, batch, lengths):
+        """
+        The past keys/values and attention mask for decoding batch.
+
+        The cache the model returned for the previous step is reused as is while the batch
+        is unchanged; when sequences only left, their rows are dropped (and any left padding
+        no row needs any more). Only a batch with new or recomputed sequences is gathered
+        from the paged pool, so steady-state decoding never copies the whole history out.
+        """
+        device = self.model.device
+        if self._batch is not None:
+            rows, row_lengths, past, mask = self._batch
+            positions = {id(request): row for row, request in enumerate(rows)}
+            index = [positions.get(id(request)) for request in batch]
+            if None not in index and all(row_lengths[row] == length for row, length in zip(index, lengths)):
+                if index == list(range(len(rows))):
+                    return past, mask
+                select = torch.tensor(index, device=device)
+                pad = mask.shape[1] - max(lengths)
+                layer_kv = tuple(
+                    (key.index_select(0, select)[:, :, pad:], value.index_select(0, select)[:, :, pad:])
+                    for key, value in self._legacy(past)
+                )
+                return self._to_cache(layer_kv), mask.index_select(0, select)[:, pad:]
+        max_length = max(lengths)
+        mask = torch.zeros((len(batch), max_length), dtype=torch.long, device=device)
+        for row, length in enumerate(lengths):
+            mask[row, max_length - length:] = 1
+        past = self._to_cache(self.cache.gather([request.block_table for request in batch], lengths))
+        return past, mask
+
+    # Helpers
+
+    def _adapter_kwargs(self, requests):
+        if not hasattr(self.model, 'peft_config'):
+            return {}
+        return {'adapter_names': [request.adapter_name or '__base__' for request in requests]}
+
+    @staticmethod
+    def _legacy(past_key_values):
+        if hasattr(past_key_values, 'to_legacy_cache'):
+            return past_key_values.to_legacy_cache()
+        return past_key_values
+
+    @staticmethod
+    def _to_cache(legacy):
+        try:
+            from transformers import DynamicCache
+            return DynamicCache.from_legacy_cache(legacy)
+        except ImportError:
+            return legacy
+
+    def _append_token(self, request, logits):
+        token = sample_token(logits, request.temperature, request.top_p, request.top_k)
+        request.generated.append(token)
+        if request.first_token_at is None:
+            request.first_token_at = time.perf_counter()
+        if token != request.eos_token_id:
+            self._emit(request)
+
+    def _emit(self, request, final=False):
+        text = self.tokenizer.decode(request.generated, skip_special_tokens=True)
+        # Hold back an incomplete multi-byte character until the next token completes it
+        if text.endswith('\ufffd') and not final:
+            return
+        chunk = text[len(request._emitted_text):]
+        if chunk:
+            request._emitted_text = text
+            request._chunks.put(chunk)
+
+    def _finished(self, request):
+        done = (
+            request.cancelled
+            or request.generated[-1] == request.eos_token_id
+            or len(request.generated) >= request.max_new_tokens
+            or request.cached_length + 1 >= self.max_positions
+        )
+        if done:
+            self._finish(request)
+        return done
+
+    def _finish(self, request, error=None):
+        if request.block_table and self.cache is not None:
+            if request.session_id is not None and error is None:
+                self._store_session(request)
+            else:
+                self.cache.allocator.release(request.block_table)
+            request.block_table = []
+        if error is not None:
+            request._chunks.put(error)
+        elif request.generated and not request.cancelled:
+            self._emit(request, final=True)
+        request._chunks.put(None)
+        if request.first_token_at is not None:
+            logger.debug(
+                f"Request finished: {len(request.generated)} tokens, {request.reused_tokens} of "
+                f"{len(request.prompt_ids)} prompt tokens reused, first token after {request.first_token_at - request.submitted_at:.2f}s."
+            )
+        return True
+
+
+def sample_token(logits, temperature=0.7, top_p=0.95, top_k=50):
+    if not temperature or temperature <= 0:
+        return int(torch.argmax(logits))
+    logits = logits.float() / temperature
+    if top_k and top_k > 0:
+        top_k = min(top_k, logits.shape[-1])
+        threshold = torch.topk(logits, top_k).values[-1]
+        logits = logits.masked_fill(logits < threshold, float('-inf'))
+    if top_p and top_p < 1.0:
+        sorted_logits, sorted_indices = torch.sort(logits, descending=True)
+        cumulative = torch.softmax(sorted_logits, dim=-1).cumsum(dim=-1)
+        # Drop tokens once the mass before them already exceeds top_p; always keep the best one
+        remove = cumulative - torch.softmax(sorted_logits, dim=-1) > top_p
+        logits[sorted_indices[remove]] = float('-inf')
+    return int(torch.multinomial(torch.softmax(logits, dim=-1), 1))
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_inference_engine(model, tokenizer):
+    """Returns the process-wide engine serving model, creating it on first use."""
+    key = id(model)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None or engine.model is not model:
+            engine = _engines[key] = InferenceEngine(model, tokenizer)
+        return engine
+
+
+def find_inference_engine(model):
+    """The engine serving model, or None if none has been created."""
+    with _engines_lock:
+        engine = _engines.get(id(model))
+    return engine if engine is not None and engine.model is model else None
+
+
+def release_inference_engine(model):
+    """Stops the engine serving model, e.g. when a user's fine-tuned model is unloaded."""
+    with _engines_lock:
+        engine = _engines.pop(id(model), None)
+    if engine is not None:
+        engine.close()
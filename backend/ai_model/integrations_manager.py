@@ -1,9 +1,14 @@
 # ai_model/integration.py
 import logging
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from ai_model.model_loader import ModelLoader
+from contextlib import nullcontext
+from threading import Thread
+from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
+from ai_model.model_loader import MODEL_BACKEND, ModelLoader
+from ai_model.adapter_manager import get_adapter_manager, has_adapter
 from ai_model.context_manager import ContextManager
+from ai_model.context_builder import ContextBuilder
+from ai_model.inference_engine import get_inference_engine, release_inference_engine
 from cortex.cortex import Cortex
 from personalization.behavior_model import BehaviorModel
 import os
@@ -22,27 +27,15 @@ logger.addHandler(handler)
 
 user_api_key = os.getenv("OPENAI_API_KEY")
 
+GENERATION_MAX_NEW_TOKENS = int(os.getenv('GENERATION_MAX_NEW_TOKENS', '256'))
+# Seconds the streamer waits for the next token before giving up on a stalled generate()
+GENERATION_STREAM_TIMEOUT = float(os.getenv('GENERATION_STREAM_TIMEOUT', '60'))
+# 'continuous' batches concurrent requests through the shared InferenceEngine; 'generate' runs model.generate per request
+GENERATION_ENGINE = os.getenv('GENERATION_ENGINE', 'continuous')
+# Serve fine-tuned LoRA adapters on the shared base model instead of loading a full model per user
+SERVE_ADAPTERS = os.getenv('SERVE_ADAPTERS', 'true').lower() == 'true'
 
 
-class ModelLoader:
-    _model_cache = {}
-
-    @staticmethod
-    def load_base_model(model_name='EleutherAI/gpt-neo-1.3B'):
-        if model_name in ModelLoader._model_cache:
-            logger.info(f"Model '{model_name}' loaded from cache.")
-            return ModelLoader._model_cache[model_name]
-
-        try:
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForCausalLM.from_pretrained(model_name)
-            ModelLoader._model_cache[model_name] = (tokenizer, model)
-            logger.info(f"Model '{model_name}' loaded successfully.")
-            return tokenizer, model
-        except Exception as e:
-            logger.error(f"Failed to load model '{model_name}': {e}")
-            raise
-
 
 
 class AIAssistant:
@@ -50,10 +43,15 @@ class AIAssistant:
         self.user_id = user_id
         self.tokenizer, self.model = self.load_user_model()
         self.cortex = Cortex(user_id)
-        self.context_manager = ContextManager()
+        self.context_manager = ContextManager(tokenizer=self.tokenizer)
+        self.context_builder = ContextBuilder(self.tokenizer)
         self.behavior_model = BehaviorModel(user_id)
 
     def load_user_model(self):
+        if SERVE_ADAPTERS and MODEL_BACKEND == 'torch' and has_adapter(self.user_id):
+            # The adapter is attached per request by AdapterManager
+            logger.info(f"Serving LoRA adapter for user {self.user_id} on the shared base model.")
+            return ModelLoader.load_base_model()
         try:
             model_path = f'./models/user_{self.user_id}'
             tokenizer = AutoTokenizer.from_pretrained(model_path)
@@ -65,6 +63,43 @@ class AIAssistant:
             # Fallback to base model
             return ModelLoader.load_base_model()
 
+    def _owns_model(self) -> bool:
+        return not any(self.model is model for _, model in ModelLoader._model_cache.values())
+
+    def memory_footprint(self) -> int:
+        """Bytes held by this assistant alone: its fine-tuned model, if it has one."""
+        if not self._owns_model():
+            return 0
+        return sum(tensor.numel() * tensor.element_size() for tensor in list(self.model.parameters()) + list(self.model.buffers()))
+
+    def consolidate_memory(self):
+        """Moves the user's old conversation turns to the warm and cold memory tiers."""
+        return self.cortex.consolidate_memory()
+
+    def close(self):
+        """Flushes the user's pending memory writes and releases background threads."""
+        self.cortex.close()
+        if self._owns_model():
+            release_inference_engine(self.model)
+        elif GENERATION_ENGINE == 'continuous' and isinstance(self.model, torch.nn.Module):
+            adapters = self._adapter_manager()
+            model = adapters.model if adapters is not None else self.model
+            get_inference_engine(model, self.tokenizer).drop_session(self.user_id)
+
+    def _adapter_manager(self):
+        """
+        The AdapterManager to generate through, or None to use self.model directly.
+
+        Users without an adapter join it once it exists, so their requests batch with
+        adapter users' on the same engine.
+        """
+        if not SERVE_ADAPTERS or MODEL_BACKEND != 'torch' or self._owns_model():
+            return None
+        return get_adapter_manager(create=has_adapter(self.user_id))
+
+    def handle_calendar_intent(self, user_input):
+        # No calendar integration is configured; None lets the model answer
+        return None
 
     def generate_response(self, user_input):
         # Check for calendar intents
@@ -80,33 +115,88 @@ class AIAssistant:
         self.context_manager.update_history(user_input, response)
         return response
 
-    def generate_ai_response(self, user_input):
+    def stream_response(self, user_input):
+        """
+        Streaming counterpart of generate_response: yields text chunks as they are decoded.
+
+        Preferences are applied to the complete response, which is what enters the history.
+        """
+        calendar_response = self.handle_calendar_intent(user_input)
+        if calendar_response:
+            chunks = [calendar_response]
+            yield calendar_response
+        else:
+            chunks = []
+            for chunk in self.stream_ai_response(user_input):
+                chunks.append(chunk)
+                yield chunk
+        response = self.behavior_model.apply_preferences("".join(chunks))
+        self.context_manager.update_history(user_input, response)
+
+    def build_prompt(self, user_input):
+        """Prompt token ids for user_input: history and relevant memories within CONTEXT_TOKEN_BUDGET."""
+        relevant_memories = self.cortex.retrieve_memory(user_input)
+        return self.context_builder.build(user_input, self.context_manager.turn_token_ids(), relevant_memories)
+
+    def stream_ai_response(self, user_input, max_new_tokens=GENERATION_MAX_NEW_TOKENS):
+        """
+        Yields the model's reply as it is generated.
+
+        With GENERATION_ENGINE=continuous the prompt is queued on the model's shared
+        InferenceEngine, which decodes it in the same batch as other users' requests and
+        only prefills what changed since the user's previous prompt. Users with a LoRA
+        adapter generate through the shared base model with their adapter attached.
+        Otherwise generate() runs on a worker thread and feeds a TextIteratorStreamer. Either
+        way the first chunk is available after the first decoded token instead of after the
+        whole reply.
+        """
         try:
-            # Update context
-            previous_context = self.context_manager.get_context()
-            # Retrieve relevant memories
-            relevant_memories = self.cortex.query_memory(user_input)
-            if not relevant_memories:
-                context = previous_context + f"User: {user_input}\nAssistant:"
-            else:
-                memory_text = "\n".join([item['document'] for item in relevant_memories])
-                context = previous_context + memory_text + f"\nUser: {user_input}\nAssistant:"
-            inputs = self.tokenizer.encode(context, return_tensors="pt")
-            inputs = inputs.to(self.model.device)
-            outputs = self.model.generate(
-                inputs,
-                max_length=512,
-                do_sample=True,
-                top_p=0.95,
-                top_k=50,
-                temperature=0.7
-            )
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            prompt_ids = self.build_prompt(user_input)
+            adapters = self._adapter_manager()
+            with adapters.lease(self.user_id) if adapters is not None else nullcontext() as adapter_name:
+                model = adapters.model if adapters is not None else self.model
+                # The engine drives the torch forward pass directly; ONNX Runtime models use generate()
+                if GENERATION_ENGINE == 'continuous' and isinstance(model, torch.nn.Module):
+                    engine = get_inference_engine(model, self.tokenizer)
+                    for chunk in engine.generate_stream(
+                        prompt_ids, max_new_tokens=max_new_tokens, temperature=0.7, top_p=0.95, top_k=50,
+                        session_id=self.user_id, adapter_name=adapter_name
+                    ):
+                        yield chunk
+                    logger.info("Response generated.")
+                    return
+                inputs = torch.tensor([prompt_ids], device=model.device)
+                streamer = TextIteratorStreamer(
+                    self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=GENERATION_STREAM_TIMEOUT
+                )
+                generation = Thread(
+                    target=model.generate,
+                    kwargs=dict(
+                        inputs=inputs,
+                        attention_mask=torch.ones_like(inputs),
+                        max_new_tokens=max_new_tokens,
+                        do_sample=True,
+                        top_p=0.95,
+                        top_k=50,
+                        temperature=0.7,
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        streamer=streamer,
+                        **({'adapter_names': [adapter_name]} if adapters is not None else {})
+                    ),
+                    daemon=True
+                )
+                generation.start()
+                for chunk in streamer:
+                    if chunk:
+                        yield chunk
+                generation.join()
             logger.info("Response generated.")
-            return response
         except Exception as e:
             logger.error(f"Error generating response: {e}")
-            return "I'm sorry, but I'm unable to process your request at the moment."
+            yield "I'm sorry, but I'm unable to process your request at the moment."
+
+    def generate_ai_response(self, user_input):
+        return "".join(self.stream_ai_response(user_input))
 
 
 
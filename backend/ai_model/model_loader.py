@@ -1,7 +1,14 @@
 # ai_model/model_loader.py
+import hashlib
 import logging
+import os
+import time
+
+import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 
+from utils.model_registry import get_model_registry, load_pretrained
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 handler = logging.FileHandler('logs/model_loader.log')
@@ -9,21 +16,124 @@ formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
+# 'torch' (fp32 as published), 'int8' (dynamic-quantized Linear layers) or 'onnx' (ONNX Runtime)
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'torch')
+MODEL_REVISION = os.getenv('MODEL_REVISION', 'main')
+# Quantized and exported variants, one directory per model, resolved revision and backend
+MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', './models/cache')
+
+MODEL_BACKENDS = ('torch', 'int8', 'onnx')
+
+
+def resolve_revision(model_name, revision=MODEL_REVISION):
+    """
+    A stable identifier for the weights behind model_name at revision.
+
+    Hub models resolve to the commit hash of the local snapshot (or the Hub, when not
+    downloaded yet), so a cached export is rebuilt whenever the upstream weights change;
+    local directories hash their files' names, sizes and modification times.
+    """
+    if os.path.isdir(model_name):
+        digest = hashlib.sha1()
+        for name in sorted(os.listdir(model_name)):
+            stat = os.stat(os.path.join(model_name, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:16]
+    try:
+        from huggingface_hub import snapshot_download
+        return os.path.basename(snapshot_download(model_name, revision=revision, local_files_only=True))
+    except Exception:
+        pass
+    try:
+        from huggingface_hub import model_info
+        return model_info(model_name, revision=revision).sha
+    except Exception as e:
+        logger.warning(f"Could not resolve revision '{revision}' of '{model_name}': {e}")
+        return revision
+
+
+def export_path(model_name, revision, backend):
+    return os.path.join(MODEL_CACHE_DIR, model_name.strip('/').replace('/', '--'), revision, backend)
+
+
 class ModelLoader:
     _model_cache = {}
 
     @staticmethod
-    def load_base_model(model_name='EleutherAI/gpt-neo-1.3B'):
-        if model_name in ModelLoader._model_cache:
-            logger.info(f"Model '{model_name}' loaded from cache.")
-            return ModelLoader._model_cache[model_name]
+    def load_base_model(model_name='EleutherAI/gpt-neo-1.3B', backend=None, fresh=False):
+        """
+        Loads a causal LM and its tokenizer once per process and backend.
+
+        Args:
+            model_name (str): Hub id or local directory.
+            backend (str): 'torch', 'int8' or 'onnx'; defaults to MODEL_BACKEND. The int8
+                and onnx variants are built on first use and cached under MODEL_CACHE_DIR,
+                keyed by the resolved model revision.
+            fresh (bool): Load a private copy, bypassing the process cache and the model
+                registry, for callers that modify the model (e.g. training) and must not
+                touch the instance serving requests.
+
+        Returns:
+            tuple: (tokenizer, model).
+        """
+        backend = backend or MODEL_BACKEND
+        if backend not in MODEL_BACKENDS:
+            logger.warning(f"Unknown model backend '{backend}'; using 'torch'.")
+            backend = 'torch'
+        key = (model_name, backend)
+        if not fresh and key in ModelLoader._model_cache:
+            logger.info(f"Model '{model_name}' ({backend}) loaded from cache.")
+            return ModelLoader._model_cache[key]
 
         try:
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForCausalLM.from_pretrained(model_name)
-            ModelLoader._model_cache[model_name] = (tokenizer, model)
-            logger.info(f"Model '{model_name}' loaded successfully.")
+            started = time.perf_counter()
+            tokenizer = AutoTokenizer.from_pretrained(model_name, revision=MODEL_REVISION)
+            if backend == 'int8':
+                loader = lambda: ModelLoader._load_int8(model_name)
+            elif backend == 'onnx':
+                loader = lambda: ModelLoader._load_onnx(model_name)
+            else:
+                loader = lambda: load_pretrained(AutoModelForCausalLM, model_name, revision=MODEL_REVISION)
+            if fresh:
+                model = loader()
+            else:
+                model = get_model_registry().get(f'{model_name}:{backend}', loader)
+                ModelLoader._model_cache[key] = (tokenizer, model)
+            logger.info(
+                f"Model '{model_name}' ({backend}{', private copy' if fresh else ''}) "
+                f"loaded successfully in {time.perf_counter() - started:.1f}s."
+            )
             return tokenizer, model
         except Exception as e:
-            logger.error(f"Failed to load model '{model_name}': {e}")
+            logger.error(f"Failed to load model '{model_name}' ({backend}): {e}")
             raise
+
+    @staticmethod
+    def _load_int8(model_name):
+        path = export_path(model_name, resolve_revision(model_name), 'int8')
+        weights = os.path.join(path, 'model.pt')
+        if os.path.exists(weights):
+            # The pickled quantized module loads without materializing the fp32 weights first
+            model = torch.load(weights, weights_only=False)
+            model.eval()
+            return model
+        model = load_pretrained(AutoModelForCausalLM, model_name, revision=MODEL_REVISION)
+        model.eval()
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        os.makedirs(path, exist_ok=True)
+        torch.save(model, weights + '.tmp')
+        os.replace(weights + '.tmp', weights)
+        logger.info(f"Cached int8 variant of '{model_name}' at {path}.")
+        return model
+
+    @staticmethod
+    def _load_onnx(model_name):
+        from optimum.onnxruntime import ORTModelForCausalLM
+
+        path = export_path(model_name, resolve_revision(model_name), 'onnx')
+        if os.path.exists(os.path.join(path, 'config.json')):
+            return ORTModelForCausalLM.from_pretrained(path, use_cache=True)
+        model = ORTModelForCausalLM.from_pretrained(model_name, revision=MODEL_REVISION, export=True, use_cache=True)
+        model.save_pretrained(path)
+        logger.info(f"Cached ONNX export of '{model_name}' at {path}.")
+        return model
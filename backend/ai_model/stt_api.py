@@ -9,6 +9,7 @@ from threading import Thread
 from queue import Queue
 import base64
 import io
+from utils.model_registry import get_model_registry
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -21,8 +22,11 @@ os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 device = "cuda" if torch.cuda.is_available() else "cpu"
 compute_type = "float16" if torch.cuda.is_available() else "float32"
 
-# Load Faster-Whisper model
-stt_model = WhisperModel("distil-large-v3", device=device, compute_type=compute_type)
+def get_stt_model():
+    # Faster-Whisper (CTranslate2) loads on the first transcription rather than at import
+    return get_model_registry().get(
+        "distil-large-v3", lambda: WhisperModel("distil-large-v3", device=device, compute_type=compute_type)
+    )
 
 import io
 from pydub import AudioSegment
@@ -37,7 +41,7 @@ async def stt_local_async(audio_data, language=None):
     async def transcribe_worker(audio_file_path):
         try:
             segments, info = await asyncio.get_event_loop().run_in_executor(
-                thread_pool, stt_model.transcribe, audio_file_path, 1
+                thread_pool, get_stt_model().transcribe, audio_file_path, 1
             )
             return "".join(segment.text for segment in segments)
         except Exception as e:
@@ -134,7 +138,7 @@ def stt_openai(audio_data, language=None):
 def stt_local(audio_data, language=None):
     def transcribe_worker(audio_file_path, result_queue):
         try:
-            segments, info = stt_model.transcribe(audio_file_path, beam_size=1)
+            segments, info = get_stt_model().transcribe(audio_file_path, beam_size=1)
             transcription = "".join(segment.text for segment in segments)
             result_queue.put(transcription)
         except Exception as e:
@@ -9,8 +9,9 @@ import sys
 import os
 os.environ["KMP_DUPLICATE_LIB_OK"]="TRUE"
 import pickle
+import json
 
-from flask import Flask, request, jsonify, session, make_response
+from flask import Flask, Response, request, jsonify, session, make_response, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from typing import List, Dict, Any
@@ -19,6 +20,7 @@ import logging
 from interfaces.cli import ExoCortexCLI
 from interfaces.voice_interface import VoiceInterface
 from ai_model.integrations_manager import AIAssistant
+from ai_model.assistant_registry import get_assistant_registry
 from ai_model.fine_tune import FineTuner
 from cortex.cortex import Cortex, KnowledgeIngestion
 from utils.database import db
@@ -75,6 +77,32 @@ def handle_audio_data(data):
         logger.error(f"Error processing audio data: {e}")
         emit('error', {'message': str(e)})
 
+@socketio.on('generate', namespace='/ws/chat')
+def handle_generate(data):
+    # Streams the reply as 'token' events, then 'done' with the full text
+    sid = request.sid
+    user_id = data.get('user_id')
+    user_input = data.get('user_input')
+    if not user_id or not user_input:
+        emit('error', {'message': 'user_id and user_input are required.'})
+        return
+
+    def stream_to_client():
+        chunks = []
+        try:
+            with get_assistant_registry().lease(user_id) as assistant:
+                for chunk in assistant.stream_response(user_input):
+                    chunks.append(chunk)
+                    socketio.emit('token', {'token': chunk}, to=sid, namespace='/ws/chat')
+                    # Yield to the server loop so each token is flushed immediately
+                    socketio.sleep(0)
+            socketio.emit('done', {'response': "".join(chunks)}, to=sid, namespace='/ws/chat')
+        except Exception as e:
+            logger.error(f"Error streaming response over websocket: {e}")
+            socketio.emit('error', {'message': str(e)}, to=sid, namespace='/ws/chat')
+
+    socketio.start_background_task(stream_to_client)
+
 @socketio.on_error_default
 def default_error_handler(e):
     logger.error(f"SocketIO error: {e}")
@@ -653,8 +681,9 @@ def generate_response():
         data = request.get_json()
         user_id = data.get('user_id')
         user_input = data.get('user_input')
-        assistant = AIAssistant(user_id)
-        response = assistant.generate_response(user_input)
+        # Warm per-user assistant; heavy models are shared across users
+        with get_assistant_registry().lease(user_id) as assistant:
+            response = assistant.generate_response(user_input)
         logger.info(f"Response generated for user {user_id}.")
         return jsonify({'response': response})
     except Exception as e:
@@ -662,6 +691,40 @@ def generate_response():
         return jsonify({'error': str(e)}), 500
 
 
+def sse_event(payload, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+
+@app.route('/generate_response/stream', methods=['POST'])
+def generate_response_stream():
+    # Server-sent events: one 'data' message per text chunk, then a 'done' event with the full reply
+    data = request.get_json()
+    user_id = data.get('user_id')
+    user_input = data.get('user_input')
+    if not user_id or not user_input:
+        return jsonify({'error': 'user_id and user_input are required.'}), 400
+
+    def events():
+        chunks = []
+        try:
+            with get_assistant_registry().lease(user_id) as assistant:
+                for chunk in assistant.stream_response(user_input):
+                    chunks.append(chunk)
+                    yield sse_event({'token': chunk})
+            logger.info(f"Streamed response for user {user_id}.")
+            yield sse_event({'response': "".join(chunks)}, event='done')
+        except Exception as e:
+            logger.error(f"Error in /generate_response/stream: {e}")
+            yield sse_event({'error': str(e)}, event='error')
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @app.route('/ingest_text', methods=['POST'])
 def ingest_text():
     try:
@@ -669,8 +732,8 @@ def ingest_text():
         user_id = data.get('user_id')
         text = data.get('text')
         metadata = data.get('metadata')
-        ingestion = KnowledgeIngestion(user_id)
-        ingestion.ingest_text(text, metadata)
+        # No model is needed to ingest; the knowledge store is shared with the user's assistant
+        KnowledgeIngestion.get_shared(user_id).ingest_text(text, metadata)
         logger.info(f"Text ingested for user {user_id}.")
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -693,6 +756,32 @@ def chat():
 
     return jsonify({"response": response})
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    data = request.json
+    user_input = data.get('message')
+    agent_manager = get_agent_manager(user_id)
+
+    def events():
+        chunks = []
+        try:
+            for chunk in agent_manager.stream_chat_with_model(user_input):
+                chunks.append(chunk)
+                yield sse_event({'token': chunk})
+            yield sse_event({'response': "".join(chunks)}, event='done')
+        except Exception as e:
+            logger.error(f"Error in /api/chat/stream: {e}")
+            yield sse_event({'error': str(e)}, event='error')
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 def list_ai_profiles() -> List[Dict[str, Any]]:
 
     logging.info("Listing all AI profiles.")
@@ -720,7 +809,7 @@ def run_server():
     socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True)
 
 def run_voice_interface():
-    voice_interface = VoiceInterface()
+    voice_interface = VoiceInterface.get_shared()
     assistant = AIAssistant(user_id=123)  # Replace with actual user ID
     while True:
         user_input = voice_interface.listen()
@@ -0,0 +1,99 @@
+# benchmarks/bench_embedding_path.py
+"""
+Compares the old nested-list embedding path with the NumPy path on a 10k-chunk ingest.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_embedding_path
+    python -m benchmarks.bench_embedding_path --chunks 10000 --model
+
+Without --model, embeddings are synthetic float32 batches so the numbers isolate the
+conversion and store overhead; with --model the shared EmbeddingEngine produces them.
+"""
+
+import argparse
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from cortex.vector_store import LocalVectorStore
+
+
+def make_embedding_function(as_lists: bool, use_model: bool, dim: int):
+    if use_model:
+        from cortex.embeddings import get_embedding_engine
+
+        engine = get_embedding_engine()
+
+        def embed(texts):
+            embeddings = engine.embed(texts)
+            return embeddings.tolist() if as_lists else embeddings
+        return embed
+
+    rng = np.random.default_rng(0)
+
+    def embed(texts):
+        embeddings = rng.standard_normal((len(texts), dim), dtype=np.float32)
+        return embeddings.tolist() if as_lists else embeddings
+    return embed
+
+
+def run(as_lists: bool, chunks: int, batch_size: int, dim: int, use_model: bool):
+    texts = [f"chunk {i} of the benchmark document" for i in range(chunks)]
+    embedding_function = make_embedding_function(as_lists, use_model, dim)
+    directory = tempfile.mkdtemp(prefix='bench_store_')
+    try:
+        store = LocalVectorStore(directory, initial_capacity=chunks)
+        tracemalloc.start()
+        started = time.perf_counter()
+        for start in range(0, chunks, batch_size):
+            batch = texts[start:start + batch_size]
+            store.add(text=batch, embedding_function=embedding_function, embedding_data=batch)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return elapsed, peak
+
+
+def describe_machine() -> str:
+    return (
+        f"{platform.platform()}, {platform.processor() or platform.machine()}, {os.cpu_count()} CPUs, "
+        f"Python {platform.python_version()}, NumPy {np.__version__}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark list vs NumPy embedding ingest path')
+    parser.add_argument('--chunks', type=int, default=10000)
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--model', action='store_true', help='Embed with the real model instead of synthetic vectors')
+    args = parser.parse_args()
+
+    # Timings depend heavily on the machine and disk; always report them with the numbers
+    print(f"machine: {describe_machine()}")
+    print(
+        f"params: chunks={args.chunks} batch_size={args.batch_size} dim={args.dim} "
+        f"embeddings={'model' if args.model else 'synthetic'}"
+    )
+    results = {}
+    for name, as_lists in (('list', True), ('numpy', False)):
+        results[name] = run(as_lists, args.chunks, args.batch_size, args.dim, args.model)
+
+    print(f"{'path':<8}{'time (s)':>12}{'peak alloc (MiB)':>20}")
+    for name, (elapsed, peak) in results.items():
+        print(f"{name:<8}{elapsed:>12.3f}{peak / 2 ** 20:>20.2f}")
+    list_time, list_peak = results['list']
+    numpy_time, numpy_peak = results['numpy']
+    print(f"speedup: {list_time / numpy_time:.1f}x, peak allocation reduced {list_peak / max(numpy_peak, 1):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
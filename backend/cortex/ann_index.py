@@ -0,0 +1,215 @@
+# cortex/ann_index.py
+
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+import numpy as np
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/ann_index.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+class ANNIndex(ABC):
+    """
+    Approximate nearest-neighbour index over the rows of a LocalVectorStore.
+
+    Rows are added in increasing order, so the index only needs to remember how far it has
+    got (indexed_upto). On open, LocalVectorStore replays any rows written after the last
+    save. Scores are inner products of unit vectors, i.e. cosine similarity.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.meta_path = f'{path}.json'
+        self.indexed_upto = 0
+        self._unsaved = 0
+
+    @property
+    def ready(self) -> bool:
+        return True
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        """Adds vectors labelled with their store rows."""
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[int], List[float]]:
+        """Returns the rows and scores of the approximate top-k."""
+
+    @abstractmethod
+    def remove(self, rows: List[int]) -> None:
+        """Excludes rows from future searches."""
+
+    @abstractmethod
+    def _write(self) -> None:
+        """Writes the index structure to self.path."""
+
+    def _meta(self) -> dict:
+        return {'indexed_upto': self.indexed_upto}
+
+    def save(self) -> None:
+        self._write()
+        with open(self.meta_path, 'w') as f:
+            json.dump(self._meta(), f)
+        self._unsaved = 0
+
+    def maybe_save(self, added: int, save_every: int) -> None:
+        self._unsaved += added
+        if self._unsaved >= save_every:
+            self.save()
+
+    def _load_meta(self) -> dict:
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        self.indexed_upto = meta.get('indexed_upto', 0)
+        return meta
+
+
+class HNSWIndex(ANNIndex):
+    """
+    HNSW graph index backed by hnswlib.
+
+    Args:
+        M (int): Graph out-degree; higher improves recall at the cost of memory.
+        ef_construction (int): Candidate list size while inserting.
+        ef_search (int): Candidate list size while querying; the main recall/latency knob.
+    """
+
+    def __init__(self, path: str, dim: int, M: int = 16, ef_construction: int = 200, ef_search: int = 64, initial_capacity: int = 100000):
+        super().__init__(path, dim)
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("hnswlib is required for the 'hnsw' index; install it with 'pip install hnswlib'")
+        self.ef_search = ef_search
+        # Elements marked deleted still count in get_current_count()
+        self.deleted_count = 0
+        self.index = hnswlib.Index(space='ip', dim=dim)
+        if os.path.exists(path):
+            self.index.load_index(path)
+            self.deleted_count = self._load_meta().get('deleted_count', 0)
+        else:
+            self.index.init_index(max_elements=initial_capacity, ef_construction=ef_construction, M=M)
+        self.index.set_ef(ef_search)
+
+    def add(self, vectors, rows):
+        needed = self.index.get_current_count() + len(rows)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, self.index.get_max_elements() * 2))
+        self.index.add_items(vectors, np.asarray(rows, dtype=np.int64))
+        self.indexed_upto = max(self.indexed_upto, int(rows[-1]) + 1)
+
+    def search(self, query, k):
+        k = min(k, self.index.get_current_count() - self.deleted_count)
+        while k > 0:
+            self.index.set_ef(max(self.ef_search, k))
+            try:
+                labels, distances = self.index.knn_query(query.reshape(1, -1), k=k)
+            except RuntimeError as e:
+                # Fewer than k live elements were reachable (e.g. a deleted count lost with
+                # an unsaved index); ask for fewer
+                logger.debug(f"HNSW query for k={k} failed, retrying with k={k // 2}: {e}")
+                k //= 2
+                continue
+            # hnswlib's 'ip' distance is 1 - inner product
+            return labels[0].tolist(), (1.0 - distances[0]).tolist()
+        return [], []
+
+    def remove(self, rows):
+        for row in rows:
+            try:
+                self.index.mark_deleted(int(row))
+                self.deleted_count += 1
+            except RuntimeError:
+                # Already deleted, or never indexed
+                pass
+
+    def _meta(self):
+        return {**super()._meta(), 'deleted_count': self.deleted_count}
+
+    def _write(self):
+        self.index.save_index(self.path)
+
+
+class IVFPQIndex(ANNIndex):
+    """
+    Inverted-file index with product quantization backed by faiss.
+
+    The coarse quantizer needs training data, so the index stays unready (and the store keeps
+    scanning exactly) until train_size rows exist; it is then trained on the stored vectors.
+
+    Args:
+        nlist (int): Number of inverted lists (coarse clusters).
+        pq_m (int): Number of PQ sub-quantizers; must divide the embedding dimension.
+        nbits (int): Bits per PQ code.
+        nprobe (int): Lists scanned per query; the main recall/latency knob.
+    """
+
+    def __init__(self, path: str, dim: int, nlist: int = 1024, pq_m: int = 16, nbits: int = 8, nprobe: int = 16):
+        super().__init__(path, dim)
+        try:
+            import faiss
+        except ImportError:
+            raise ImportError("faiss is required for the 'ivfpq' index; install it with 'pip install faiss-cpu'")
+        self.faiss = faiss
+        self.nlist = nlist
+        self.nprobe = nprobe
+        if os.path.exists(path):
+            self.index = faiss.read_index(path)
+            self._load_meta()
+        else:
+            quantizer = faiss.IndexFlatIP(dim)
+            self.index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits, faiss.METRIC_INNER_PRODUCT)
+        self.index.nprobe = nprobe
+
+    @property
+    def train_size(self) -> int:
+        # faiss warns below ~39 points per centroid
+        return self.nlist * 39
+
+    @property
+    def ready(self) -> bool:
+        return self.index.is_trained
+
+    def train(self, vectors: np.ndarray) -> None:
+        self.index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+        logger.info(f"Trained IVF-PQ index '{self.path}' on {len(vectors)} vectors.")
+
+    def add(self, vectors, rows):
+        if not self.index.is_trained:
+            return
+        self.index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), np.asarray(rows, dtype=np.int64))
+        self.indexed_upto = max(self.indexed_upto, int(rows[-1]) + 1)
+
+    def search(self, query, k):
+        if self.index.ntotal == 0:
+            return [], []
+        scores, labels = self.index.search(query.reshape(1, -1).astype(np.float32), k)
+        pairs = [(int(label), float(score)) for label, score in zip(labels[0], scores[0]) if label >= 0]
+        return [label for label, _ in pairs], [score for _, score in pairs]
+
+    def remove(self, rows):
+        if rows:
+            self.index.remove_ids(self.faiss.IDSelectorBatch(np.asarray(rows, dtype=np.int64)))
+
+    def _write(self):
+        self.faiss.write_index(self.index, self.path)
+
+
+def create_ann_index(index_type: str, directory: str, dim: int, **params) -> ANNIndex:
+    if index_type == 'hnsw':
+        return HNSWIndex(os.path.join(directory, 'index.hnsw'), dim, **params)
+    if index_type == 'ivfpq':
+        return IVFPQIndex(os.path.join(directory, 'index.ivfpq'), dim, **params)
+    raise ValueError(f"Unsupported ANN index type '{index_type}'")
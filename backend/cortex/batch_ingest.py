@@ -0,0 +1,272 @@
+# cortex/batch_ingest.py
+
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Tuple
+
+import soundfile as sf
+
+from cortex.extract_worker import extract_document_text, extract_image_text
+from cortex.source_registry import chunk_position, content_hash, diff_chunks
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/batch_ingest.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+INGEST_EXTRACT_WORKERS = int(os.getenv('INGEST_EXTRACT_WORKERS', str(os.cpu_count() or 2)))
+INGEST_WRITE_BATCH_SIZE = int(os.getenv('INGEST_WRITE_BATCH_SIZE', '256'))
+# Forking a process that has torch and its threads loaded is unsafe; extraction workers
+# start from a clean interpreter instead
+INGEST_START_METHOD = os.getenv(
+    'INGEST_START_METHOD', 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+EXTRACT_WORKER_MODULE = 'cortex.extract_worker'
+
+
+@contextmanager
+def _main_module_hidden():
+    """
+    Keeps new spawn/forkserver workers from re-importing the parent's main script.
+
+    Children import the script as __mp_main__ so functions defined in it can be unpickled;
+    for app_new.py that would run gevent patching, Flask/SocketIO setup and the model
+    imports in every worker. Extraction functions live in cortex.extract_worker instead.
+    """
+    main = sys.modules['__main__']
+    saved = {name: main.__dict__[name] for name in ('__file__', '__spec__') if name in main.__dict__}
+    main.__spec__ = None
+    main.__dict__.pop('__file__', None)
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+        if '__spec__' not in saved:
+            del main.__spec__
+
+
+class BatchIngester:
+    """
+    Three-stage pipeline behind KnowledgeIngestion.ingest_batch.
+
+    Documents and images are extracted in a process pool, audio is transcribed on a single
+    dedicated worker thread (the Whisper pipeline is not shared between threads), and the
+    calling thread chunks the results and embeds/writes them in large batches as they arrive.
+    Documents go through the source registry: files unchanged on disk are not extracted at
+    all, and only chunks that are new since the last ingest are embedded.
+
+    The process pool is started on first use with INGEST_START_METHOD and reused by every
+    later run() until close(), so a long-lived caller such as the ingest daemon does not
+    start new worker processes per batch. Workers load only cortex.extract_worker, not the
+    app's main script.
+
+    Args:
+        knowledge_ingestion (KnowledgeIngestion): Owner of the vector store, chunker and voice interface.
+        extract_workers (int): Size of the extraction process pool.
+        write_batch_size (int): Number of records embedded and written per vector store call.
+    """
+
+    def __init__(self, knowledge_ingestion, extract_workers: int = INGEST_EXTRACT_WORKERS, write_batch_size: int = INGEST_WRITE_BATCH_SIZE):
+        self.ki = knowledge_ingestion
+        self.extract_workers = max(1, extract_workers)
+        self.write_batch_size = max(1, write_batch_size)
+        self._extract_pool = None
+        self._pool_lock = threading.Lock()
+        # run() keeps per-batch state on the instance, so batches sharing it take turns
+        self._run_lock = threading.Lock()
+
+    def _submit_extract(self, fn, path: str) -> Future:
+        with self._pool_lock:
+            for attempt in range(2):
+                if self._extract_pool is None:
+                    context = multiprocessing.get_context(INGEST_START_METHOD)
+                    if INGEST_START_METHOD == 'forkserver':
+                        # Workers fork from a server that already imported the extractors
+                        context.set_forkserver_preload([EXTRACT_WORKER_MODULE])
+                    self._extract_pool = ProcessPoolExecutor(max_workers=self.extract_workers, mp_context=context)
+                try:
+                    # Workers are started on demand by submit()
+                    with _main_module_hidden():
+                        return self._extract_pool.submit(fn, path)
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); start a fresh pool once
+                    logger.warning("Extraction pool is broken; restarting it.")
+                    self._extract_pool.shutdown(wait=False)
+                    self._extract_pool = None
+                    if attempt:
+                        raise
+
+    def close(self) -> None:
+        """Stops the extraction worker processes."""
+        with self._pool_lock:
+            if self._extract_pool is not None:
+                self._extract_pool.shutdown(wait=True)
+                self._extract_pool = None
+
+    def _transcribe(self, audio_path: str) -> str:
+        audio, sample_rate = sf.read(audio_path)
+        return self.ki.voice_interface.pipe(audio)["text"]
+
+    def run(self, data_items: List[Tuple[str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Ingests every item and reports the outcome of each one.
+
+        Returns:
+            List[Dict[str, Any]]: One entry per input item, in input order, with 'type', 'path',
+            'status' ('ok', 'unchanged' or 'error'), 'records' written and 'error' message.
+        """
+        with self._run_lock:
+            return self._run(data_items)
+
+    def _run(self, data_items):
+        results = [
+            {'type': data_type, 'path': data_path, 'status': 'pending', 'records': 0, 'error': None}
+            for data_type, data_path, _ in data_items
+        ]
+        if not data_items:
+            return results
+
+        needs_audio = any(data_type == 'audio' for data_type, _, _ in data_items)
+        audio_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-audio') if needs_audio else None
+
+        pending = {}
+        # Per-document sync state: registry diff, file stat and the ids of newly written chunks
+        self._documents = {}
+        try:
+            # Stage 1 and 2: fan out extraction and transcription
+            for index, (data_type, data_path, metadata) in enumerate(data_items):
+                if data_type == 'text':
+                    future = Future()
+                    future.set_result(data_path)
+                elif data_type == 'document':
+                    if self.ki.source_registry.is_unchanged_on_disk(data_path):
+                        results[index]['status'] = 'unchanged'
+                        continue
+                    self._documents[index] = {'stat': os.stat(data_path)}
+                    future = self._submit_extract(extract_document_text, data_path)
+                elif data_type == 'image':
+                    future = self._submit_extract(extract_image_text, data_path)
+                elif data_type == 'audio':
+                    future = audio_pool.submit(self._transcribe, data_path)
+                else:
+                    logger.warning(f"Unsupported data type '{data_type}' for path '{data_path}'")
+                    results[index].update(status='error', error=f"Unsupported data type '{data_type}'")
+                    continue
+                pending[future] = index
+
+            # Stage 3: chunk, embed and write in large batches as extractions complete
+            buffer = []
+            for future in as_completed(pending):
+                index = pending[future]
+                data_type, data_path, metadata = data_items[index]
+                try:
+                    text = future.result()
+                except Exception as e:
+                    logger.error(f"Error extracting {data_type} '{data_path}': {e}")
+                    results[index].update(status='error', error=str(e))
+                    continue
+                for record in self._records(index, data_type, data_path, text, metadata, results):
+                    buffer.append(record)
+                    if len(buffer) >= self.write_batch_size:
+                        self._flush(buffer, results)
+                        buffer = []
+            self._flush(buffer, results)
+            self._finish_documents(data_items, results)
+        finally:
+            if audio_pool is not None:
+                audio_pool.shutdown(wait=True)
+
+        for result in results:
+            if result['status'] == 'pending':
+                result['status'] = 'ok'
+        succeeded = sum(1 for result in results if result['status'] == 'ok')
+        logger.info(f"Batch ingestion finished: {succeeded}/{len(results)} items ingested.")
+        return results
+
+    def _records(self, index: int, data_type: str, data_path: str, text: str, metadata: Dict[str, Any], results):
+        metadata = dict(metadata or {})
+        if data_type == 'document':
+            metadata['source'] = data_path
+            document = self._documents[index]
+            document['hash'] = content_hash(text)
+            known = self.ki.source_registry.get(data_path)
+            if known is not None and known.content_hash == document['hash']:
+                self.ki.source_registry.touch(data_path)
+                results[index]['status'] = 'unchanged'
+                del self._documents[index]
+                return
+            document['diff'] = diff_chunks(self.ki.source_registry.get_chunks(data_path), self.ki.chunker.chunk(text))
+            document['new_ids'] = [None] * len(document['diff'].new)
+            for slot, (chunk, _) in enumerate(document['diff'].new):
+                yield index, chunk.text, {**metadata, **chunk_position(chunk)}, slot
+        else:
+            if data_type != 'text':
+                metadata['source'] = data_path
+            yield index, text, metadata, None
+
+    def _flush(self, buffer, results):
+        # Records of an item that already failed would only be orphaned in the store
+        buffer = [record for record in buffer if results[record[0]]['status'] == 'pending']
+        if not buffer:
+            return
+        texts = [text for _, text, _, _ in buffer]
+        try:
+            record_ids = self.ki.vector_store.add(
+                text=texts,
+                embedding_function=self.ki.embedding_function,
+                embedding_data=texts,
+                metadata=[metadata for _, _, metadata, _ in buffer]
+            )
+            for (index, _, _, slot), record_id in zip(buffer, record_ids):
+                results[index]['records'] += 1
+                if slot is not None:
+                    self._documents[index]['new_ids'][slot] = record_id
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(texts)} records: {e}")
+            for index in set(index for index, _, _, _ in buffer):
+                results[index].update(status='error', error=str(e))
+                self._discard_written(index)
+
+    def _discard_written(self, index: int):
+        # Chunks of a failed document written by earlier flushes are not in the source
+        # registry, so nothing would ever delete them
+        document = self._documents.get(index)
+        if not document or 'new_ids' not in document:
+            return
+        written = [record_id for record_id in document['new_ids'] if record_id is not None]
+        document['new_ids'] = [None] * len(document['new_ids'])
+        try:
+            self.ki.vector_store.delete(written)
+        except Exception as e:
+            logger.error(f"Error deleting {len(written)} records of a failed document: {e}")
+
+    def _finish_documents(self, data_items, results):
+        # Drop stale chunks and record the new chunk layout once all writes have landed
+        for index, document in self._documents.items():
+            if results[index]['status'] != 'pending' or 'diff' not in document:
+                continue
+            data_path = data_items[index][1]
+            diff = document['diff']
+            try:
+                self.ki.vector_store.delete(diff.stale_ids)
+                self.ki.vector_store.update_metadata(
+                    [record_id for record_id, _ in diff.moved], [chunk_position(chunk) for _, chunk in diff.moved]
+                )
+                chunk_records = diff.kept + [
+                    (chunk_hash, record_id, chunk.index)
+                    for (chunk, chunk_hash), record_id in zip(diff.new, document['new_ids'])
+                ]
+                self.ki.source_registry.record(data_path, document['hash'], chunk_records, document['stat'])
+            except Exception as e:
+                logger.error(f"Error updating source registry for '{data_path}': {e}")
+                results[index].update(status='error', error=str(e))
+                self._discard_written(index)
@@ -0,0 +1,98 @@
+# cortex/chunking.py
+
+import re
+from collections import deque
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+PARAGRAPH_PATTERN = re.compile(r'\S(?:.*?\S)?(?=\s*\n\s*\n|\s*$)', re.DOTALL)
+SENTENCE_PATTERN = re.compile(r'\S.*?(?:[.!?]["\')\]]*(?=\s)|$)', re.DOTALL)
+WORD_PATTERN = re.compile(r'\S+')
+
+
+class Chunk(NamedTuple):
+    text: str
+    index: int
+    start: int
+    end: int
+    token_count: int
+
+
+class _Segment(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+
+
+def _default_count_tokens(texts: List[str]) -> List[int]:
+    return [len(WORD_PATTERN.findall(text)) for text in texts]
+
+
+class TextChunker:
+    """
+    Splits text into overlapping, token-bounded chunks along paragraph and sentence boundaries.
+
+    Chunks are yielded in order as the text is scanned, so a caller can embed and store them
+    in batches without holding every chunk in memory. Offsets index into the original text.
+
+    Args:
+        count_tokens (Callable): Returns the token count of each text in a list; defaults to
+            a whitespace word count when no tokenizer is available.
+        chunk_size (int): Maximum number of tokens per chunk.
+        chunk_overlap (int): Number of trailing tokens repeated at the start of the next chunk.
+    """
+
+    def __init__(self, count_tokens: Optional[Callable[[List[str]], List[int]]] = None, chunk_size: int = 200, chunk_overlap: int = 40):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.count_tokens = count_tokens or _default_count_tokens
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def _split_long(self, text: str, start: int, end: int) -> Iterator[_Segment]:
+        # A single sentence longer than chunk_size is cut on word boundaries
+        words = [(start + m.start(), start + m.end()) for m in WORD_PATTERN.finditer(text[start:end])]
+        counts = self.count_tokens([text[s:e] for s, e in words])
+        piece_start, piece_end, piece_tokens = None, None, 0
+        for (s, e), tokens in zip(words, counts):
+            if piece_start is not None and piece_tokens + tokens > self.chunk_size:
+                yield _Segment(piece_start, piece_end, piece_tokens)
+                piece_start, piece_tokens = None, 0
+            if piece_start is None:
+                piece_start = s
+            piece_end = e
+            piece_tokens += tokens
+        if piece_start is not None:
+            yield _Segment(piece_start, piece_end, piece_tokens)
+
+    def _segments(self, text: str) -> Iterator[_Segment]:
+        for paragraph in PARAGRAPH_PATTERN.finditer(text):
+            sentences = [
+                (paragraph.start() + m.start(), paragraph.start() + m.end())
+                for m in SENTENCE_PATTERN.finditer(paragraph.group())
+            ]
+            counts = self.count_tokens([text[s:e] for s, e in sentences])
+            for (start, end), tokens in zip(sentences, counts):
+                if tokens > self.chunk_size:
+                    yield from self._split_long(text, start, end)
+                else:
+                    yield _Segment(start, end, tokens)
+
+    def chunk(self, text: str) -> Iterator[Chunk]:
+        window = deque()
+        window_tokens = 0
+        pending = False
+        index = 0
+        for segment in self._segments(text):
+            if window and window_tokens + segment.tokens > self.chunk_size:
+                if pending:
+                    yield Chunk(text[window[0].start:window[-1].end], index, window[0].start, window[-1].end, window_tokens)
+                    index += 1
+                    pending = False
+                # Keep trailing segments worth at most chunk_overlap tokens, then make room
+                while window and (window_tokens > self.chunk_overlap or window_tokens + segment.tokens > self.chunk_size):
+                    window_tokens -= window.popleft().tokens
+            window.append(segment)
+            window_tokens += segment.tokens
+            pending = True
+        if window and pending:
+            yield Chunk(text[window[0].start:window[-1].end], index, window[0].start, window[-1].end, window_tokens)
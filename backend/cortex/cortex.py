@@ -1,18 +1,27 @@
 # knowledge_ingestion.py
 
 import logging
+import math
 import os
-from typing import List, Tuple, Dict, Any
-from datetime import datetime
-from transformers import AutoTokenizer, AutoModel
-import torch
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict, Any, Iterable
+from datetime import datetime, timedelta
+import numpy as np
 import pytesseract
 import soundfile as sf
 import textract
-from deeplake.core.vectorstore import VectorStore
 from PIL import Image
 
 from interfaces.voice_interface import VoiceInterface  # Ensure this module exists and is correctly implemented
+from cortex.embeddings import get_embedding_engine
+from cortex.chunking import Chunk, TextChunker
+from cortex.batch_ingest import BatchIngester
+from cortex.vector_store import create_vector_store, search_store
+from cortex.search_filter import SearchFilter, apply_recency
+from cortex.source_registry import SourceRegistry, chunk_position, content_hash, diff_chunks
+from cortex.memory_journal import open_write_behind_memory
+from cortex.memory_consolidation import MEMORY_HOT_DAYS, MEMORY_TIER_MIN_SCORE, MemoryConsolidator, search_tiers
 
 # Configure Logging
 logger = logging.getLogger(__name__)
@@ -22,7 +31,17 @@ formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
+# Chunks stay under the 256-token window of all-MiniLM-L6-v2 including special tokens
+CHUNK_SIZE_TOKENS = int(os.getenv('CHUNK_SIZE_TOKENS', '200'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '40'))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '64'))
+# 'vector', 'keyword' (BM25 only, no embedding) or 'hybrid' (both, fused by reciprocal rank)
+CORTEX_SEARCH_MODE = os.getenv('CORTEX_SEARCH_MODE', 'hybrid')
+
 class KnowledgeIngestion:
+    _shared = {}
+    _shared_lock = threading.Lock()
+
     def __init__(self, user_id: str):
         """
         Initializes the KnowledgeIngestion instance.
@@ -33,45 +52,52 @@ class KnowledgeIngestion:
         self.user_id = user_id
         self.vector_store_path = f'vector_store_{user_id}'
         
-        # Initialize Deep Lake Vector Store with ActiveLoop Token
-        active_loop_token = os.getenv('ACTIVELOOP_TOKEN')
-        if not active_loop_token:
-            raise ValueError("ACTIVELOOP_TOKEN environment variable is not set")
+        # Deep Lake when ACTIVELOOP_TOKEN is set, otherwise the local in-process store
+        self.vector_store = create_vector_store(self.vector_store_path)
+        # Content and chunk hashes of ingested files, for incremental re-ingestion
+        self.source_registry = SourceRegistry(f'{self.vector_store_path}.sources.db')
         
-        self.vector_store = VectorStore(
-            path=self.vector_store_path,
-            token=active_loop_token
+        # Shared HuggingFace model and tokenizer, loaded once per process
+        self.embedding_engine = get_embedding_engine()
+        self.model_name = self.embedding_engine.model_name
+        self.tokenizer = self.embedding_engine.tokenizer
+        self.model = self.embedding_engine.model
+        self.chunker = TextChunker(
+            count_tokens=self.embedding_engine.count_tokens,
+            chunk_size=CHUNK_SIZE_TOKENS,
+            chunk_overlap=CHUNK_OVERLAP_TOKENS
         )
-        
-        self.voice_interface = VoiceInterface()
-        
-        # Load HuggingFace model and tokenizer
-        self.model_name = "sentence-transformers/all-MiniLM-L6-v2"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModel.from_pretrained(self.model_name)
+        # Created on the first ingest_batch and reused, together with its process pool
+        self._batch_ingester = None
+
+    @classmethod
+    def get_shared(cls, user_id: str) -> "KnowledgeIngestion":
+        """
+        Returns the process's KnowledgeIngestion for a user, creating it on first use.
+
+        It only opens the user's stores and the shared embedding model, so handlers that
+        just ingest or search knowledge use it rather than a full AIAssistant.
+        """
+        user_id = str(user_id)
+        ki = cls._shared.get(user_id)
+        if ki is not None:
+            return ki
+        with cls._shared_lock:
+            ki = cls._shared.get(user_id)
+            if ki is None:
+                ki = cls._shared[user_id] = cls(user_id)
+            return ki
 
 
 
+    @property
+    def voice_interface(self) -> VoiceInterface:
+        # Whisper is shared across users and only loaded when audio is first used
+        return VoiceInterface.get_shared()
 
-    def embedding_function(self, texts: List[str]) -> List[List[float]]:
+    def embedding_function(self, texts: List[str]) -> np.ndarray:
         try:
-            if isinstance(texts, str):
-                texts = [texts]
-            texts = [t.replace("\n", " ") for t in texts]
-            
-            # Tokenize and get model outputs
-            encoded_input = self.tokenizer(texts, padding=True, truncation=True, return_tensors='pt')
-            with torch.no_grad():
-                model_output = self.model(**encoded_input)
-            
-            # Mean pooling
-            attention_mask = encoded_input['attention_mask']
-            token_embeddings = model_output[0]
-            input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-            sum_embeddings = torch.sum(token_embeddings * input_mask_expanded, 1)
-            sum_mask = torch.clamp(input_mask_expanded.sum(1), min=1e-9)
-            embeddings = (sum_embeddings / sum_mask).tolist()
-            
+            embeddings = self.embedding_engine.embed(texts)
             logger.debug("Generated embeddings for texts.")
             return embeddings
         except Exception as e:
@@ -97,17 +123,99 @@ class KnowledgeIngestion:
 
 
 
-    def ingest_document(self, file_path: str, metadata: Dict[str, Any] = None):
+    def ingest_chunks(self, chunks: Iterable[Chunk], metadata: Dict[str, Any] = None, batch_size: int = INGEST_BATCH_SIZE) -> List[str]:
+        """
+        Embeds and stores chunks in batches, tagging each with its chunk_index and offsets.
+
+        Args:
+            chunks (Iterable[Chunk]): Chunks in document order, typically from TextChunker.chunk.
+            metadata (Dict[str, Any]): Metadata shared by every chunk, such as 'source'.
+            batch_size (int): Number of chunks embedded and written per vector store call.
+
+        Returns:
+            List[str]: Record ids of the stored chunks, in order.
+        """
+        if metadata is None:
+            metadata = {}
+        texts, metadatas = [], []
+        record_ids = []
+        for chunk in chunks:
+            texts.append(chunk.text)
+            metadatas.append({**metadata, **chunk_position(chunk)})
+            if len(texts) >= batch_size:
+                record_ids.extend(self.vector_store.add(
+                    text=texts,
+                    embedding_function=self.embedding_function,
+                    embedding_data=texts,
+                    metadata=metadatas
+                ))
+                texts, metadatas = [], []
+        if texts:
+            record_ids.extend(self.vector_store.add(
+                text=texts,
+                embedding_function=self.embedding_function,
+                embedding_data=texts,
+                metadata=metadatas
+            ))
+        return record_ids
+
+    def sync_document(self, file_path: str, text: str, metadata: Dict[str, Any] = None, stat: os.stat_result = None) -> Dict[str, int]:
+        """
+        Brings the stored chunks of file_path in line with its freshly extracted text.
+
+        Only chunks whose hash is not already stored for this file are embedded and written;
+        records of chunks that disappeared are deleted, and kept records whose position in
+        the document changed get their chunk_index and offsets updated.
+
+        Returns:
+            Dict[str, int]: Counts of 'added', 'kept' and 'deleted' chunk records.
+        """
+        stat = stat or os.stat(file_path)
+        text_hash = content_hash(text)
+        known = self.source_registry.get(file_path)
+        if known is not None and known.content_hash == text_hash:
+            self.source_registry.touch(file_path)
+            return {'added': 0, 'kept': len(self.source_registry.get_chunks(file_path)), 'deleted': 0}
+
+        diff = diff_chunks(self.source_registry.get_chunks(file_path), self.chunker.chunk(text))
+        new_ids = self.ingest_chunks([chunk for chunk, _ in diff.new], metadata)
+        self.vector_store.delete(diff.stale_ids)
+        self.vector_store.update_metadata(
+            [record_id for record_id, _ in diff.moved], [chunk_position(chunk) for _, chunk in diff.moved]
+        )
+        chunk_records = diff.kept + [
+            (chunk_hash, record_id, chunk.index) for (chunk, chunk_hash), record_id in zip(diff.new, new_ids)
+        ]
+        self.source_registry.record(file_path, text_hash, chunk_records, stat)
+        return {'added': len(new_ids), 'kept': len(diff.kept), 'deleted': len(diff.stale_ids)}
+
+    def ingest_document(self, file_path: str, metadata: Dict[str, Any] = None, force: bool = False):
         try:
+            if not force and self.source_registry.is_unchanged_on_disk(file_path):
+                logger.info(f"Document '{file_path}' unchanged since last ingest; skipped.")
+                return
+            stat = os.stat(file_path)
             text = textract.process(file_path).decode('utf-8')
             if metadata is None:
                 metadata = {}
             metadata['source'] = file_path
-            self.ingest_text(text, metadata)
-            logger.info(f"Document '{file_path}' ingested successfully.")
+            counts = self.sync_document(file_path, text, metadata, stat)
+            logger.info(
+                f"Document '{file_path}' ingested successfully: {counts['added']} chunks added, "
+                f"{counts['kept']} kept, {counts['deleted']} deleted."
+            )
         except Exception as e:
             logger.error(f"Error ingesting document '{file_path}': {e}")
 
+    def remove_document(self, file_path: str):
+        """Deletes every stored chunk of file_path and forgets it in the source registry."""
+        try:
+            record_ids = self.source_registry.remove(file_path)
+            self.vector_store.delete(record_ids)
+            logger.info(f"Document '{file_path}' removed: {len(record_ids)} chunks deleted.")
+        except Exception as e:
+            logger.error(f"Error removing document '{file_path}': {e}")
+
 
 
     def ingest_audio(self, audio_path: str, metadata: Dict[str, Any] = None):
@@ -138,27 +246,30 @@ class KnowledgeIngestion:
 
 
 
-    def ingest_batch(self, data_items: List[Tuple[str, str, Dict[str, Any]]]):
-        for data_type, data_path, metadata in data_items:
-            if data_type == 'text':
-                self.ingest_text(data_path, metadata)
-            elif data_type == 'document':
-                self.ingest_document(data_path, metadata)
-            elif data_type == 'audio':
-                self.ingest_audio(data_path, metadata)
-            elif data_type == 'image':
-                self.ingest_image(data_path, metadata)
-            else:
-                logger.warning(f"Unsupported data type '{data_type}' for path '{data_path}'")
+    def ingest_batch(self, data_items: List[Tuple[str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Ingests many items at once through the pipelined BatchIngester.
 
-    def search_knowledge(self, query: str, limit: int = 5) -> Dict[str, Any]:
+        Returns:
+            List[Dict[str, Any]]: Per-item results with 'status', 'records' and 'error'.
+        """
+        if self._batch_ingester is None:
+            self._batch_ingester = BatchIngester(self)
+        return self._batch_ingester.run(data_items)
+
+    def close(self):
+        """Stops the batch ingester's extraction processes, if any were started."""
+        if self._batch_ingester is not None:
+            self._batch_ingester.close()
+
+    def search_knowledge(self, query: str, limit: int = 5, embedding: np.ndarray = None, mode: str = CORTEX_SEARCH_MODE,
+                         filter: SearchFilter = None) -> Dict[str, Any]:
         try:
-            search_results = self.vector_store.search(
-                embedding_data=query,
-                embedding_function=self.embedding_function,
-                k=limit
+            search_results = search_store(
+                self.vector_store, query, limit, mode,
+                embedding=embedding, embedding_function=self.embedding_function, filter=filter
             )
-            logger.info(f"Search completed for query: '{query}' with limit: {limit}")
+            logger.info(f"Search completed for query: '{query}' with limit: {limit} ({mode})")
             return search_results
         except Exception as e:
             logger.error(f"Error searching vector store: {e}")
@@ -192,18 +303,31 @@ class KnowledgeIngestion:
 class Cortex:
     def __init__(self, user_id: str):
         self.user_id = user_id
-        self.ki = KnowledgeIngestion(user_id=user_id)
+        self.ki = KnowledgeIngestion.get_shared(user_id)
         self.memory_store_path = f'memory_store_{user_id}'
-        # Initialize Deep Lake Vector Store for memory
-        active_loop_token = os.getenv('ACTIVELOOP_TOKEN')
-        if not active_loop_token:
-            raise ValueError("ACTIVELOOP_TOKEN environment variable is not set")
-        self.memory_store = VectorStore(
-            path=self.memory_store_path,
-            token=active_loop_token
+        # Memory uses the same vector store backend as the knowledge base
+        self.memory_store = create_vector_store(self.memory_store_path)
+        # Old turns are consolidated into summaries (warm) and archived (cold)
+        self.memory_warm_store = create_vector_store(f'{self.memory_store_path}_warm')
+        self.memory_cold_store = create_vector_store(f'{self.memory_store_path}_cold')
+        self.memory_tiers = [
+            ('hot', self.memory_store),
+            ('warm', self.memory_warm_store),
+            ('cold', self.memory_cold_store),
+        ]
+        # Turns are journaled immediately and embedded into memory_store in the background
+        self.memory_writer = open_write_behind_memory(
+            self.memory_store,
+            self.ki.embedding_function,
+            f'{self.memory_store_path}.journal'
         )
-        # Use the same embedding model for memory
-        self.embedding_model = self.ki.model
+        # Use the same shared embedding model for memory
+        self.embedding_engine = self.ki.embedding_engine
+        self.embedding_model = self.embedding_engine.model
+        # Consolidation runs on one set of tiers must not overlap
+        self._consolidate_lock = threading.Lock()
+        # Knowledge and memory are searched side by side for every query
+        self.search_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f'cortex-search-{user_id}')
 
     def add_to_memory(self, user_prompt: str, model_response: str, context: str = None, data_items: List[Dict] = None, retrieved_memory: List[Dict] = None):
         try:
@@ -212,7 +336,8 @@ class Cortex:
             
             # Build metadata
             metadata = {
-                "datetime": datetime.datetime.now().isoformat(),
+                "datetime": datetime.now().isoformat(),
+                "category": "conversation",
                 "context": {
                     "data_items": data_items if data_items else [],
                     "retrieved_memory": retrieved_memory if retrieved_memory else [],
@@ -220,29 +345,76 @@ class Cortex:
                 }
             }
             
-            self.memory_store.add(
-                text=[conversation_text],
-                embedding_function=self.ki.embedding_function,
-                embedding_data=[conversation_text],
-                metadata=[metadata]
-            )
-            logger.info("Added conversation to memory successfully.")
+            self.memory_writer.append(conversation_text, metadata)
+            logger.info("Journaled conversation for memory.")
         except Exception as e:
             logger.error(f"Error adding conversation to memory: {e}")
 
-    def retrieve_memory(self, query: str, limit: int = 5) -> Dict[str, Any]:
+    def flush_memory(self, timeout: float = None) -> bool:
+        """Waits until every journaled turn has been embedded into the memory store."""
+        return self.memory_writer.flush(timeout)
+
+    def close(self):
+        """Flushes pending memory writes and releases background threads."""
+        self.memory_writer.close()
+        self.search_pool.shutdown(wait=True)
+        self.ki.close()
+
+    def retrieve_memory(self, query: str, limit: int = 5, embedding: np.ndarray = None, mode: str = CORTEX_SEARCH_MODE,
+                        filter: SearchFilter = None, recency: bool = True) -> Dict[str, Any]:
+        """
+        Searches the hot, warm and cold memory tiers in that order. In vector and hybrid mode
+        the search stops at the first tier that brings enough close matches, judged by cosine
+        similarity; BM25 scores are not similarities, so keyword mode searches every tier.
+        Hybrid and keyword results keep warmer tiers ahead of colder ones.
+
+        Args:
+            filter (SearchFilter): Time range, category or source constraints, applied inside
+                each store before scoring (e.g. SearchFilter(start=yesterday) for recent turns).
+            recency (bool): Boost recent turns with the configured decay before ranking.
+        """
         try:
-            results = self.memory_store.search(
-                embedding_data=query,
-                embedding_function=self.ki.embedding_function,
-                k=limit
+            if embedding is None and mode != 'keyword':
+                embedding = self.ki.embedding_function([query])[0]
+            # Fetch extra candidates so the recency boost can promote a recent turn into the top results
+            fetch = limit * 2 if recency else limit
+
+            def search(store, k):
+                return search_store(
+                    store, query, k, mode,
+                    embedding=embedding, embedding_function=self.ki.embedding_function, filter=filter
+                )
+
+            by_tier = mode != 'vector'
+            results = search_tiers(
+                self.memory_tiers, search, fetch,
+                min_score=None if mode == 'keyword' else MEMORY_TIER_MIN_SCORE, by_tier=by_tier
             )
+            if recency:
+                # Scores that do not compare across tiers are only re-ranked within their tier
+                results = apply_recency(results, group_by='tier' if by_tier else None)
+                results = {key: values[:limit] for key, values in results.items()}
             logger.info(f"Retrieved {limit} memory entries for query: '{query}'")
             return results
         except Exception as e:
             logger.error(f"Error retrieving memory: {e}")
             return {}
 
+    def consolidate_memory(self, older_than_days: float = MEMORY_HOT_DAYS) -> Dict[str, int]:
+        """
+        Replaces hot turns older than older_than_days with cluster summaries.
+
+        Returns:
+            Dict[str, int]: Number of 'turns' archived and 'summaries' written.
+        """
+        try:
+            consolidator = MemoryConsolidator(self.memory_store, self.memory_warm_store, self.memory_cold_store)
+            with self._consolidate_lock:
+                return consolidator.consolidate(datetime.now() - timedelta(days=older_than_days))
+        except Exception as e:
+            logger.error(f"Error consolidating memory: {e}")
+            return {'turns': 0, 'summaries': 0}
+
     def rank_search_results(self, query: str, search_results: Dict[str, Any]) -> List[Dict[str, Any]]:
         try:
             # For simplicity, assuming search_results contains a 'score' key for each entry
@@ -258,18 +430,44 @@ class Cortex:
             logger.error(f"Error ranking search results: {e}")
             return []
 
-    def handle_query(self, query: str, memory_limit: int = 5, search_limit: int = 5) -> List[Dict[str, Any]]:
+    @staticmethod
+    def normalize_scores(ranked_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Adds a 'normalized_score' to each result: its z-score within its own store's results.
+
+        Raw similarity scores from different stores are not comparable (a store of short chat
+        turns scores differently from one of document chunks), so results are ranked by how
+        far each one stands out from its own store's candidates.
+        """
+        scores = [result['score'] for result in ranked_results]
+        if not scores:
+            return ranked_results
+        mean = sum(scores) / len(scores)
+        std = math.sqrt(sum((score - mean) ** 2 for score in scores) / len(scores))
+        for result in ranked_results:
+            result['normalized_score'] = (result['score'] - mean) / std if std > 1e-9 else 0.0
+        return ranked_results
+
+    def merge_search_results(self, **ranked_by_source: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        merged = []
+        for source, ranked_results in ranked_by_source.items():
+            for result in self.normalize_scores(ranked_results):
+                result['source'] = source
+                merged.append(result)
+        merged.sort(key=lambda result: (result['normalized_score'], result['score']), reverse=True)
+        return merged
+
+    def handle_query(self, query: str, memory_limit: int = 5, search_limit: int = 5, mode: str = CORTEX_SEARCH_MODE,
+                     filter: SearchFilter = None) -> List[Dict[str, Any]]:
         try:
-            # Search knowledge base
-            knowledge_results = self.ki.search_knowledge(query, limit=search_limit)
-            ranked_knowledge = self.rank_search_results(query, knowledge_results)
-            
-            # Search memory
-            memory_results = self.retrieve_memory(query, limit=memory_limit)
-            ranked_memory = self.rank_search_results(query, memory_results)
-            
-            # Combine results
-            combined_results = ranked_memory + ranked_knowledge
+            # Embed the query once (not at all for keyword lookups) and search knowledge and memory concurrently
+            query_embedding = self.embedding_engine.embed([query])[0] if mode != 'keyword' else None
+            knowledge_future = self.search_pool.submit(self.ki.search_knowledge, query, search_limit, query_embedding, mode, filter)
+            memory_future = self.search_pool.submit(self.retrieve_memory, query, memory_limit, query_embedding, mode, filter)
+            ranked_knowledge = self.rank_search_results(query, knowledge_future.result())
+            ranked_memory = self.rank_search_results(query, memory_future.result())
+
+            combined_results = self.merge_search_results(memory=ranked_memory, knowledge=ranked_knowledge)
             logger.info(f"Handled query: '{query}' with combined results.")
             return combined_results
         except Exception as e:
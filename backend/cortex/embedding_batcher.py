@@ -0,0 +1,100 @@
+# cortex/embedding_batcher.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/embedding_batcher.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+class EmbeddingBatcher:
+    """
+    Collects texts from concurrent callers and runs them through the model as one padded batch.
+
+    A dispatcher thread waits for the first pending text, then keeps collecting for up to
+    max_wait_ms (or until max_batch_size texts are queued) before calling encode_fn once.
+    Each caller gets one Future per text, resolved with that text's row of the batch output.
+
+    Args:
+        encode_fn (Callable): Takes a list of texts and returns one embedding row per text.
+        max_batch_size (int): Upper bound on texts per forward pass.
+        max_wait_ms (float): How long the dispatcher waits for more texts after the first one.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], Sequence], max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> List[Future]:
+        if self._closed:
+            raise RuntimeError("EmbeddingBatcher is closed")
+        self._ensure_started()
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return futures
+
+    def embed(self, texts: List[str]) -> List:
+        return [future.result() for future in self.submit(texts)]
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the shutdown marker back so the run loop sees it after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+            texts = [text for text, _ in batch]
+            try:
+                rows = self.encode_fn(texts)
+                for (_, future), row in zip(batch, rows):
+                    future.set_result(row)
+                logger.debug(f"Embedded batch of {len(texts)} texts.")
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(texts)} texts: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
@@ -0,0 +1,210 @@
+# cortex/embedding_cache.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/embedding_cache.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+def normalize_text(text: str) -> str:
+    # Whitespace differences never change the tokens the embedding model sees
+    return " ".join(text.split())
+
+
+class DiskEmbeddingStore:
+    """
+    Persistent tier of the embedding cache.
+
+    Vectors live in a float32 memory-mapped file (<path>.vectors) that grows by doubling;
+    a small SQLite table (<path>.index) maps cache keys to rows of that file. A disk path
+    should be owned by a single process.
+    """
+
+    def __init__(self, path: str, initial_capacity: int = 1024):
+        self.path = path
+        self.vectors_path = f'{path}.vectors'
+        self.index_path = f'{path}.index'
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self.dim = self._get_meta('dim')
+        self.count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        self._vectors = None
+        if self.dim:
+            self._open(max(self.initial_capacity, self.count))
+
+    def _get_meta(self, name: str) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _open(self, capacity: int):
+        needed = capacity * self.dim * 4
+        current = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if current < needed:
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(needed)
+        size = max(current, needed) // (self.dim * 4)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(size, self.dim))
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys or self._vectors is None:
+            return {}
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, row in rows:
+                    found[key] = np.array(self._vectors[row])
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(len(next(iter(items.values()))))
+                self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (self.dim,))
+                self._open(self.initial_capacity)
+            existing = set()
+            keys = list(items)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(
+                    key for (key,) in self._conn.execute(
+                        f"SELECT key FROM entries WHERE key IN ({placeholders})", chunk
+                    )
+                )
+            new_keys = [key for key in keys if key not in existing]
+            if not new_keys:
+                return
+            if self.count + len(new_keys) > self._vectors.shape[0]:
+                capacity = self._vectors.shape[0]
+                while capacity < self.count + len(new_keys):
+                    capacity *= 2
+                self._open(capacity)
+            rows = []
+            for key in new_keys:
+                self._vectors[self.count] = items[key]
+                rows.append((key, self.count))
+                self.count += 1
+            self._vectors.flush()
+            self._conn.executemany("INSERT INTO entries (key, row) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings keyed by model name plus a hash of the normalized text.
+
+    An in-memory LRU tier answers repeated queries; the optional DiskEmbeddingStore keeps
+    vectors across restarts so re-ingesting a document costs no forward passes.
+
+    Args:
+        model_name (str): Name of the embedding model; part of every key.
+        max_entries (int): Capacity of the in-memory LRU tier.
+        disk_path (str): Base path of the on-disk tier, or None to keep the cache in memory only.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 10000, disk_path: str = None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskEmbeddingStore(disk_path) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def make_key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [self.make_key(text) for text in texts]
+        results = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    missing.append(i)
+
+        if missing and self.disk is not None:
+            found = self.disk.get_many([keys[i] for i in missing])
+            if found:
+                with self._lock:
+                    for key, vector in found.items():
+                        self._remember(key, vector)
+                still_missing = []
+                for i in missing:
+                    vector = found.get(keys[i])
+                    if vector is not None:
+                        results[i] = vector
+                    else:
+                        still_missing.append(i)
+                self.disk_hits += len(missing) - len(still_missing)
+                missing = still_missing
+
+        self.misses += len(missing)
+        return results
+
+    def put_many(self, texts: List[str], vectors) -> None:
+        items = {}
+        for text, vector in zip(texts, vectors):
+            # Copy so a cached row does not keep its whole batch array alive
+            items[self.make_key(text)] = np.array(vector, dtype=np.float32)
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+        if self.disk is not None:
+            try:
+                self.disk.put_many(items)
+            except Exception as e:
+                logger.error(f"Error writing embeddings to disk cache '{self.disk.path}': {e}")
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self.disk.count if self.disk is not None else 0,
+        }
@@ -0,0 +1,156 @@
+# cortex/embeddings.py
+
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Union
+from transformers import AutoTokenizer, AutoModel
+import numpy as np
+import torch
+
+from cortex.embedding_batcher import EmbeddingBatcher
+from cortex.embedding_cache import EmbeddingCache
+from utils.model_registry import get_model_registry, load_pretrained
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/embeddings.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Micro-batching settings shared by every caller of the engine
+EMBEDDING_BATCHING = os.getenv('EMBEDDING_BATCHING', '1') == '1'
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv('EMBEDDING_MAX_BATCH_SIZE', '32'))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv('EMBEDDING_MAX_WAIT_MS', '5'))
+
+# Embedding cache settings; a size of 0 disables the cache, an empty path keeps it in memory
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '10000'))
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', '')
+
+
+class EmbeddingEngine:
+    """
+    Process-wide embedding model shared by KnowledgeIngestion, Cortex and AgentManager.
+
+    Use EmbeddingEngine.get_instance() instead of constructing it directly so the
+    tokenizer and model are loaded only once per model name.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, max_seq_length: int = None):
+        self.model_name = model_name
+        # Inputs are truncated here; None uses the tokenizer's limit (512 for MiniLM)
+        self.max_seq_length = max_seq_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = get_model_registry().get(model_name, lambda: load_pretrained(AutoModel, model_name))
+        self.model.eval()
+        # Fast tokenizers are not safe to call from several threads at once
+        self._lock = threading.Lock()
+        self.batcher = None
+        if EMBEDDING_BATCHING:
+            self.batcher = EmbeddingBatcher(
+                self.forward,
+                max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+                max_wait_ms=EMBEDDING_MAX_WAIT_MS
+            )
+        self.cache = None
+        if EMBEDDING_CACHE_SIZE > 0:
+            # Truncation changes the vectors of long texts, so it is part of the cache identity
+            cache_name = model_name if max_seq_length is None else f'{model_name}@{max_seq_length}'
+            disk_path = None
+            if EMBEDDING_CACHE_PATH:
+                disk_path = os.path.join(EMBEDDING_CACHE_PATH, cache_name.replace('/', '__'))
+            self.cache = EmbeddingCache(cache_name, max_entries=EMBEDDING_CACHE_SIZE, disk_path=disk_path)
+
+    @classmethod
+    def get_instance(cls, model_name: str = DEFAULT_EMBEDDING_MODEL, max_seq_length: int = None) -> "EmbeddingEngine":
+        """Engines are kept per model name and truncation length; the model weights are shared."""
+        key = (model_name, max_seq_length)
+        engine = cls._instances.get(key)
+        if engine is not None:
+            return engine
+        with cls._instances_lock:
+            engine = cls._instances.get(key)
+            if engine is None:
+                try:
+                    engine = cls(model_name, max_seq_length)
+                    cls._instances[key] = engine
+                    logger.info(f"Embedding model '{model_name}' loaded.")
+                except Exception as e:
+                    logger.error(f"Failed to load embedding model '{model_name}': {e}")
+                    raise
+            return engine
+
+    def forward(self, texts: List[str]) -> np.ndarray:
+        """
+        Runs one forward pass over texts and mean-pools the token embeddings.
+
+        Returns a (len(texts), dim) float32 array that shares memory with the pooled tensor.
+        """
+        with self._lock:
+            encoded_input = self.tokenizer(
+                texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors='pt'
+            )
+            with torch.no_grad():
+                model_output = self.model(**encoded_input)
+
+        # Mean pooling
+        attention_mask = encoded_input['attention_mask']
+        token_embeddings = model_output[0]
+        input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
+        sum_embeddings = torch.sum(token_embeddings * input_mask_expanded, 1)
+        sum_mask = torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+        return (sum_embeddings / sum_mask).numpy()
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Returns the number of model tokens in each text, excluding special tokens."""
+        if not texts:
+            return []
+        with self._lock:
+            encoded = self.tokenizer(texts, add_special_tokens=False)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def _encode_uncached(self, texts: List[str]) -> np.ndarray:
+        if self.batcher is not None:
+            # Rows come back as views into whichever batch the dispatcher packed them into
+            return np.stack(self.batcher.embed(texts))
+        return self.forward(texts)
+
+    def encode(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        if self.cache is None:
+            embeddings = self._encode_uncached(texts)
+        else:
+            cached = self.cache.get_many(texts)
+            # Embed each distinct missing text once, even if it repeats within the call
+            missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+            if missing:
+                computed = self._encode_uncached(missing)
+                self.cache.put_many(missing, computed)
+                by_text = dict(zip(missing, computed))
+                cached = [vector if vector is not None else by_text[text] for text, vector in zip(texts, cached)]
+            embeddings = np.stack(cached).astype(np.float32, copy=False)
+        if normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
+
+    def embed(self, texts: Union[str, List[str]], normalize: bool = False) -> np.ndarray:
+        """Embeds texts into a contiguous (len(texts), dim) float32 array."""
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = [t.replace("\n", " ") for t in texts]
+        if not texts:
+            return np.empty((0, self.model.config.hidden_size), dtype=np.float32)
+        return self.encode(texts, normalize=normalize)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats() if self.cache is not None else {}
+
+
+def get_embedding_engine(model_name: str = DEFAULT_EMBEDDING_MODEL, max_seq_length: int = None) -> EmbeddingEngine:
+    return EmbeddingEngine.get_instance(model_name, max_seq_length)
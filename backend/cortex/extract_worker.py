@@ -0,0 +1,19 @@
+# cortex/extract_worker.py
+"""
+Entry module of the ingest extraction processes.
+
+Workers import only this module (preloaded by the forkserver), never the app's main
+script, so keep its imports limited to what extraction needs.
+"""
+
+import pytesseract
+import textract
+from PIL import Image
+
+
+def extract_document_text(file_path: str) -> str:
+    return textract.process(file_path).decode('utf-8')
+
+
+def extract_image_text(image_path: str) -> str:
+    return pytesseract.image_to_string(Image.open(image_path))
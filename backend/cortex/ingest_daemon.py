@@ -0,0 +1,357 @@
+# cortex/ingest_daemon.py
+
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/ingest_daemon.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+INGEST_WATCH_EXTENSIONS = os.getenv(
+    'INGEST_WATCH_EXTENSIONS', '.txt,.md,.rst,.pdf,.doc,.docx,.rtf,.odt,.html,.htm,.pptx,.csv,.json,.epub'
+)
+INGEST_DEBOUNCE_SECONDS = float(os.getenv('INGEST_DEBOUNCE_SECONDS', '2.0'))
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '1024'))
+INGEST_DAEMON_BATCH_SIZE = int(os.getenv('INGEST_DAEMON_BATCH_SIZE', '32'))
+INGEST_POLL_INTERVAL = float(os.getenv('INGEST_POLL_INTERVAL', '5.0'))
+
+UPSERT = 'upsert'
+REMOVE = 'remove'
+
+
+class PollingWatcher:
+    """
+    Fallback watcher that snapshots (mtime, size) of every file under the watched paths and
+    reports differences, for platforms or filesystems without inotify (network mounts, or
+    when watchdog is not installed).
+    """
+
+    def __init__(self, paths: List[str], callback, interval: float = INGEST_POLL_INTERVAL):
+        self.paths = paths
+        self.callback = callback
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ingest-poller', daemon=True)
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        snapshot = {}
+        for path in iter_files(self.paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = self._scan()
+            for path, signature in current.items():
+                if self._snapshot.get(path) != signature:
+                    self.callback(UPSERT, path)
+            for path in self._snapshot.keys() - current.keys():
+                self.callback(REMOVE, path)
+            self._snapshot = current
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def iter_files(paths: Iterable[str]) -> Iterable[str]:
+    for root in paths:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                yield os.path.abspath(os.path.join(directory, filename))
+
+
+def create_watcher(paths: List[str], callback, force_polling: bool = False):
+    """
+    Returns a started-on-demand watcher: watchdog's native observer (inotify on Linux) when
+    available, otherwise PollingWatcher.
+    """
+    if not force_polling:
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning("watchdog is not installed; falling back to polling.")
+        else:
+            class _Handler(FileSystemEventHandler):
+                def on_created(self, event):
+                    if not event.is_directory:
+                        callback(UPSERT, event.src_path)
+
+                def on_modified(self, event):
+                    if not event.is_directory:
+                        callback(UPSERT, event.src_path)
+
+                def on_deleted(self, event):
+                    if not event.is_directory:
+                        callback(REMOVE, event.src_path)
+
+                def on_moved(self, event):
+                    if not event.is_directory:
+                        callback(REMOVE, event.src_path)
+                        callback(UPSERT, event.dest_path)
+
+            try:
+                observer = Observer()
+                for path in paths:
+                    observer.schedule(_Handler(), path, recursive=True)
+                return observer
+            except OSError as e:
+                # e.g. the inotify watch limit is exhausted
+                logger.warning(f"Native file watcher unavailable ({e}); falling back to polling.")
+    return PollingWatcher(paths, callback)
+
+
+class IngestDaemon:
+    """
+    Keeps a KnowledgeIngestion store in sync with a set of local paths.
+
+    File system events are coalesced per path and only released once a path has been quiet
+    for debounce_seconds, so an editor's save burst or a large copy produces one ingest per
+    file. Released paths go into a bounded queue; when ingestion falls behind, the debouncer
+    blocks on the full queue (backpressure) while new events keep coalescing in place. The
+    worker drains the queue in batches so embeddings are computed in large batches, and the
+    source registry makes re-ingesting an unchanged file a stat call.
+
+    The daemon usually runs in its own process next to the web app, both writing to the
+    user's store. With the local backend that is safe: vector rows are reserved under the
+    store's file lock, and the lexical index and source registry are SQLite databases that
+    serialize writers. Documents are synced without a cross-process lock, so the daemon
+    must be the only process ingesting the watched files. Deep Lake datasets take a single
+    writer, so with that backend the web app must not write while the daemon runs.
+
+    Args:
+        ki (KnowledgeIngestion): The knowledge store to keep in sync.
+        paths (List[str]): Files or directories to watch recursively.
+        extensions (Iterable[str]): File suffixes to ingest.
+        debounce_seconds (float): Quiet period before a changed path is ingested.
+        max_queue_size (int): Bound on paths waiting for ingestion.
+        batch_size (int): Maximum paths ingested per batch.
+        force_polling (bool): Use the polling watcher even when inotify is available.
+    """
+
+    def __init__(self, ki, paths: List[str], extensions: Iterable[str] = None,
+                 debounce_seconds: float = INGEST_DEBOUNCE_SECONDS, max_queue_size: int = INGEST_QUEUE_SIZE,
+                 batch_size: int = INGEST_DAEMON_BATCH_SIZE, force_polling: bool = False):
+        self.ki = ki
+        self.paths = [os.path.abspath(path) for path in paths]
+        if extensions is None:
+            extensions = INGEST_WATCH_EXTENSIONS.split(',')
+        self.extensions = {extension.strip().lower() for extension in extensions if extension.strip()}
+        self.debounce_seconds = debounce_seconds
+        self.batch_size = batch_size
+        self.force_polling = force_polling
+        self.queue = queue.Queue(maxsize=max_queue_size)
+
+        # path -> [action, first event time, last event time]
+        self._pending: Dict[str, List[Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._threads: List[threading.Thread] = []
+
+        self._metrics_lock = threading.Lock()
+        self._processed = 0
+        self._failed = 0
+        self._batches = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    def _wanted(self, path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in self.extensions
+
+    def on_event(self, action: str, path: str) -> None:
+        """Records a file change; repeated events for one path collapse into its latest action."""
+        path = os.path.abspath(path)
+        if not self._wanted(path):
+            return
+        now = time.monotonic()
+        with self._pending_lock:
+            entry = self._pending.get(path)
+            if entry is None:
+                self._pending[path] = [action, now, now]
+            else:
+                entry[0] = action
+                entry[2] = now
+
+    def initial_sync(self) -> None:
+        """Queues every watched file and the removal of registered files that no longer exist."""
+        seen = set()
+        for path in iter_files(self.paths):
+            if self._wanted(path):
+                seen.add(path)
+                self.on_event(UPSERT, path)
+        for path in self.ki.source_registry.sources():
+            if path not in seen and any(path == root or path.startswith(root + os.sep) for root in self.paths):
+                self.on_event(REMOVE, path)
+
+    def _debounce(self):
+        interval = max(self.debounce_seconds / 4, 0.05)
+        while not self._stop.wait(interval):
+            now = time.monotonic()
+            with self._pending_lock:
+                ready = [
+                    (path, entry[0], entry[1]) for path, entry in self._pending.items()
+                    if now - entry[2] >= self.debounce_seconds
+                ]
+                for path, _, _ in ready:
+                    del self._pending[path]
+            for path, action, first_seen in sorted(ready, key=lambda item: item[2]):
+                # Blocks while the queue is full; later events for this path coalesce in _pending
+                while not self._stop.is_set():
+                    try:
+                        self.queue.put((action, path, first_seen), timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+    def _next_batch(self) -> List[Tuple[str, str, float]]:
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while not self._stop.is_set() or not self.queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self.process_batch(batch)
+
+    def process_batch(self, batch: List[Tuple[str, str, float]]) -> None:
+        # Events only say that a path changed; whether it still exists decides what to do
+        first_seen = {}
+        for _, path, seen in batch:
+            first_seen[path] = min(seen, first_seen.get(path, seen))
+        upserts = [path for path in first_seen if os.path.exists(path)]
+        removals = [path for path in first_seen if not os.path.exists(path)]
+
+        failed = 0
+        for path in removals:
+            try:
+                self.ki.remove_document(path)
+            except Exception as e:
+                failed += 1
+                logger.error(f"Error removing '{path}' from the knowledge store: {e}")
+        if upserts:
+            try:
+                results = self.ki.ingest_batch([('document', path, {}) for path in upserts])
+                failed += sum(1 for result in results if result['status'] == 'error')
+            except Exception as e:
+                failed += len(upserts)
+                logger.error(f"Error ingesting batch of {len(upserts)} files: {e}")
+
+        now = time.monotonic()
+        lag = max(now - seen for seen in first_seen.values())
+        with self._metrics_lock:
+            self._processed += len(first_seen) - failed
+            self._failed += failed
+            self._batches += 1
+            self._last_lag = lag
+            self._max_lag = max(self._max_lag, lag)
+        logger.info(
+            f"Ingest batch: {len(upserts)} upserted, {len(removals)} removed, {failed} failed, "
+            f"lag {lag:.2f}s, queue depth {self.queue.qsize()}"
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: 'queue_depth' (paths waiting for ingestion), 'queue_capacity',
+            'debouncing' (paths still settling), 'processed', 'failed', 'batches', and
+            'last_lag_seconds' / 'max_lag_seconds' from a path's first event to its ingestion.
+        """
+        with self._pending_lock:
+            debouncing = len(self._pending)
+        with self._metrics_lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'queue_capacity': self.queue.maxsize,
+                'debouncing': debouncing,
+                'processed': self._processed,
+                'failed': self._failed,
+                'batches': self._batches,
+                'last_lag_seconds': self._last_lag,
+                'max_lag_seconds': self._max_lag,
+                'watcher': type(self._watcher).__name__ if self._watcher is not None else None,
+            }
+
+    def start(self, initial_sync: bool = True) -> None:
+        self._stop.clear()
+        self._watcher = create_watcher(self.paths, self.on_event, self.force_polling)
+        self._watcher.start()
+        self._threads = [
+            threading.Thread(target=self._debounce, name='ingest-debounce', daemon=True),
+            threading.Thread(target=self._work, name='ingest-worker', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        if initial_sync:
+            self.initial_sync()
+        logger.info(f"Watching {self.paths} with {type(self._watcher).__name__}.")
+
+    def stop(self) -> None:
+        """Stops watching and finishes ingesting whatever is already queued."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            if hasattr(self._watcher, 'join'):
+                self._watcher.join()
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        logger.info(f"Ingest daemon stopped: {self.metrics()}")
+
+
+def main():
+    from cortex.cortex import KnowledgeIngestion
+
+    parser = argparse.ArgumentParser(description='Keep a user\'s knowledge store in sync with local folders')
+    parser.add_argument('paths', nargs='+', help='Files or directories to watch')
+    parser.add_argument('--user_id', required=True)
+    parser.add_argument('--polling', action='store_true', help='Poll instead of using inotify')
+    parser.add_argument('--metrics_interval', type=float, default=60.0)
+    args = parser.parse_args()
+
+    if os.getenv('CORTEX_VECTOR_BACKEND') == 'deeplake' or (
+            not os.getenv('CORTEX_VECTOR_BACKEND') and os.getenv('ACTIVELOOP_TOKEN')):
+        logger.warning("Deep Lake allows one writer per dataset; stop other writers to this user's store.")
+    daemon = IngestDaemon(KnowledgeIngestion(user_id=args.user_id), args.paths, force_polling=args.polling)
+    daemon.start()
+    try:
+        while True:
+            time.sleep(args.metrics_interval)
+            logger.info(f"Ingest daemon metrics: {daemon.metrics()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        daemon.ki.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# cortex/lexical_index.py
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, List
+
+from cortex.search_filter import SearchFilter, filter_columns
+
+# Words, plus compounds such as 'gpt-4o', 'v2.3.1' or 'ERR_42' kept whole alongside their parts
+TOKEN_RE = re.compile(r"\w+(?:[-.]\w+)*")
+RRF_K = int(os.getenv('CORTEX_RRF_K', '60'))
+
+EMPTY_RESULTS = {'id': [], 'text': [], 'metadata': [], 'score': []}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if '-' in token or '.' in token:
+            tokens.extend(part for part in re.split(r'[-.]', token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    On-disk BM25 inverted index in SQLite.
+
+    Postings (term, id, term frequency) are written as records are added, so the index is
+    always current with its vector store and a keyword query never touches the embedding
+    model. Text and metadata are kept with each document so keyword results are complete.
+
+    Args:
+        db_path (str): SQLite file for the index.
+        k1 (float): Term-frequency saturation.
+        b (float): Document-length normalization.
+    """
+
+    def __init__(self, db_path: str, k1: float = 1.2, b: float = 0.75):
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id TEXT PRIMARY KEY, length INTEGER NOT NULL, text TEXT, metadata TEXT, ts REAL, category TEXT, source TEXT)"
+        )
+        columns = {name for _, name, *_ in self._conn.execute("PRAGMA table_info(docs)")}
+        if 'ts' not in columns:
+            self._conn.execute("ALTER TABLE docs ADD COLUMN ts REAL")
+            self._conn.execute("ALTER TABLE docs ADD COLUMN category TEXT")
+            self._conn.execute("ALTER TABLE docs ADD COLUMN source TEXT")
+            self._conn.executemany(
+                "UPDATE docs SET ts = ?, category = ?, source = ? WHERE id = ?",
+                [(*filter_columns(json.loads(metadata) if metadata else {}), record_id)
+                 for record_id, metadata in self._conn.execute("SELECT id, metadata FROM docs").fetchall()]
+            )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_term ON postings (term)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_id ON postings (id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def _stat(self, name: str) -> int:
+        row = self._conn.execute("SELECT value FROM stats WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, name: str, delta: int) -> None:
+        self._conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, delta, delta)
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._stat('doc_count')
+
+    def _remove(self, ids: List[str]) -> None:
+        # Drops documents with their postings and stats; the caller holds the lock and commits
+        placeholders = ",".join("?" * len(ids))
+        count, total_length = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE id IN ({placeholders})", ids
+        ).fetchone()
+        self._conn.execute(f"DELETE FROM postings WHERE id IN ({placeholders})", ids)
+        self._conn.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", ids)
+        self._bump('doc_count', -count)
+        self._bump('total_length', -total_length)
+
+    def add(self, ids: List[str], texts: List[str], metadata: List[Dict[str, Any]] = None) -> None:
+        """
+        Indexes documents, replacing any already indexed under the same id.
+
+        Re-adding happens on write-behind replay and re-ingest; the old postings and stats
+        are removed in the same transaction so term and document counts stay exact.
+        """
+        if metadata is None:
+            metadata = [{} for _ in ids]
+        # The last occurrence of an id repeated within one call wins
+        latest = {record_id: (text, meta) for record_id, text, meta in zip(ids, texts, metadata)}
+        docs, postings, total_length = [], [], 0
+        for record_id, (text, meta) in latest.items():
+            counts = Counter(tokenize(text or ''))
+            length = sum(counts.values())
+            total_length += length
+            docs.append((record_id, length, text, json.dumps(meta, default=str), *filter_columns(meta)))
+            postings.extend((term, record_id, tf) for term, tf in counts.items())
+        if not docs:
+            return
+        with self._lock:
+            self._remove(list(latest))
+            self._conn.executemany(
+                "INSERT INTO docs (id, length, text, metadata, ts, category, source) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                docs
+            )
+            self._conn.executemany("INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)", postings)
+            self._bump('doc_count', len(docs))
+            self._bump('total_length', total_length)
+            self._conn.commit()
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._remove(list(ids))
+            self._conn.commit()
+
+    def update_metadata(self, ids: List[str], metadata: List[Dict[str, Any]]) -> None:
+        """Merges metadata[i] into the stored metadata of document ids[i]."""
+        if not ids:
+            return
+        ids = list(ids)
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            stored = dict(self._conn.execute(
+                f"SELECT id, metadata FROM docs WHERE id IN ({placeholders})", ids
+            ).fetchall())
+            rows = []
+            for record_id, updates in zip(ids, metadata):
+                if record_id not in stored:
+                    continue
+                merged = {**(json.loads(stored[record_id]) if stored[record_id] else {}), **updates}
+                rows.append((json.dumps(merged, default=str), *filter_columns(merged), record_id))
+            self._conn.executemany("UPDATE docs SET metadata = ?, ts = ?, category = ?, source = ? WHERE id = ?", rows)
+            self._conn.commit()
+
+    def search(self, query: str, k: int = 4, filter: SearchFilter = None) -> Dict[str, List[Any]]:
+        """Returns the k best BM25 matches among documents matching filter, in the vector store result format."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return dict(EMPTY_RESULTS)
+        placeholders = ",".join("?" * len(terms))
+        where, filter_params = filter.sql('d') if filter is not None else ('1', [])
+        with self._lock:
+            doc_count = self._stat('doc_count')
+            if not doc_count:
+                return dict(EMPTY_RESULTS)
+            avg_length = self._stat('total_length') / doc_count
+            document_frequency = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+            ).fetchall())
+            scores = {}
+            for term, record_id, tf, length in self._conn.execute(
+                f"SELECT p.term, p.id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id "
+                f"WHERE p.term IN ({placeholders}) AND {where}", terms + filter_params
+            ):
+                df = document_frequency[term]
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                norm = tf + self.k1 * (1 - self.b + self.b * length / max(avg_length, 1e-9))
+                scores[record_id] = scores.get(record_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            if not top:
+                return dict(EMPTY_RESULTS)
+            top_ids = [record_id for record_id, _ in top]
+            found = {
+                record_id: (text, metadata)
+                for record_id, text, metadata in self._conn.execute(
+                    f"SELECT id, text, metadata FROM docs WHERE id IN ({','.join('?' * len(top_ids))})", top_ids
+                )
+            }
+        return {
+            'id': top_ids,
+            'text': [found[record_id][0] for record_id in top_ids],
+            'metadata': [json.loads(found[record_id][1]) if found[record_id][1] else {} for record_id in top_ids],
+            'score': [score for _, score in top],
+        }
+
+
+def reciprocal_rank_fusion(result_sets: List[Dict[str, List[Any]]], k: int, rrf_k: int = RRF_K) -> Dict[str, List[Any]]:
+    """
+    Fuses ranked result sets by reciprocal rank: each record scores sum(1 / (rrf_k + rank)).
+
+    Rank-based fusion needs no score calibration between BM25 and cosine similarity. The
+    returned 'score' is the fused score; 'source_scores' keeps each input's raw score.
+    """
+    fused, records = {}, {}
+    for set_index, results in enumerate(result_sets):
+        for rank, (record_id, text, metadata, score) in enumerate(
+            zip(results.get('id', []), results.get('text', []), results.get('metadata', []), results.get('score', []))
+        ):
+            fused[record_id] = fused.get(record_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+            entry = records.setdefault(record_id, [text, metadata, [None] * len(result_sets)])
+            entry[2][set_index] = score
+    top = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return {
+        'id': [record_id for record_id, _ in top],
+        'text': [records[record_id][0] for record_id, _ in top],
+        'metadata': [records[record_id][1] for record_id, _ in top],
+        'score': [score for _, score in top],
+        'source_scores': [records[record_id][2] for record_id, _ in top],
+    }
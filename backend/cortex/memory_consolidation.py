@@ -0,0 +1,254 @@
+# cortex/memory_consolidation.py
+
+import argparse
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from cortex.vector_store import BaseVectorStore, create_vector_store
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/memory_consolidation.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+# Turns younger than this stay in the hot tier as individual records
+MEMORY_HOT_DAYS = float(os.getenv('MEMORY_HOT_DAYS', '7'))
+MEMORY_CLUSTER_WINDOW_HOURS = float(os.getenv('MEMORY_CLUSTER_WINDOW_HOURS', '24'))
+MEMORY_CLUSTER_THRESHOLD = float(os.getenv('MEMORY_CLUSTER_THRESHOLD', '0.75'))
+MEMORY_SUMMARY_TURNS = int(os.getenv('MEMORY_SUMMARY_TURNS', '3'))
+# A tier's results count as good enough to stop the cascade at this similarity
+MEMORY_TIER_MIN_SCORE = float(os.getenv('MEMORY_TIER_MIN_SCORE', '0.5'))
+
+EMPTY_RESULTS = {'id': [], 'text': [], 'metadata': [], 'score': []}
+
+
+def parse_datetime(value) -> datetime:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def cluster_turns(timestamps: List[datetime], embeddings: np.ndarray, window: timedelta, threshold: float) -> List[List[int]]:
+    """
+    Groups turns that fall in the same time window and are similar to each other.
+
+    Turns are walked in time order and split into consecutive windows; within a window each
+    turn joins the cluster whose centroid it is most similar to, or starts a new cluster
+    when no centroid reaches threshold.
+
+    Returns:
+        List[List[int]]: Clusters as lists of positions into timestamps/embeddings, in time order.
+    """
+    order = sorted(range(len(timestamps)), key=lambda i: timestamps[i])
+    clusters = []
+    window_start = None
+    centroids, members = [], []
+    for i in order:
+        if window_start is None or timestamps[i] - window_start > window:
+            clusters.extend(members)
+            window_start = timestamps[i]
+            centroids, members = [], []
+        vector = embeddings[i]
+        if centroids:
+            sums = np.stack(centroids)
+            similarities = (sums / np.linalg.norm(sums, axis=1, keepdims=True)) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                centroids[best] = centroids[best] + vector
+                members[best].append(i)
+                continue
+        centroids.append(vector.copy())
+        members.append([i])
+    clusters.extend(members)
+    return clusters
+
+
+def extractive_summary(texts: List[str], embeddings: np.ndarray, centroid: np.ndarray, max_turns: int = MEMORY_SUMMARY_TURNS) -> str:
+    """Keeps the turns closest to the cluster centroid, in their original order."""
+    if len(texts) == 1:
+        return texts[0]
+    closest = sorted(np.argsort(-(embeddings @ centroid))[:max_turns].tolist())
+    header = f"Summary of {len(texts)} related conversation turns:"
+    return "\n".join([header] + [texts[i] for i in closest])
+
+
+class MemoryConsolidator:
+    """
+    Moves old conversation turns out of the hot memory store.
+
+    Turns older than the cutoff are clustered by time window and embedding similarity. Each
+    cluster becomes one summary record in the warm store, embedded at the cluster centroid and
+    linking to its originals, which are archived (with their embeddings) in the cold store
+    and deleted from the hot one. The hot tier then only holds recent turns, and the warm
+    tier grows with the number of topics rather than the number of turns.
+
+    A run first tags its hot turns, and every record it writes, with a consolidation_id.
+    Tagged turns still in the hot store mean an earlier run stopped part way; the next run
+    deletes that run's warm and cold records before consolidating the turns again, so a
+    crash never leaves a turn both in the hot tier and archived. Runs on one set of stores
+    must not overlap.
+
+    Args:
+        hot (BaseVectorStore): Store of individual recent turns.
+        warm (BaseVectorStore): Store of cluster summaries.
+        cold (BaseVectorStore): Archive of consolidated turns.
+        summarize (Callable): Optional (texts) -> summary text, e.g. backed by the chat model;
+            defaults to an extractive summary.
+        window_hours (float): Turns further apart than this are never clustered together.
+        threshold (float): Minimum cosine similarity to a cluster's centroid to join it.
+    """
+
+    def __init__(self, hot: BaseVectorStore, warm: BaseVectorStore, cold: BaseVectorStore,
+                 summarize: Callable[[List[str]], str] = None,
+                 window_hours: float = MEMORY_CLUSTER_WINDOW_HOURS, threshold: float = MEMORY_CLUSTER_THRESHOLD):
+        self.hot = hot
+        self.warm = warm
+        self.cold = cold
+        self.summarize = summarize
+        self.window = timedelta(hours=window_hours)
+        self.threshold = threshold
+
+    def consolidate(self, older_than: datetime) -> Dict[str, int]:
+        """
+        Consolidates every hot turn recorded before older_than.
+
+        Returns:
+            Dict[str, int]: Number of 'turns' archived and 'summaries' written.
+        """
+        records = self.hot.records()
+        selected = [
+            (i, timestamp) for i, timestamp in (
+                (i, parse_datetime(metadata.get('datetime'))) for i, metadata in enumerate(records['metadata'])
+            )
+            if timestamp is not None and timestamp < older_than
+        ]
+        if not selected:
+            return {'turns': 0, 'summaries': 0}
+        positions = [i for i, _ in selected]
+        interrupted = {
+            records['metadata'][i]['consolidation_id'] for i in positions
+            if records['metadata'][i].get('consolidation_id')
+        }
+        if interrupted:
+            self._discard_partial(interrupted)
+        run_id = uuid.uuid4().hex
+        self.hot.update_metadata([records['id'][i] for i in positions], [{'consolidation_id': run_id}] * len(positions))
+        timestamps = [timestamp for _, timestamp in selected]
+        embeddings = records['embedding'][positions]
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        clusters = cluster_turns(timestamps, embeddings, self.window, self.threshold)
+        # Archive the originals first so a summary never points at ids that do not exist yet
+        archive_order = [member for cluster in clusters for member in cluster]
+        archived_ids = self.cold.add(
+            text=[records['text'][positions[m]] for m in archive_order],
+            embedding=embeddings[archive_order],
+            metadata=[{**records['metadata'][positions[m]], 'tier': 'cold', 'consolidation_id': run_id}
+                      for m in archive_order]
+        )
+
+        summaries, centroids, summary_metadata = [], [], []
+        offset = 0
+        for cluster in clusters:
+            texts = [records['text'][positions[m]] for m in cluster]
+            centroid = embeddings[cluster].sum(axis=0)
+            centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+            if self.summarize is not None and len(cluster) > 1:
+                summary = self.summarize(texts)
+            else:
+                summary = extractive_summary(texts, embeddings[cluster], centroid)
+            summaries.append(summary)
+            centroids.append(centroid)
+            summary_metadata.append({
+                'tier': 'warm',
+                'category': records['metadata'][positions[cluster[-1]]].get('category'),
+                'datetime': timestamps[cluster[-1]].isoformat(),
+                'start': timestamps[cluster[0]].isoformat(),
+                'end': timestamps[cluster[-1]].isoformat(),
+                'turn_count': len(cluster),
+                'archived_ids': archived_ids[offset:offset + len(cluster)],
+                'consolidation_id': run_id,
+            })
+            offset += len(cluster)
+        self.warm.add(text=summaries, embedding=np.stack(centroids), metadata=summary_metadata)
+        self.hot.delete([records['id'][i] for i in positions])
+        logger.info(f"Consolidated {len(positions)} memory turns into {len(clusters)} summaries.")
+        return {'turns': len(positions), 'summaries': len(clusters)}
+
+    def _discard_partial(self, run_ids) -> None:
+        # Only reached after a crash, so scanning the archive here is acceptable
+        for store in (self.warm, self.cold):
+            records = store.records()
+            stale = [
+                record_id for record_id, metadata in zip(records['id'], records['metadata'])
+                if (metadata or {}).get('consolidation_id') in run_ids
+            ]
+            store.delete(stale)
+        logger.warning(f"Discarded the output of {len(run_ids)} interrupted memory consolidation run(s).")
+
+
+def search_tiers(tiers: List[Tuple[str, BaseVectorStore]], search: Callable[[BaseVectorStore, int], Dict[str, List[Any]]],
+                 k: int, min_score: float = MEMORY_TIER_MIN_SCORE, by_tier: bool = False) -> Dict[str, List[Any]]:
+    """
+    Searches memory tiers in order, stopping once k results reach min_score.
+
+    Colder tiers are only scanned when the warmer ones cannot answer, so the common case
+    costs one search of the small hot store. search(store, k) runs the query against one
+    tier. The cutoff is applied to each result's 'vector_score' when the search reports one
+    (hybrid search, whose fused score is rank-based) and to 'score' otherwise; pass
+    min_score=None to search every tier (e.g. BM25). With by_tier, results are ordered by
+    tier before score, for scores that do not compare across stores (RRF, BM25).
+    Archived originals are dropped when a returned summary already covers them. Each
+    result's metadata gets its 'tier'.
+    """
+    hits = []
+    for position, (name, store) in enumerate(tiers):
+        results = search(store, k)
+        similarities = results.get('vector_score', results['score'])
+        for record_id, text, metadata, score, similarity in zip(
+            results['id'], results['text'], results['metadata'], results['score'], similarities
+        ):
+            hits.append((record_id, text, {**(metadata or {}), 'tier': name}, score, similarity, position))
+        if min_score is not None and sum(1 for hit in hits if hit[4] is not None and hit[4] >= min_score) >= k:
+            break
+    if not hits:
+        return dict(EMPTY_RESULTS)
+    covered = {record_id for hit in hits for record_id in hit[2].get('archived_ids') or []}
+    hits = [hit for hit in hits if hit[0] not in covered]
+    if by_tier:
+        hits.sort(key=lambda hit: (hit[5], -hit[3]))
+    else:
+        hits.sort(key=lambda hit: hit[3], reverse=True)
+    hits = hits[:k]
+    return {
+        'id': [hit[0] for hit in hits],
+        'text': [hit[1] for hit in hits],
+        'metadata': [hit[2] for hit in hits],
+        'score': [hit[3] for hit in hits],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consolidate old conversation memory into summaries')
+    parser.add_argument('--user_id', required=True)
+    parser.add_argument('--older_than_days', type=float, default=MEMORY_HOT_DAYS)
+    args = parser.parse_args()
+
+    path = f'memory_store_{args.user_id}'
+    consolidator = MemoryConsolidator(
+        create_vector_store(path), create_vector_store(f'{path}_warm'), create_vector_store(f'{path}_cold')
+    )
+    print(consolidator.consolidate(datetime.now() - timedelta(days=args.older_than_days)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# cortex/memory_journal.py
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the per-process writer registry guards the journal
+    fcntl = None
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/memory_journal.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+MEMORY_FLUSH_BATCH_SIZE = int(os.getenv('MEMORY_FLUSH_BATCH_SIZE', '64'))
+MEMORY_FLUSH_INTERVAL = float(os.getenv('MEMORY_FLUSH_INTERVAL', '1.0'))
+MEMORY_JOURNAL_FSYNC = os.getenv('MEMORY_JOURNAL_FSYNC', '1') == '1'
+# Truncate a fully flushed journal once it grows past this many bytes
+MEMORY_JOURNAL_COMPACT_BYTES = int(os.getenv('MEMORY_JOURNAL_COMPACT_BYTES', str(4 * 2 ** 20)))
+# Seconds to wait for another writer (e.g. one still closing) to release a journal
+MEMORY_JOURNAL_LOCK_TIMEOUT = float(os.getenv('MEMORY_JOURNAL_LOCK_TIMEOUT', '30'))
+
+
+class MemoryJournal:
+    """
+    Append-only JSON-lines journal of memory records with a flushed-up-to checkpoint.
+
+    The checkpoint is the byte offset of the first record not yet written to the memory
+    store; it is replaced atomically, so after a crash every record past it is replayed.
+    A journal has a single owner: it holds an exclusive lock on the file while open.
+
+    Args:
+        path (str): Journal file; the checkpoint is stored at '<path>.checkpoint'.
+        fsync (bool): fsync every append so acknowledged turns survive power loss.
+        lock_timeout (float): Seconds to wait for another owner to close the journal.
+    """
+
+    def __init__(self, path: str, fsync: bool = MEMORY_JOURNAL_FSYNC, lock_timeout: float = MEMORY_JOURNAL_LOCK_TIMEOUT):
+        self.path = path
+        self.checkpoint_path = f'{path}.checkpoint'
+        self.fsync = fsync
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        self._lock(lock_timeout)
+
+    def _lock(self, timeout: float) -> None:
+        # A second writer would replay the same records and compact() would truncate
+        # records it appended, so wait for the current owner and then give up
+        if fcntl is None:
+            return
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    raise RuntimeError(f"Memory journal '{self.path}' is in use by another writer")
+                time.sleep(0.05)
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Durably appends a record and returns the journal offset just past it."""
+        self._file.write(json.dumps(record).encode('utf-8') + b'\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def read_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def write_checkpoint(self, offset: int) -> None:
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def pending(self) -> List[Tuple[Dict[str, Any], int]]:
+        """Returns (record, end offset) for every record past the checkpoint."""
+        records = []
+        with open(self.path, 'rb') as f:
+            f.seek(self.read_checkpoint())
+            for line in iter(f.readline, b''):
+                if not line.endswith(b'\n'):
+                    # Torn final write: the turn was never acknowledged
+                    break
+                try:
+                    records.append((json.loads(line), f.tell()))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt journal line at offset {f.tell() - len(line)} in '{self.path}'")
+        return records
+
+    def compact(self) -> None:
+        """
+        Empties the journal; only valid when the checkpoint is at its end.
+
+        The checkpoint is reset before the file is truncated: a crash in between replays
+        already flushed records (at-least-once) instead of leaving a checkpoint past the
+        end of the new journal, which would skip the records appended after it.
+        """
+        self.write_checkpoint(0)
+        self._file.truncate(0)
+        self._file.seek(0)
+
+    def close(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+class WriteBehindMemory:
+    """
+    Write-behind front for a memory vector store.
+
+    append() only writes the record to the journal and returns; a background thread embeds
+    and adds queued records to the store in batches, then advances the journal checkpoint.
+    Records left unflushed by a crash are replayed on the next start. Delivery is
+    at-least-once: a crash between a store write and its checkpoint replays that batch.
+
+    Args:
+        store (BaseVectorStore): The memory vector store.
+        embedding_function (Callable): Embeds a list of texts.
+        journal_path (str): Journal file location.
+        batch_size (int): Maximum records embedded per store write.
+        flush_interval (float): Longest a record waits for a batch to fill.
+    """
+
+    def __init__(self, store, embedding_function: Callable, journal_path: str,
+                 batch_size: int = MEMORY_FLUSH_BATCH_SIZE, flush_interval: float = MEMORY_FLUSH_INTERVAL):
+        self.store = store
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal = MemoryJournal(journal_path)
+        self._key = os.path.abspath(journal_path)
+        # Handles given out by open_write_behind_memory(); the last close() stops the writer
+        self._users = 1
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._queue: List[Tuple[Dict[str, Any], int]] = self.journal.pending()
+        self._flushed_offset = self.journal.read_checkpoint()
+        self._appended_offset = self._queue[-1][1] if self._queue else self._flushed_offset
+        self._closed = False
+        if self._queue:
+            logger.info(f"Replaying {len(self._queue)} unflushed memory records from '{journal_path}'.")
+        self._thread = threading.Thread(target=self._run, name=f'memory-writer-{os.path.basename(journal_path)}', daemon=True)
+        self._thread.start()
+
+    def append(self, text: str, metadata: Dict[str, Any]) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("WriteBehindMemory is closed")
+            offset = self.journal.append({'text': text, 'metadata': metadata})
+            self._appended_offset = offset
+            self._queue.append(({'text': text, 'metadata': metadata}, offset))
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                # Wake the writer to start the flush_interval wait, or to write a full batch
+                self._cond.notify_all()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._queue and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                if self._queue and len(self._queue) < self.batch_size and not self._closed:
+                    # Give a partial batch a moment to fill
+                    self._cond.wait(self.flush_interval)
+                if not self._queue:
+                    if self._closed:
+                        return
+                    continue
+                batch = self._queue[:self.batch_size]
+            if not self._write(batch):
+                # Keep the records queued and journaled; retry after a pause, or on close
+                # leave them for replay at the next start
+                with self._cond:
+                    if self._closed:
+                        return
+                    self._cond.wait(self.flush_interval)
+                continue
+            with self._cond:
+                del self._queue[:len(batch)]
+                self._flushed_offset = batch[-1][1]
+                self.journal.write_checkpoint(self._flushed_offset)
+                if not self._queue and self._flushed_offset >= MEMORY_JOURNAL_COMPACT_BYTES:
+                    self.journal.compact()
+                    self._flushed_offset = self._appended_offset = 0
+                self._cond.notify_all()
+
+    def _write(self, batch) -> bool:
+        texts = [record['text'] for record, _ in batch]
+        try:
+            self.store.add(
+                text=texts,
+                embedding_function=self.embedding_function,
+                embedding_data=texts,
+                metadata=[record['metadata'] for record, _ in batch]
+            )
+            logger.info(f"Flushed {len(texts)} memory records.")
+            return True
+        except Exception as e:
+            logger.error(f"Error flushing {len(texts)} memory records: {e}")
+            return False
+
+    def flush(self, timeout: float = None) -> bool:
+        """Blocks until everything appended so far is in the store; returns False on timeout."""
+        with self._cond:
+            target = self._appended_offset
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._queue or self._flushed_offset >= target, timeout=timeout
+            )
+
+    def close(self, timeout: float = None) -> None:
+        """Flushes outstanding records and stops the writer thread once every handle is closed."""
+        with _writers_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            if _writers.get(self._key) is self:
+                del _writers[self._key]
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self.journal.close()
+
+
+_writers: Dict[str, WriteBehindMemory] = {}
+_writers_lock = threading.Lock()
+
+
+def open_write_behind_memory(store, embedding_function: Callable, journal_path: str, **kwargs) -> WriteBehindMemory:
+    """
+    Returns the process's WriteBehindMemory for journal_path, creating it on first use.
+
+    Writers are shared per path like vector stores; every caller closes its own handle and
+    the writer stops with the last one. A writer opened while the previous one is still
+    closing waits for it to release the journal, so nothing is replayed twice.
+    """
+    key = os.path.abspath(journal_path)
+    with _writers_lock:
+        memory = _writers.get(key)
+        if memory is None:
+            memory = _writers[key] = WriteBehindMemory(store, embedding_function, journal_path, **kwargs)
+        else:
+            memory._users += 1
+        return memory
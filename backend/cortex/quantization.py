@@ -0,0 +1,59 @@
+# cortex/quantization.py
+
+import numpy as np
+
+# Number of set bits in every byte value, for Hamming distances over packed codes
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class VectorQuantizer:
+    """
+    Compact codes for unit-normalized embeddings.
+
+    'int8' keeps one signed byte per dimension plus a float32 scale per vector (about 4x
+    smaller than float32) and scores by a scaled inner product. Each vector is scaled so
+    its largest component maps to 127: components of 384-d unit vectors are mostly below
+    0.1, so a fixed scale would use only a few of the 255 levels. 'binary' keeps one bit
+    per dimension (32x smaller) and scores by negative Hamming distance. Both are meant for
+    a coarse scan whose top candidates are re-ranked against the float32 vectors.
+
+    Args:
+        kind (str): 'int8' or 'binary'.
+    """
+
+    def __init__(self, kind: str):
+        if kind not in ('int8', 'binary'):
+            raise ValueError(f"Unsupported quantization '{kind}'")
+        self.kind = kind
+        self.dtype = np.int8 if kind == 'int8' else np.uint8
+
+    def code_width(self, dim: int) -> int:
+        # int8 rows end with the vector's float32 scale, stored as 4 bytes
+        return dim + 4 if self.kind == 'int8' else (dim + 7) // 8
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.kind == 'int8':
+            vectors = np.asarray(vectors, dtype=np.float32)
+            scale = (np.maximum(np.abs(vectors).max(axis=-1, keepdims=True), 1e-12) / 127.0).astype(np.float32)
+            codes = np.empty(vectors.shape[:-1] + (vectors.shape[-1] + 4,), dtype=np.int8)
+            codes[..., :-4] = np.clip(np.rint(vectors / scale), -127, 127)
+            codes[..., -4:] = scale.view(np.int8)
+            return codes
+        return np.packbits(vectors > 0, axis=-1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+        """Approximate similarity of every code row to a unit-normalized float32 query."""
+        out = np.empty(len(codes), dtype=np.float32)
+        if self.kind == 'int8':
+            query = np.asarray(query, dtype=np.float32)
+            for start in range(0, len(codes), block_rows):
+                block = codes[start:start + block_rows]
+                scale = np.ascontiguousarray(block[:, -4:]).view(np.float32)[:, 0]
+                out[start:start + len(block)] = (block[:, :-4].astype(np.float32) @ query) * scale
+        else:
+            query_bits = np.packbits(query > 0)
+            for start in range(0, len(codes), block_rows):
+                block = codes[start:start + block_rows]
+                distances = POPCOUNT[np.bitwise_xor(block, query_bits)].sum(axis=1, dtype=np.int32)
+                out[start:start + len(block)] = -distances
+        return out
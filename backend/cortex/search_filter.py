@@ -0,0 +1,114 @@
+# cortex/search_filter.py
+
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Recency decay for memory ranking: a result's score is boosted by up to MEMORY_RECENCY_WEIGHT
+# of itself, halving every MEMORY_RECENCY_HALF_LIFE_HOURS of age
+MEMORY_RECENCY_HALF_LIFE_HOURS = float(os.getenv('MEMORY_RECENCY_HALF_LIFE_HOURS', '72'))
+MEMORY_RECENCY_WEIGHT = float(os.getenv('MEMORY_RECENCY_WEIGHT', '0.2'))
+
+
+def to_timestamp(value) -> Optional[float]:
+    """Converts a datetime, ISO string or epoch number to epoch seconds; None if it can't."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return None
+
+
+def filter_columns(metadata: Dict[str, Any]) -> Tuple[Optional[float], Optional[str], Optional[str]]:
+    """The (timestamp, category, source) columns stores index for a record's metadata."""
+    metadata = metadata or {}
+    category = metadata.get('category')
+    source = metadata.get('source')
+    return (
+        to_timestamp(metadata.get('datetime')),
+        str(category) if category is not None else None,
+        str(source) if source is not None else None,
+    )
+
+
+class SearchFilter(NamedTuple):
+    """
+    Metadata constraints applied before the similarity scan.
+
+    start/end bound the record's 'datetime' (records without one never match a time bound);
+    category and source match the metadata fields of the same name exactly.
+    """
+    start: Any = None
+    end: Any = None
+    category: Optional[str] = None
+    source: Optional[str] = None
+
+    @property
+    def empty(self) -> bool:
+        return self.start is None and self.end is None and self.category is None and self.source is None
+
+    def sql(self, alias: str = '') -> Tuple[str, List[Any]]:
+        """Returns a WHERE fragment over the ts/category/source columns and its parameters."""
+        prefix = f'{alias}.' if alias else ''
+        clauses, params = [], []
+        if self.start is not None:
+            clauses.append(f'{prefix}ts >= ?')
+            params.append(to_timestamp(self.start))
+        if self.end is not None:
+            clauses.append(f'{prefix}ts <= ?')
+            params.append(to_timestamp(self.end))
+        if self.category is not None:
+            clauses.append(f'{prefix}category = ?')
+            params.append(self.category)
+        if self.source is not None:
+            clauses.append(f'{prefix}source = ?')
+            params.append(self.source)
+        return ' AND '.join(clauses) or '1', params
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        ts, category, source = filter_columns(metadata)
+        if self.start is not None and (ts is None or ts < to_timestamp(self.start)):
+            return False
+        if self.end is not None and (ts is None or ts > to_timestamp(self.end)):
+            return False
+        if self.category is not None and category != self.category:
+            return False
+        if self.source is not None and source != self.source:
+            return False
+        return True
+
+
+def apply_recency(results: Dict[str, List[Any]], half_life_hours: float = MEMORY_RECENCY_HALF_LIFE_HOURS,
+                  weight: float = MEMORY_RECENCY_WEIGHT, now: datetime = None, group_by: str = None) -> Dict[str, List[Any]]:
+    """
+    Boosts each result's score by weight * 0.5 ** (age / half-life) of itself and re-sorts.
+
+    The boost is relative so it behaves the same on cosine, BM25 and RRF scores. The raw
+    score is kept as 'similarity'; results without a 'datetime' get no boost. With group_by
+    (a metadata key such as 'tier'), results are only re-sorted within their group and the
+    groups keep the order in which they first appear.
+    """
+    if not results or not results.get('id') or weight == 0:
+        return results
+    now_ts = (now or datetime.now()).timestamp()
+    half_life = max(half_life_hours, 1e-9) * 3600.0
+    rescored, groups = [], {}
+    for i, (metadata, score) in enumerate(zip(results['metadata'], results['score'])):
+        ts = to_timestamp((metadata or {}).get('datetime'))
+        decay = math.pow(0.5, max(now_ts - ts, 0.0) / half_life) if ts is not None else 0.0
+        group = groups.setdefault((metadata or {}).get(group_by), len(groups)) if group_by else 0
+        rescored.append((score + abs(score) * weight * decay, i, group))
+    rescored.sort(key=lambda item: (item[2], -item[0]))
+    order = [i for _, i, _ in rescored]
+    reranked = {key: [values[i] for i in order] for key, values in results.items() if isinstance(values, list)}
+    reranked['similarity'] = [results['score'][i] for i in order]
+    reranked['score'] = [score for score, _, _ in rescored]
+    return reranked
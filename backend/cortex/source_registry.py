@@ -0,0 +1,166 @@
+# cortex/source_registry.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class SourceRecord(NamedTuple):
+    path: str
+    content_hash: str
+    mtime: float
+    size: int
+
+
+class SourceRegistry:
+    """
+    Tracks which files have been ingested into a vector store and which records hold their chunks.
+
+    For every source it keeps the extracted text's hash, the file's mtime and size, and one row
+    per stored chunk (chunk hash, record id, chunk index). Re-ingesting a file can then skip
+    unchanged files without extracting them, and only embed chunks whose hash is new.
+
+    Args:
+        db_path (str): SQLite file, normally stored next to the vector store it describes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "path TEXT PRIMARY KEY, content_hash TEXT NOT NULL, mtime REAL NOT NULL, size INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "path TEXT NOT NULL, chunk_hash TEXT NOT NULL, record_id TEXT NOT NULL, chunk_index INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path)")
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_path(path: str) -> str:
+        return os.path.abspath(path)
+
+    def get(self, path: str) -> Optional[SourceRecord]:
+        path = self.normalize_path(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, content_hash, mtime, size FROM sources WHERE path = ?", (path,)
+            ).fetchone()
+        return SourceRecord(*row) if row else None
+
+    def is_unchanged_on_disk(self, path: str) -> bool:
+        """True when the file's mtime and size match the last ingest, so extraction can be skipped."""
+        record = self.get(path)
+        if record is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return record.mtime == stat.st_mtime and record.size == stat.st_size
+
+    def get_chunks(self, path: str) -> List[Tuple[str, str, int]]:
+        path = self.normalize_path(path)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT chunk_hash, record_id, chunk_index FROM chunks WHERE path = ? ORDER BY chunk_index", (path,)
+            ).fetchall()
+
+    def touch(self, path: str) -> None:
+        """Records a new mtime/size for a file whose extracted content did not change."""
+        stat = os.stat(path)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sources SET mtime = ?, size = ?, updated_at = ? WHERE path = ?",
+                (stat.st_mtime, stat.st_size, time.time(), self.normalize_path(path))
+            )
+            self._conn.commit()
+
+    def record(self, path: str, text_hash: str, chunks: List[Tuple[str, str, int]], stat: os.stat_result = None) -> None:
+        """Replaces the registry entry of path with its new content hash and chunk records."""
+        stat = stat or os.stat(path)
+        path = self.normalize_path(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (path, content_hash, mtime, size, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (path, text_hash, stat.st_mtime, stat.st_size, time.time())
+            )
+            self._conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+            self._conn.executemany(
+                "INSERT INTO chunks (path, chunk_hash, record_id, chunk_index) VALUES (?, ?, ?, ?)",
+                [(path, chunk_hash, record_id, chunk_index) for chunk_hash, record_id, chunk_index in chunks]
+            )
+            self._conn.commit()
+
+    def remove(self, path: str) -> List[str]:
+        """Forgets path and returns the record ids that held its chunks."""
+        path = self.normalize_path(path)
+        with self._lock:
+            record_ids = [record_id for (record_id,) in self._conn.execute(
+                "SELECT record_id FROM chunks WHERE path = ?", (path,)
+            )]
+            self._conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+            self._conn.commit()
+        return record_ids
+
+    def sources(self) -> Dict[str, SourceRecord]:
+        with self._lock:
+            rows = self._conn.execute("SELECT path, content_hash, mtime, size FROM sources").fetchall()
+        return {row[0]: SourceRecord(*row) for row in rows}
+
+
+class DocumentDiff(NamedTuple):
+    new: List[Tuple[object, str]]
+    kept: List[Tuple[str, str, int]]
+    stale_ids: List[str]
+    # (record_id, chunk) of kept chunks whose index or offsets may have changed
+    moved: List[Tuple[str, object]] = []
+
+
+def diff_chunks(previous: List[Tuple[str, str, int]], chunks) -> DocumentDiff:
+    """
+    Matches a document's new chunks against the chunk records of its previous ingest.
+
+    Args:
+        previous (List[Tuple[str, str, int]]): (chunk_hash, record_id, chunk_index) rows from the registry.
+        chunks (Iterable[Chunk]): The document's chunks in order.
+
+    Returns:
+        DocumentDiff: Chunks that need embedding (with their hashes), registry rows for chunks
+        whose record can be kept (re-indexed to their new position), record ids to delete, and
+        the kept records whose stored chunk_index/offsets are out of date: those whose index
+        changed or that follow a new chunk, which may have shifted the text before them.
+    """
+    available = {}
+    for chunk_hash, record_id, chunk_index in previous:
+        available.setdefault(chunk_hash, []).append((record_id, chunk_index))
+    new, kept, moved = [], [], []
+    for chunk in chunks:
+        chunk_hash = content_hash(chunk.text)
+        records = available.get(chunk_hash)
+        if records:
+            record_id, previous_index = records.pop()
+            kept.append((chunk_hash, record_id, chunk.index))
+            if new or previous_index != chunk.index:
+                moved.append((record_id, chunk))
+        else:
+            new.append((chunk, chunk_hash))
+    stale_ids = [record_id for records in available.values() for record_id, _ in records]
+    return DocumentDiff(new, kept, stale_ids, moved)
+
+
+def chunk_position(chunk) -> Dict[str, int]:
+    """The metadata fields locating a chunk in its document."""
+    return {'chunk_index': chunk.index, 'start_offset': chunk.start, 'end_offset': chunk.end}
@@ -0,0 +1,738 @@
+# cortex/vector_store.py
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+from cortex.ann_index import create_ann_index
+from cortex.lexical_index import BM25Index, reciprocal_rank_fusion
+from cortex.search_filter import SearchFilter, filter_columns
+from cortex.quantization import VectorQuantizer
+
+# Configure Logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/vector_store.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+def open_matrix(path: str, dtype, cols: int, capacity: int) -> np.memmap:
+    """Opens a row-major memory-mapped matrix, growing the file to at least capacity rows."""
+    row_bytes = cols * np.dtype(dtype).itemsize
+    current = os.path.getsize(path) if os.path.exists(path) else 0
+    if current < capacity * row_bytes:
+        with open(path, 'ab') as f:
+            f.truncate(capacity * row_bytes)
+    rows = max(current, capacity * row_bytes) // row_bytes
+    return np.memmap(path, dtype=dtype, mode='r+', shape=(rows, cols))
+
+
+class BaseVectorStore(ABC):
+    """
+    Interface shared by the cortex vector store backends.
+
+    Mirrors the subset of Deep Lake's VectorStore API that KnowledgeIngestion and Cortex use,
+    so search results are dicts of parallel lists: 'id', 'text', 'metadata' and 'score'
+    (higher is more similar). A SearchFilter restricts a search to records whose metadata
+    matches it.
+    """
+
+    # Stores with a lexical index also answer keyword_search and hybrid_search
+    supports_keyword = False
+
+    @abstractmethod
+    def add(self, text: List[str], embedding_function: Callable = None, embedding_data: List[str] = None,
+            metadata: List[Dict[str, Any]] = None, embedding=None) -> List[str]:
+        """Stores records and returns their ids. Either embedding or embedding_function/embedding_data is required."""
+
+    @abstractmethod
+    def search(self, embedding_data: str = None, embedding_function: Callable = None, embedding=None,
+               k: int = 4, filter: SearchFilter = None) -> Dict[str, List[Any]]:
+        """Returns the k records most similar to the query embedding among those matching filter."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        """Removes records by id."""
+
+    @abstractmethod
+    def update_metadata(self, ids: List[str], metadata: List[Dict[str, Any]]) -> None:
+        """Merges metadata[i] into the metadata of record ids[i], leaving text and embedding untouched."""
+
+    @abstractmethod
+    def records(self) -> Dict[str, Any]:
+        """Returns every live record as parallel 'id', 'text' and 'metadata' lists plus an 'embedding' matrix."""
+
+    @staticmethod
+    def _resolve_embeddings(embedding_function, embedding_data, embedding):
+        if embedding is None:
+            if embedding_function is None or embedding_data is None:
+                raise ValueError("Either embedding or embedding_function with embedding_data is required")
+            embedding = embedding_function(embedding_data)
+        return embedding
+
+
+# Deep Lake cannot range-filter metadata, so time-bounded searches fetch this many times k
+DEEPLAKE_FILTER_OVERFETCH = int(os.getenv('DEEPLAKE_FILTER_OVERFETCH', '10'))
+
+
+class DeepLakeVectorStore(BaseVectorStore):
+    """Adapter over Deep Lake's VectorStore; needs ACTIVELOOP_TOKEN."""
+
+    def __init__(self, path: str, token: str = None):
+        from deeplake.core.vectorstore import VectorStore
+
+        token = token or os.getenv('ACTIVELOOP_TOKEN')
+        if not token:
+            raise ValueError("ACTIVELOOP_TOKEN environment variable is not set")
+        self.path = path
+        self.store = VectorStore(path=path, token=token)
+
+    def add(self, text, embedding_function=None, embedding_data=None, metadata=None, embedding=None):
+        if metadata is None:
+            metadata = [{} for _ in text]
+        if embedding is not None:
+            return self.store.add(text=text, embedding=embedding, metadata=metadata, return_ids=True)
+        return self.store.add(
+            text=text,
+            embedding_function=embedding_function,
+            embedding_data=embedding_data,
+            metadata=metadata,
+            return_ids=True
+        )
+
+    def search(self, embedding_data=None, embedding_function=None, embedding=None, k=4, filter=None):
+        if filter is None or filter.empty:
+            if embedding is not None:
+                return self.store.search(embedding=embedding, k=k)
+            return self.store.search(embedding_data=embedding_data, embedding_function=embedding_function, k=k)
+        # Exact-match fields go to Deep Lake's metadata filter; the time range is applied to an over-fetch
+        exact = {name: value for name, value in (('category', filter.category), ('source', filter.source)) if value is not None}
+        fetch = k if filter.start is None and filter.end is None else k * DEEPLAKE_FILTER_OVERFETCH
+        kwargs = {'k': fetch, 'filter': {'metadata': exact}} if exact else {'k': fetch}
+        if embedding is not None:
+            results = self.store.search(embedding=embedding, **kwargs)
+        else:
+            results = self.store.search(embedding_data=embedding_data, embedding_function=embedding_function, **kwargs)
+        keep = [i for i, metadata in enumerate(results['metadata']) if filter.matches(metadata)][:k]
+        return {key: [results[key][i] for i in keep] for key in ('id', 'text', 'metadata', 'score')}
+
+    def delete(self, ids):
+        if ids:
+            self.store.delete(ids=list(ids))
+
+    def update_metadata(self, ids, metadata):
+        if not ids:
+            return
+        dataset = self.store.dataset
+        positions = {record_id: i for i, record_id in enumerate(dataset.id.data()['value'])}
+        stored = dataset.metadata.data()['value']
+        for record_id, updates in zip(ids, metadata):
+            i = positions.get(record_id)
+            if i is not None:
+                dataset.metadata[i] = {**(stored[i] or {}), **updates}
+
+    def records(self):
+        dataset = self.store.dataset
+        return {
+            'id': list(dataset.id.data()['value']),
+            'text': list(dataset.text.data()['value']),
+            'metadata': list(dataset.metadata.data()['value']),
+            'embedding': np.asarray(dataset.embedding.numpy(), dtype=np.float32),
+        }
+
+
+class LocalVectorStore(BaseVectorStore):
+    """
+    Dependency-light in-process vector store for edge devices and CI.
+
+    Open stores through create_vector_store, which keeps one instance per path in each
+    process. Writers in different processes (e.g. the ingest daemon and the web workers)
+    serialize on a file lock: rows are reserved from SQLite's MAX(row) under the lock and
+    their SQLite records are inserted before the vectors are written, so a reserved row can
+    never be claimed twice. Each instance picks up other processes' additions and deletions
+    through a generation counter before it reads or writes.
+
+    Unit-normalized float32 vectors live in a memory-mapped file (vectors.f32) and text plus
+    metadata in SQLite (records.db), both inside the store directory. By default search is an
+    exact brute-force cosine top-k computed with one NumPy matrix-vector product; with
+    index_type 'hnsw' or 'ivfpq' an ANN index persisted next to the vectors answers instead.
+
+    With quantization 'int8' or 'binary' the flat scan runs over compact codes
+    (codes.<quantization>.q) instead of the float32 vectors, and only the top rerank_factor * k candidates
+    are re-scored in float32. The float32 file is kept as the source for that re-ranking: it
+    stays on disk and is paged in per candidate, so the resident footprint is the codes,
+    about 4x (int8) or 32x (binary) smaller, while the disk footprint grows by their size.
+
+    Args:
+        path (str): Directory holding the store files; created if missing.
+        initial_capacity (int): Rows reserved in the vectors file before its first resize.
+        index_type (str): 'flat' for exact search, or 'hnsw'/'ivfpq' for an ANN index.
+        index_params (Dict[str, Any]): Index settings such as M/ef_search or nlist/nprobe.
+        save_every (int): Number of inserted rows after which the ANN index is written to disk.
+        quantization (str): 'none', 'int8' or 'binary'.
+        rerank_factor (int): Candidates re-scored in float32 per requested result.
+    """
+
+    def __init__(self, path: str, initial_capacity: int = 4096, index_type: str = 'flat',
+                 index_params: Dict[str, Any] = None, save_every: int = 10000,
+                 quantization: str = 'none', rerank_factor: int = 10):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.vectors_path = os.path.join(path, 'vectors.f32')
+        self.initial_capacity = initial_capacity
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.save_every = save_every
+        self.index = None
+        self.quantizer = VectorQuantizer(quantization) if quantization != 'none' else None
+        # One file per code format, so switching quantization never reads another format's codes
+        self.codes_path = os.path.join(path, f'codes.{quantization}.q')
+        self.rerank_factor = max(1, rerank_factor)
+        self._codes = None
+        self._lock = threading.RLock()
+        self._lock_path = os.path.join(path, 'write.lock')
+        self._conn = sqlite3.connect(os.path.join(path, 'records.db'), timeout=30, check_same_thread=False)
+        # Schema setup and migration race when several processes open a fresh store
+        with self._file_lock():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, text TEXT, metadata TEXT, "
+                "deleted INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._migrate_filter_columns()
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.commit()
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim = row[0] if row else None
+        self.count = self._next_row()
+        self._generation = self._read_generation()
+        self._live = np.zeros(0, dtype=bool)
+        self._vectors = None
+        if self.dim:
+            backfill_codes = self.quantizer is not None and not os.path.exists(self.codes_path)
+            self._open(max(self.initial_capacity, self.count))
+            if backfill_codes:
+                # Quantization was switched on for an existing store, or its codes are in the
+                # unversioned codes.q of older releases (int8 then had a fixed scale)
+                legacy_codes_path = os.path.join(path, 'codes.q')
+                if os.path.exists(legacy_codes_path):
+                    os.remove(legacy_codes_path)
+                for start in range(0, self.count, 65536):
+                    end = min(self.count, start + 65536)
+                    self._codes[start:end] = self.quantizer.encode(np.asarray(self._vectors[start:end]))
+                self._codes.flush()
+            self._live[:self.count] = True
+            for (deleted_row,) in self._conn.execute("SELECT row FROM records WHERE deleted = 1"):
+                self._live[deleted_row] = False
+            self._init_index()
+
+    def _next_row(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM records").fetchone()[0]
+
+    def _read_generation(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _bump_generation(self) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (name, value) VALUES ('generation', 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+        )
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializes writers across processes sharing the store directory."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Catches up with rows another process added or deleted since this instance last looked."""
+        generation = self._read_generation()
+        if generation == self._generation:
+            return
+        if self.dim is None:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            if row is None:
+                self._generation = generation
+                return
+            self.dim = row[0]
+            self._open(max(self.initial_capacity, self._next_row()))
+            self._init_index()
+        count = self._next_row()
+        if count > self._vectors.shape[0]:
+            self._open(count)
+        previous = self.count
+        self._live[previous:count] = True
+        self.count = max(count, previous)
+        deleted = [row for (row,) in self._conn.execute("SELECT row FROM records WHERE deleted = 1")]
+        newly_deleted = [row for row in deleted if row < len(self._live) and self._live[row]]
+        self._live[deleted] = False
+        if self.index is not None:
+            self._index_rows(previous, self.count)
+            if newly_deleted:
+                self.index.remove(newly_deleted)
+        self._generation = generation
+
+    def _migrate_filter_columns(self):
+        # Filterable metadata is copied into indexed columns so filters run in SQLite
+        columns = {name for _, name, *_ in self._conn.execute("PRAGMA table_info(records)")}
+        if 'ts' not in columns:
+            self._conn.execute("ALTER TABLE records ADD COLUMN ts REAL")
+            self._conn.execute("ALTER TABLE records ADD COLUMN category TEXT")
+            self._conn.execute("ALTER TABLE records ADD COLUMN source TEXT")
+            self._conn.executemany(
+                "UPDATE records SET ts = ?, category = ?, source = ? WHERE row = ?",
+                [(*filter_columns(json.loads(metadata) if metadata else {}), row)
+                 for row, metadata in self._conn.execute("SELECT row, metadata FROM records").fetchall()]
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_ts ON records (ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_category ON records (category)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_source ON records (source)")
+        self._conn.commit()
+
+    def _init_index(self):
+        if self.index_type == 'flat':
+            return
+        self.index = create_ann_index(self.index_type, self.path, self.dim, **self.index_params)
+        # Catch up on rows written after the index was last saved
+        if self.index.indexed_upto < self.count:
+            self._index_rows(self.index.indexed_upto, self.count)
+
+    def _index_rows(self, start: int, end: int):
+        if self.index is None:
+            return
+        if not self.index.ready:
+            if self.count < self.index.train_size:
+                return
+            live_rows = np.flatnonzero(self._live[:self.count])
+            self.index.train(np.asarray(self._vectors[live_rows]))
+            start = 0
+        for batch_start in range(start, end, 65536):
+            batch_end = min(end, batch_start + 65536)
+            self.index.add(np.asarray(self._vectors[batch_start:batch_end]), np.arange(batch_start, batch_end))
+        self.index.maybe_save(end - start, self.save_every)
+
+    def persist(self):
+        """Flushes vectors and writes the ANN index, if any, to disk."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._codes is not None:
+                self._codes.flush()
+            if self.index is not None:
+                self.index.save()
+
+    def _open(self, capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = open_matrix(self.vectors_path, np.float32, self.dim, capacity)
+        rows = self._vectors.shape[0]
+        if self.quantizer is not None:
+            if self._codes is not None:
+                self._codes.flush()
+            self._codes = open_matrix(self.codes_path, self.quantizer.dtype, self.quantizer.code_width(self.dim), rows)
+        # Liveness flags track deletions and are sized with the vectors file
+        live = np.zeros(rows, dtype=bool)
+        live[:len(self._live)] = self._live[:rows]
+        self._live = live
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return int(self._live.sum())
+
+    def add(self, text, embedding_function=None, embedding_data=None, metadata=None, embedding=None):
+        embedding = self._resolve_embeddings(embedding_function, embedding_data, embedding)
+        vectors = np.asarray(embedding, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if len(vectors) != len(text):
+            raise ValueError(f"Got {len(vectors)} embeddings for {len(text)} texts")
+        if metadata is None:
+            metadata = [{} for _ in text]
+        norms = np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (self.dim,))
+                self._open(self.initial_capacity)
+                self._init_index()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+            # Reserve rows from SQLite, not from this instance's count, so no other writer owns them
+            start = self._next_row()
+            needed = start + len(vectors)
+            if needed > self._vectors.shape[0]:
+                capacity = self._vectors.shape[0]
+                while capacity < needed:
+                    capacity *= 2
+                self._open(capacity)
+
+            ids = [uuid.uuid4().hex for _ in text]
+            # Insert the records before touching the vectors file: a failed insert leaves no row overwritten
+            try:
+                self._conn.executemany(
+                    "INSERT INTO records (row, id, text, metadata, ts, category, source) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(start + i, ids[i], text[i], json.dumps(metadata[i], default=str), *filter_columns(metadata[i]))
+                     for i in range(len(text))]
+                )
+            except Exception:
+                self._conn.rollback()
+                raise
+            # Normalize straight into the memory-mapped rows; no intermediate copy
+            np.divide(vectors, norms, out=self._vectors[start:needed])
+            self._vectors.flush()
+            if self._codes is not None:
+                self._codes[start:needed] = self.quantizer.encode(self._vectors[start:needed])
+                self._codes.flush()
+            self._bump_generation()
+            self._conn.commit()
+            self._generation = self._read_generation()
+            self._live[start:needed] = True
+            self.count = needed
+            self._index_rows(start, needed)
+        logger.debug(f"Added {len(text)} records to local vector store '{self.path}'.")
+        return ids
+
+    def search(self, embedding_data=None, embedding_function=None, embedding=None, k=4, filter=None):
+        embedding = self._resolve_embeddings(embedding_function, embedding_data, embedding)
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            self._sync()
+            if not self.count or self._vectors is None:
+                return {'id': [], 'text': [], 'metadata': [], 'score': []}
+            if filter is not None and not filter.empty:
+                return self._search_filtered(query, k, filter)
+            if self.index is not None and self.index.ready:
+                return self._search_index(query, k)
+            if self._codes is not None:
+                return self._search_quantized(query, k)
+            scores = self._vectors[:self.count] @ query
+            scores[~self._live[:self.count]] = -np.inf
+            k = min(k, int(self._live.sum()))
+            if k <= 0:
+                return {'id': [], 'text': [], 'metadata': [], 'score': []}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return self._fetch_rows(top.tolist(), scores[top].tolist())
+
+    def _search_filtered(self, query: np.ndarray, k: int, filter: SearchFilter) -> Dict[str, List[Any]]:
+        # Select matching rows through the SQLite column indexes, then score only those rows
+        where, params = filter.sql()
+        rows = np.fromiter(
+            (row for (row,) in self._conn.execute(f"SELECT row FROM records WHERE deleted = 0 AND {where}", params)),
+            dtype=np.int64
+        )
+        k = min(k, len(rows))
+        if k <= 0:
+            return {'id': [], 'text': [], 'metadata': [], 'score': []}
+        rows.sort()
+        if self._codes is not None and len(rows) > k * self.rerank_factor:
+            approx = self.quantizer.scores(self._codes[rows], query)
+            rows = np.sort(rows[np.argpartition(-approx, k * self.rerank_factor - 1)[:k * self.rerank_factor]])
+        scores = self._vectors[rows] @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self._fetch_rows(rows[top].tolist(), scores[top].tolist())
+
+    def _search_quantized(self, query: np.ndarray, k: int) -> Dict[str, List[Any]]:
+        approx = self.quantizer.scores(self._codes[:self.count], query)
+        approx[~self._live[:self.count]] = -np.inf
+        live_count = int(self._live[:self.count].sum())
+        candidates = min(live_count, k * self.rerank_factor)
+        if candidates <= 0:
+            return {'id': [], 'text': [], 'metadata': [], 'score': []}
+        rows = np.argpartition(-approx, candidates - 1)[:candidates]
+        rows = np.sort(rows)
+        # Re-rank the candidates exactly against the float32 vectors
+        scores = self._vectors[rows] @ query
+        order = np.argsort(-scores)[:k]
+        return self._fetch_rows(rows[order].tolist(), scores[order].tolist())
+
+    def _search_index(self, query: np.ndarray, k: int) -> Dict[str, List[Any]]:
+        # Over-fetch so rows deleted since the index was saved can be dropped, then re-score
+        # the survivors exactly since PQ scores are only approximate
+        rows, _ = self.index.search(query, 2 * k + 16)
+        rows = np.asarray([row for row in rows if row < self.count and self._live[row]], dtype=np.int64)
+        if not len(rows):
+            return {'id': [], 'text': [], 'metadata': [], 'score': []}
+        scores = self._vectors[rows] @ query
+        order = np.argsort(-scores)[:k]
+        return self._fetch_rows(rows[order].tolist(), scores[order].tolist())
+
+    def _fetch_rows(self, rows: List[int], scores: List[float]) -> Dict[str, List[Any]]:
+        placeholders = ",".join("?" * len(rows))
+        found = {
+            row: (record_id, text, metadata)
+            for row, record_id, text, metadata in self._conn.execute(
+                f"SELECT row, id, text, metadata FROM records WHERE row IN ({placeholders})", rows
+            )
+        }
+        results = {'id': [], 'text': [], 'metadata': [], 'score': []}
+        for row, score in zip(rows, scores):
+            record_id, text, metadata = found[row]
+            results['id'].append(record_id)
+            results['text'].append(text)
+            results['metadata'].append(json.loads(metadata) if metadata else {})
+            results['score'].append(float(score))
+        return results
+
+    def delete(self, ids):
+        if not ids:
+            return
+        ids = list(ids)
+        with self._lock, self._file_lock():
+            self._sync()
+            placeholders = ",".join("?" * len(ids))
+            rows = [row for (row,) in self._conn.execute(
+                f"SELECT row FROM records WHERE id IN ({placeholders})", ids
+            )]
+            self._conn.execute(f"UPDATE records SET deleted = 1 WHERE id IN ({placeholders})", ids)
+            self._bump_generation()
+            self._conn.commit()
+            self._generation = self._read_generation()
+            for row in rows:
+                self._live[row] = False
+            if self.index is not None:
+                self.index.remove(rows)
+        logger.debug(f"Deleted {len(rows)} records from local vector store '{self.path}'.")
+
+    def update_metadata(self, ids, metadata):
+        if not ids:
+            return
+        ids = list(ids)
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            stored = dict(self._conn.execute(
+                f"SELECT id, metadata FROM records WHERE id IN ({placeholders})", ids
+            ).fetchall())
+            rows = []
+            for record_id, updates in zip(ids, metadata):
+                if record_id not in stored:
+                    continue
+                merged = {**(json.loads(stored[record_id]) if stored[record_id] else {}), **updates}
+                rows.append((json.dumps(merged, default=str), *filter_columns(merged), record_id))
+            # Metadata is read from SQLite on every fetch, so other instances see this without a sync
+            self._conn.executemany(
+                "UPDATE records SET metadata = ?, ts = ?, category = ?, source = ? WHERE id = ?", rows
+            )
+            self._conn.commit()
+
+    def records(self):
+        with self._lock:
+            self._sync()
+            found = self._conn.execute(
+                "SELECT row, id, text, metadata FROM records WHERE deleted = 0 ORDER BY row"
+            ).fetchall()
+            rows = [row for row, _, _, _ in found]
+            if self._vectors is None or not rows:
+                embeddings = np.zeros((0, self.dim or 0), dtype=np.float32)
+            else:
+                embeddings = np.asarray(self._vectors[rows])
+        return {
+            'id': [record_id for _, record_id, _, _ in found],
+            'text': [text for _, _, text, _ in found],
+            'metadata': [json.loads(metadata) if metadata else {} for _, _, _, metadata in found],
+            'embedding': embeddings,
+        }
+
+
+class HybridVectorStore(BaseVectorStore):
+    """
+    A vector store with a BM25 index kept in step with it.
+
+    Every add and delete is mirrored into the lexical index, so it stays incrementally up to
+    date no matter which code path writes the store. Vector search is unchanged; keyword
+    search never needs an embedding, and hybrid search fuses both rankings with RRF.
+
+    Args:
+        store (BaseVectorStore): The wrapped vector store.
+        lexical (BM25Index): Its lexical index.
+        candidates (int): Results fetched from each ranking per requested result before fusion.
+    """
+
+    supports_keyword = True
+
+    def __init__(self, store: BaseVectorStore, lexical: BM25Index, candidates: int = 3):
+        self.store = store
+        self.lexical = lexical
+        self.candidates = candidates
+        self.path = getattr(store, 'path', None)
+        if not len(lexical):
+            self._backfill()
+
+    def _backfill(self):
+        # The store predates its lexical index
+        try:
+            records = self.store.records()
+            if records['id']:
+                self.lexical.add(records['id'], records['text'], records['metadata'])
+                logger.info(f"Built lexical index for '{self.path}' from {len(records['id'])} existing records.")
+        except Exception as e:
+            logger.error(f"Error building lexical index for '{self.path}': {e}")
+
+    def __getattr__(self, name):
+        # Backend-specific helpers such as persist() stay reachable
+        if name == 'store':
+            raise AttributeError(name)
+        return getattr(self.store, name)
+
+    def __len__(self):
+        return len(self.store)
+
+    def add(self, text, embedding_function=None, embedding_data=None, metadata=None, embedding=None):
+        ids = self.store.add(
+            text=text,
+            embedding_function=embedding_function,
+            embedding_data=embedding_data,
+            metadata=metadata,
+            embedding=embedding
+        )
+        self.lexical.add(ids, text, metadata)
+        return ids
+
+    def search(self, embedding_data=None, embedding_function=None, embedding=None, k=4, filter=None):
+        return self.store.search(
+            embedding_data=embedding_data, embedding_function=embedding_function, embedding=embedding, k=k,
+            filter=filter
+        )
+
+    def delete(self, ids):
+        self.store.delete(ids)
+        self.lexical.delete(ids)
+
+    def update_metadata(self, ids, metadata):
+        self.store.update_metadata(ids, metadata)
+        self.lexical.update_metadata(ids, metadata)
+
+    def records(self):
+        return self.store.records()
+
+    def keyword_search(self, query: str, k: int = 4, filter: SearchFilter = None) -> Dict[str, List[Any]]:
+        return self.lexical.search(query, k, filter)
+
+    def hybrid_search(self, query: str, embedding, k: int = 4, filter: SearchFilter = None) -> Dict[str, List[Any]]:
+        """
+        Fuses vector and BM25 results by reciprocal rank.
+
+        'vector_score' holds each result's cosine similarity, or None when only the keyword
+        search found it, for callers that need a calibrated score (e.g. search_tiers).
+        """
+        candidates = k * self.candidates
+        results = reciprocal_rank_fusion(
+            [self.store.search(embedding=embedding, k=candidates, filter=filter), self.lexical.search(query, candidates, filter)], k
+        )
+        results['vector_score'] = [scores[0] for scores in results['source_scores']]
+        return results
+
+
+def search_store(store: BaseVectorStore, query: str, k: int, mode: str = 'vector', embedding=None,
+                 embedding_function: Callable = None, filter: SearchFilter = None) -> Dict[str, List[Any]]:
+    """
+    Searches a store in 'vector', 'keyword' or 'hybrid' mode.
+
+    Keyword mode never calls embedding_function. Stores without a lexical index answer every
+    mode with vector search.
+    """
+    if mode == 'keyword' and store.supports_keyword:
+        return store.keyword_search(query, k, filter)
+    if embedding is None:
+        embedding = embedding_function([query])[0]
+    if mode == 'hybrid' and store.supports_keyword:
+        return store.hybrid_search(query, embedding, k, filter)
+    return store.search(embedding=embedding, k=k, filter=filter)
+
+
+def lexical_index_path(path: str) -> str:
+    # Remote Deep Lake paths (hub://org/name) get a local file named after them
+    if '://' in path:
+        return re.sub(r'\W+', '_', path) + '.lexical.db'
+    return f'{path}.lexical.db'
+
+
+_stores = {}
+_stores_lock = threading.RLock()
+
+
+def create_vector_store(path: str, backend: Optional[str] = None, lexical: Optional[bool] = None) -> BaseVectorStore:
+    """
+    Opens the cortex vector store at path with the configured backend.
+
+    The backend comes from the argument, then CORTEX_VECTOR_BACKEND ('local' or 'deeplake');
+    without either, Deep Lake is used when ACTIVELOOP_TOKEN is set and the local store otherwise.
+    The local store's index is chosen with CORTEX_ANN_INDEX ('flat', 'hnsw' or 'ivfpq') and
+    its scan codes with CORTEX_VECTOR_QUANTIZATION ('none', 'int8' or 'binary'). Unless
+    lexical or CORTEX_LEXICAL_INDEX turns it off, the store is wrapped in a HybridVectorStore.
+
+    Stores are opened once per path and process and shared by every caller: two instances
+    on one path would each track their own next row and overwrite each other's vectors.
+    """
+    if lexical is None:
+        lexical = os.getenv('CORTEX_LEXICAL_INDEX', '1') == '1'
+    if backend is None:
+        backend = os.getenv('CORTEX_VECTOR_BACKEND') or ('deeplake' if os.getenv('ACTIVELOOP_TOKEN') else 'local')
+    key = (path if '://' in path else os.path.abspath(path), backend, lexical)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = _open_store(path, backend, lexical)
+        return store
+
+
+def _open_store(path: str, backend: str, lexical: bool) -> BaseVectorStore:
+    if lexical:
+        store = create_vector_store(path, backend, lexical=False)
+        return HybridVectorStore(store, BM25Index(lexical_index_path(path)))
+    if backend == 'local':
+        index_type = os.getenv('CORTEX_ANN_INDEX', 'flat')
+        index_params = {}
+        if index_type == 'hnsw':
+            index_params = {
+                'M': int(os.getenv('CORTEX_HNSW_M', '16')),
+                'ef_construction': int(os.getenv('CORTEX_HNSW_EF_CONSTRUCTION', '200')),
+                'ef_search': int(os.getenv('CORTEX_HNSW_EF_SEARCH', '64')),
+            }
+        elif index_type == 'ivfpq':
+            index_params = {
+                'nlist': int(os.getenv('CORTEX_IVF_NLIST', '1024')),
+                'pq_m': int(os.getenv('CORTEX_PQ_M', '16')),
+                'nprobe': int(os.getenv('CORTEX_IVF_NPROBE', '16')),
+            }
+        return LocalVectorStore(
+            path,
+            index_type=index_type,
+            index_params=index_params,
+            quantization=os.getenv('CORTEX_VECTOR_QUANTIZATION', 'none'),
+            rerank_factor=int(os.getenv('CORTEX_RERANK_FACTOR', '10'))
+        )
+    if backend == 'deeplake':
+        return DeepLakeVectorStore(path)
+    raise ValueError(f"Unsupported vector store backend '{backend}'")
@@ -3,8 +3,11 @@ import logging
 import torch
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 import logging
+import threading
 import sounddevice as sd
 
+from utils.model_registry import get_model_registry, load_pretrained
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 handler = logging.FileHandler('logs/combined_listen.log')
@@ -13,6 +16,19 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 class VoiceInterface:
+    # Whisper is loaded once per process and shared by every user's KnowledgeIngestion
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def get_shared(cls):
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+                    logger.info("Shared VoiceInterface loaded.")
+        return cls._shared
+
     def __init__(self):
         # Remove the sr.Recognizer() as we won't be using it anymore
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
@@ -20,8 +36,8 @@ class VoiceInterface:
 
         # Load Whisper model and processor
         model_id = "openai/whisper-large-v3-turbo"
-        self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_id, torch_dtype=self.torch_dtype, low_cpu_mem_usage=True
+        self.model = get_model_registry().get(
+            model_id, lambda: load_pretrained(AutoModelForSpeechSeq2Seq, model_id, torch_dtype=self.torch_dtype)
         )
         self.model.to(self.device)
         self.processor = AutoProcessor.from_pretrained(model_id)
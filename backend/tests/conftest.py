@@ -0,0 +1,5 @@
+# tests/conftest.py
+import os
+
+# Modules log to logs/<name>.log relative to the working directory, as when the app runs from backend/
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,94 @@
+# tests/test_adapter_manager.py
+import os
+import tempfile
+import threading
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+try:
+    import torch
+    import transformers
+except ImportError:
+    torch = None
+
+
+class FakePeftModel:
+    def __init__(self):
+        self.adapters = []
+        self.events = []
+
+    def load_adapter(self, path, adapter_name, is_trainable=False):
+        self.adapters.append(adapter_name)
+        self.events.append(('load', adapter_name))
+
+    def delete_adapter(self, adapter_name):
+        self.adapters.remove(adapter_name)
+        self.events.append(('delete', adapter_name))
+
+
+@unittest.skipUnless(torch, "torch and transformers are not installed")
+class AdapterManagerTest(unittest.TestCase):
+    def setUp(self):
+        from ai_model import adapter_manager
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        patch = mock.patch.object(adapter_manager, 'USER_MODEL_DIR', self._tmp.name)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.module = adapter_manager
+        # Built without __init__, which would wrap a real base model with peft
+        self.manager = adapter_manager.AdapterManager.__new__(adapter_manager.AdapterManager)
+        self.manager.max_adapters = 2
+        self.manager.model = FakePeftModel()
+        self.manager._loaded = OrderedDict()
+        self.manager._owners = {}
+        self.manager._stale = set()
+        self.manager._lock = threading.Lock()
+
+    def train(self, user_id, version):
+        path = self.module.adapter_path(user_id)
+        os.makedirs(path, exist_ok=True)
+        config = os.path.join(path, 'adapter_config.json')
+        with open(config, 'w') as f:
+            f.write('{}')
+        os.utime(config, ns=(version, version))
+
+    def test_users_without_an_adapter_use_the_base_model(self):
+        with self.manager.lease('u1') as name:
+            self.assertEqual(name, self.module.BASE_ADAPTER)
+        self.assertEqual(self.manager.model.adapters, [])
+
+    def test_idle_adapters_are_evicted_least_recently_used_first(self):
+        for user_id in ('u1', 'u2', 'u3'):
+            self.train(user_id, 1)
+        for user_id in ('u1', 'u2', 'u1', 'u3'):
+            with self.manager.lease(user_id):
+                pass
+        self.assertEqual(sorted(self.manager.model.adapters), ['user_u1_v1', 'user_u3_v1'])
+
+    def test_adapters_in_use_are_not_evicted(self):
+        for user_id in ('u1', 'u2', 'u3'):
+            self.train(user_id, 1)
+        with self.manager.lease('u1'):
+            with self.manager.lease('u2'):
+                pass
+            with self.manager.lease('u3'):
+                pass
+            self.assertIn('user_u1_v1', self.manager.model.adapters)
+
+    def test_retrained_adapter_replaces_the_old_version_after_its_last_lease(self):
+        self.train('u1', 1)
+        with self.manager.lease('u1') as old:
+            self.train('u1', 2)
+            self.manager.reload('u1')
+            # Still serving the running request
+            self.assertIn(old, self.manager.model.adapters)
+            with self.manager.lease('u1') as new:
+                self.assertNotEqual(new, old)
+        self.assertEqual(self.manager.model.adapters, [new])
+        self.assertEqual(self.manager.stats()['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
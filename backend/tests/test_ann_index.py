@@ -0,0 +1,54 @@
+# tests/test_ann_index.py
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cortex.vector_store import LocalVectorStore
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+@unittest.skipUnless(hnswlib, "hnswlib is not installed")
+class HNSWIndexDeleteTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+        vectors = self.rng.standard_normal((10, 8)).astype(np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _store(self):
+        return LocalVectorStore(os.path.join(self._tmp.name, 'store'), initial_capacity=16, index_type='hnsw')
+
+    def test_search_after_deleting_half_the_rows(self):
+        store = self._store()
+        ids = store.add([f'doc {i}' for i in range(10)], embedding=self.vectors)
+        store.delete(ids[:5])
+
+        results = store.search(embedding=self.vectors[7], k=4)
+
+        self.assertEqual(len(results['id']), 4)
+        self.assertEqual(results['id'][0], ids[7])
+        self.assertTrue(set(results['id']) <= set(ids[5:]))
+
+    def test_deleted_count_survives_reopen(self):
+        store = self._store()
+        ids = store.add([f'doc {i}' for i in range(10)], embedding=self.vectors)
+        store.delete(ids[:5])
+        store.persist()
+
+        reopened = self._store()
+        self.assertEqual(reopened.index.deleted_count, 5)
+        results = reopened.search(embedding=self.vectors[9], k=8)
+        self.assertEqual(sorted(results['id']), sorted(ids[5:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
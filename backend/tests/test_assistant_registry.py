@@ -0,0 +1,82 @@
+# tests/test_assistant_registry.py
+import threading
+import time
+import unittest
+
+from ai_model.assistant_registry import AssistantRegistry
+
+
+class FakeAssistant:
+    def __init__(self, user_id, events, close_delay=0.0):
+        self.user_id = user_id
+        self.events = events
+        self.close_delay = close_delay
+        events.append(('build', user_id))
+
+    def consolidate_memory(self):
+        self.events.append(('consolidated', self.user_id))
+
+    def memory_footprint(self):
+        return 2 ** 20
+
+    def close(self):
+        time.sleep(self.close_delay)
+        self.events.append(('closed', self.user_id))
+
+
+class AssistantRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.close_delay = 0.0
+        self.registry = AssistantRegistry(
+            factory=lambda user_id: FakeAssistant(user_id, self.events, self.close_delay),
+            max_users=2, idle_seconds=3600
+        )
+
+    def tearDown(self):
+        self.registry.close()
+
+    def test_assistant_is_built_once_and_reused(self):
+        with self.registry.lease('u1') as first:
+            pass
+        with self.registry.lease('u1') as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(self.events, [('build', 'u1')])
+
+    def test_least_recently_used_user_is_evicted_over_max_users(self):
+        for user_id in ('u1', 'u2', 'u1', 'u3'):
+            with self.registry.lease(user_id):
+                pass
+        self.assertIn(('closed', 'u2'), self.events)
+        self.assertNotIn(('closed', 'u1'), self.events)
+        self.assertEqual(self.registry.stats()['users'], 2)
+
+    def test_lease_waits_for_the_evicted_assistant_to_close(self):
+        with self.registry.lease('u1'):
+            pass
+        self.registry._entries['u1'].assistant.close_delay = 0.2
+        evicting = threading.Thread(target=self.registry.evict, args=('u1',))
+        evicting.start()
+        deadline = time.monotonic() + 2
+        while 'u1' in self.registry._entries and time.monotonic() < deadline:
+            time.sleep(0.005)
+        with self.registry.lease('u1'):
+            pass
+        evicting.join()
+        self.assertEqual(self.events, [('build', 'u1'), ('closed', 'u1'), ('build', 'u1')])
+
+    def test_warm_users_memory_is_consolidated_on_schedule(self):
+        self.registry.consolidate_seconds = 60
+        with self.registry.lease('u1'):
+            pass
+        self.registry.consolidate_due()
+        self.registry.consolidate_due()
+        self.assertEqual(self.events.count(('consolidated', 'u1')), 1)
+        self.registry._entries['u1'].consolidated_at -= 61
+        self.registry.consolidate_due()
+        self.assertEqual(self.events.count(('consolidated', 'u1')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
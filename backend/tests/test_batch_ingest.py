@@ -0,0 +1,29 @@
+# tests/test_batch_ingest.py
+import sys
+import unittest
+from multiprocessing import spawn
+
+try:
+    from cortex import batch_ingest
+except ImportError:  # soundfile, textract and pytesseract are optional in test environments
+    batch_ingest = None
+
+
+@unittest.skipUnless(batch_ingest, "ingest dependencies are not installed")
+class ExtractWorkerStartTest(unittest.TestCase):
+    def test_workers_do_not_import_the_main_script(self):
+        main = sys.modules['__main__']
+        before = (getattr(main, '__file__', None), main.__spec__)
+        with batch_ingest._main_module_hidden():
+            data = spawn.get_preparation_data('worker')
+        self.assertNotIn('init_main_from_path', data)
+        self.assertNotIn('init_main_from_name', data)
+        self.assertEqual((getattr(main, '__file__', None), main.__spec__), before)
+
+    def test_extractors_are_picklable_from_the_worker_module(self):
+        self.assertEqual(batch_ingest.extract_document_text.__module__, batch_ingest.EXTRACT_WORKER_MODULE)
+        self.assertEqual(batch_ingest.extract_image_text.__module__, batch_ingest.EXTRACT_WORKER_MODULE)
+
+
+if __name__ == '__main__':
+    unittest.main()
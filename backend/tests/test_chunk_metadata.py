@@ -0,0 +1,80 @@
+# tests/test_chunk_metadata.py
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cortex.chunking import TextChunker
+from cortex.source_registry import SourceRegistry, chunk_position, content_hash, diff_chunks
+from cortex.vector_store import create_vector_store
+
+PARAGRAPHS = [f"Paragraph {name} talks about topic {name} in some detail." for name in 'abcdef']
+
+
+def embed(texts):
+    vectors = np.stack([np.random.default_rng(sum(map(ord, text))).standard_normal(8) for text in texts])
+    return vectors.astype(np.float32)
+
+
+class ChunkMetadataReingestTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = create_vector_store(os.path.join(self._tmp.name, 'store'), backend='local', lexical=True)
+        self.registry = SourceRegistry(os.path.join(self._tmp.name, 'sources.db'))
+        self.chunker = TextChunker(chunk_size=10, chunk_overlap=0)
+        self.path = os.path.join(self._tmp.name, 'doc.txt')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def sync(self, text):
+        # The steps of Cortex.sync_document, which needs the full ingestion stack to import
+        with open(self.path, 'w') as f:
+            f.write(text)
+        diff = diff_chunks(self.registry.get_chunks(self.path), self.chunker.chunk(text))
+        chunks = [chunk for chunk, _ in diff.new]
+        new_ids = self.store.add(
+            [chunk.text for chunk in chunks], embedding=embed([chunk.text for chunk in chunks]),
+            metadata=[{'source': self.path, **chunk_position(chunk)} for chunk in chunks]
+        ) if chunks else []
+        self.store.delete(diff.stale_ids)
+        self.store.update_metadata(
+            [record_id for record_id, _ in diff.moved], [chunk_position(chunk) for _, chunk in diff.moved]
+        )
+        chunk_records = diff.kept + [
+            (chunk_hash, record_id, chunk.index) for (chunk, chunk_hash), record_id in zip(diff.new, new_ids)
+        ]
+        self.registry.record(self.path, content_hash(text), chunk_records, os.stat(self.path))
+        return diff
+
+    def assert_offsets_match(self, text):
+        records = self.store.records()
+        self.assertTrue(records['id'])
+        for record_text, metadata in zip(records['text'], records['metadata']):
+            self.assertEqual(text[metadata['start_offset']:metadata['end_offset']], record_text)
+        indexes = sorted(metadata['chunk_index'] for metadata in records['metadata'])
+        self.assertEqual(indexes, list(range(len(indexes))))
+
+    def test_insertion_before_kept_chunks_updates_their_positions(self):
+        original = "\n\n".join(PARAGRAPHS)
+        self.sync(original)
+        edited = "\n\n".join(["A new opening paragraph pushes everything else down."] + PARAGRAPHS)
+        diff = self.sync(edited)
+
+        self.assertTrue(diff.kept)
+        self.assertTrue(diff.moved)
+        self.assert_offsets_match(edited)
+
+    def test_keyword_results_carry_updated_positions(self):
+        self.sync("\n\n".join(PARAGRAPHS))
+        edited = "\n\n".join(["Inserted first."] + PARAGRAPHS)
+        self.sync(edited)
+
+        found = self.store.keyword_search('topic f', k=1)
+        metadata = found['metadata'][0]
+        self.assertEqual(edited[metadata['start_offset']:metadata['end_offset']], found['text'][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# tests/test_chunking.py
+import unittest
+
+from cortex.chunking import TextChunker
+
+
+def sentences(count, words=5):
+    return ' '.join(f"{'word ' * (words - 1)}end{i}." for i in range(count))
+
+
+class TextChunkerTest(unittest.TestCase):
+    def test_chunks_respect_the_token_limit_and_offsets(self):
+        text = sentences(20) + '\n\n' + sentences(10)
+        chunks = list(TextChunker(chunk_size=20, chunk_overlap=5).chunk(text))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([chunk.index for chunk in chunks], list(range(len(chunks))))
+        for chunk in chunks:
+            self.assertLessEqual(chunk.token_count, 20)
+            self.assertEqual(text[chunk.start:chunk.end], chunk.text)
+
+    def test_consecutive_chunks_overlap_by_whole_sentences(self):
+        chunks = list(TextChunker(chunk_size=20, chunk_overlap=5).chunk(sentences(12)))
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertLess(current.start, previous.end)
+            self.assertTrue(current.text.startswith('word'))
+
+    def test_every_sentence_lands_in_a_chunk(self):
+        text = sentences(15)
+        covered = ' '.join(chunk.text for chunk in TextChunker(chunk_size=12, chunk_overlap=0).chunk(text))
+        for i in range(15):
+            self.assertIn(f'end{i}.', covered)
+
+    def test_overlong_sentence_is_cut_on_word_boundaries(self):
+        text = ' '.join(f'w{i}' for i in range(50)) + '.'
+        chunks = list(TextChunker(chunk_size=10, chunk_overlap=0).chunk(text))
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(' '.join(chunk.text for chunk in chunks), text)
+
+    def test_overlap_must_be_smaller_than_chunk_size(self):
+        with self.assertRaises(ValueError):
+            TextChunker(chunk_size=10, chunk_overlap=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_context_builder.py
+import unittest
+
+from ai_model.context_builder import ContextBuilder
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word; counts encode calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=False):
+        self.calls += 1
+        return text.split()
+
+
+class ContextBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = WordTokenizer()
+        self.builder = ContextBuilder(self.tokenizer, budget=20, system_prompt='Be brief.')
+
+    def test_prompt_is_system_then_turns_then_memories_then_input(self):
+        prompt = self.builder.build('hi', turns=[('q1', 'a1')], memories={'text': ['fact one'], 'score': [0.9]})
+        self.assertEqual(prompt, ['Be', 'brief.', 'User:', 'q1', 'Assistant:', 'a1', 'fact', 'one', 'User:', 'hi', 'Assistant:'])
+
+    def test_budget_keeps_the_newest_contiguous_turns(self):
+        turns = [(f'q{i}', f'a{i}') for i in range(5)]
+        prompt = self.builder.build('hi', turns=turns)
+        self.assertLessEqual(len(prompt), 20)
+        # 5 tokens for the system prompt and input leave room for three 4-token turns
+        self.assertEqual([token for token in prompt if token.startswith('q')], ['q2', 'q3', 'q4'])
+
+    def test_higher_scored_memories_win_the_remaining_budget(self):
+        memories = {'text': ['low ' * 8, 'high one'], 'score': [0.1, 0.9]}
+        builder = ContextBuilder(self.tokenizer, budget=8)
+        self.assertEqual(builder.build('hi', memories=memories), ['high', 'one', 'User:', 'hi', 'Assistant:'])
+
+    def test_pieces_are_tokenized_once(self):
+        turns = [('q1', 'a1'), ('q2', 'a2')]
+        self.builder.build('first', turns=turns)
+        calls = self.tokenizer.calls
+        self.builder.build('second', turns=turns)
+        # Only the new input is encoded again
+        self.assertEqual(self.tokenizer.calls, calls + 1)
+
+    def test_overlong_input_keeps_its_end(self):
+        prompt = ContextBuilder(self.tokenizer, budget=4).build('one two three four five')
+        self.assertEqual(len(prompt), 4)
+        self.assertEqual(prompt[-2:], ['five', 'Assistant:'])
+
+
+if __name__ == '__main__':
+    unittest.main()
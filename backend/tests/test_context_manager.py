@@ -0,0 +1,43 @@
+# tests/test_context_manager.py
+import unittest
+
+from ai_model.context_manager import ContextManager
+
+
+class CharTokenizer:
+    def encode(self, text, add_special_tokens=False):
+        return [ord(char) for char in text]
+
+
+def shares_prefix(previous, current):
+    return current[:len(previous)] == previous
+
+
+class ContextManagerEvictionTest(unittest.TestCase):
+    def test_full_buffer_overwrites_only_the_oldest_turn(self):
+        manager = ContextManager(max_history=4)
+        for i in range(6):
+            manager.update_history(f'u{i}', f'a{i}')
+        self.assertEqual([turn['user'] for turn in manager.history], ['u2', 'u3', 'u4', 'u5'])
+        self.assertEqual(len(manager), 4)
+
+    def test_history_keeps_growing_prefix_until_full(self):
+        manager = ContextManager(max_history=3, tokenizer=CharTokenizer())
+        previous = manager.token_ids()
+        for i in range(3):
+            manager.update_history(f'question {i}', f'answer {i}')
+            current = manager.token_ids()
+            self.assertTrue(shares_prefix(previous, current))
+            previous = current
+        self.assertEqual(previous, CharTokenizer().encode(manager.get_context()))
+
+    def test_round_trip_keeps_turns(self):
+        manager = ContextManager(max_history=3)
+        for i in range(4):
+            manager.update_history(f'u{i}', f'a{i}')
+        restored = ContextManager.from_json(manager.to_json())
+        self.assertEqual(restored.history, manager.history)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# tests/test_embedding_batcher.py
+import threading
+import unittest
+
+from cortex.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        return [f'vec:{text}' for text in texts]
+
+
+class EmbeddingBatcherTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_batch(self):
+        encoder = RecordingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch_size=32, max_wait_ms=200)
+        results = {}
+        start = threading.Barrier(4)
+
+        def call(name):
+            start.wait()
+            results[name] = batcher.embed([name])
+
+        threads = [threading.Thread(target=call, args=(f't{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+        self.assertEqual(results, {f't{i}': [f'vec:t{i}'] for i in range(4)})
+        self.assertEqual(len(encoder.batches), 1)
+
+    def test_batches_are_capped_at_max_batch_size(self):
+        encoder = RecordingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch_size=3, max_wait_ms=50)
+        self.assertEqual(batcher.embed([str(i) for i in range(7)]), [f'vec:{i}' for i in range(7)])
+        batcher.close()
+        self.assertEqual([len(batch) for batch in encoder.batches], [3, 3, 1])
+
+    def test_encoder_error_reaches_every_caller_in_the_batch(self):
+        def failing(texts):
+            raise ValueError('model failed')
+
+        batcher = EmbeddingBatcher(failing, max_wait_ms=10)
+        futures = batcher.submit(['a', 'b'])
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(timeout=2)
+        batcher.close()
+        with self.assertRaises(RuntimeError):
+            batcher.submit(['c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# tests/test_embedding_cache.py
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cortex.embedding_cache import EmbeddingCache
+
+
+class EmbeddingCacheTest(unittest.TestCase):
+    def test_whitespace_variants_share_an_entry(self):
+        cache = EmbeddingCache('model', max_entries=10)
+        cache.put_many(['hello  world\n'], [np.ones(4)])
+        self.assertTrue(np.array_equal(cache.get_many([' hello world'])[0], np.ones(4)))
+        self.assertIsNone(EmbeddingCache('other-model').get_many(['hello world'])[0])
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        cache = EmbeddingCache('model', max_entries=2)
+        cache.put_many(['a', 'b'], np.eye(2))
+        cache.get_many(['a'])
+        cache.put_many(['c'], [np.ones(2)])
+        self.assertEqual([vector is not None for vector in cache.get_many(['a', 'b', 'c'])], [True, False, True])
+
+    def test_disk_tier_survives_a_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache', 'model')
+            vectors = np.arange(3000 * 4, dtype=np.float32).reshape(3000, 4)
+            texts = [f'text {i}' for i in range(3000)]
+            EmbeddingCache('model', max_entries=10, disk_path=path).put_many(texts, vectors)
+
+            restarted = EmbeddingCache('model', max_entries=10, disk_path=path)
+            found = restarted.get_many(['text 0', 'text 2999', 'unknown'])
+            self.assertTrue(np.array_equal(found[0], vectors[0]))
+            self.assertTrue(np.array_equal(found[1], vectors[2999]))
+            self.assertIsNone(found[2])
+            self.assertEqual((restarted.disk_hits, restarted.misses), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# tests/test_embeddings.py
+import threading
+import unittest
+from types import SimpleNamespace
+
+try:
+    import torch
+    import transformers
+except ImportError:
+    torch = None
+
+
+class FakeTokenizer:
+    """One token per word, id = word length; records the max_length it was called with."""
+
+    def __init__(self):
+        self.max_lengths = []
+
+    def __call__(self, texts, padding=True, truncation=True, max_length=None, return_tensors=None, add_special_tokens=True):
+        self.max_lengths.append(max_length)
+        ids = [[len(word) for word in text.split()][:max_length] for text in texts]
+        if return_tensors is None:
+            return {'input_ids': ids}
+        width = max(len(row) for row in ids)
+        return {
+            'input_ids': torch.tensor([row + [0] * (width - len(row)) for row in ids]),
+            'attention_mask': torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in ids]),
+        }
+
+
+class FakeModel:
+    """Embeds token id t as [t, 1]; padding embeds as [100, 100] so leaking it shows."""
+
+    config = SimpleNamespace(hidden_size=2)
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, input_ids, attention_mask):
+        self.batches.append(input_ids.shape[0])
+        embedded = torch.stack([input_ids.float(), torch.ones_like(input_ids, dtype=torch.float32)], dim=-1)
+        embedded[attention_mask == 0] = 100.0
+        return (embedded,)
+
+
+@unittest.skipUnless(torch, "torch and transformers are not installed")
+class EmbeddingEngineTest(unittest.TestCase):
+    def make_engine(self, max_seq_length=None, cache=False):
+        from cortex.embedding_cache import EmbeddingCache
+        from cortex.embeddings import EmbeddingEngine
+        engine = EmbeddingEngine.__new__(EmbeddingEngine)
+        engine.model_name = 'fake'
+        engine.max_seq_length = max_seq_length
+        engine.tokenizer = FakeTokenizer()
+        engine.model = FakeModel()
+        engine._lock = threading.Lock()
+        engine.batcher = None
+        engine.cache = EmbeddingCache('fake', max_entries=16) if cache else None
+        return engine
+
+    def test_mean_pooling_ignores_padding(self):
+        embeddings = self.make_engine().embed(['ab abcd', 'abc'])
+        self.assertEqual(embeddings.tolist(), [[3.0, 1.0], [3.0, 1.0]])
+
+    def test_inputs_are_truncated_at_max_seq_length(self):
+        engine = self.make_engine(max_seq_length=2)
+        embeddings = engine.embed(['a ab abcdefghi'])
+        self.assertEqual(engine.tokenizer.max_lengths, [2])
+        self.assertEqual(embeddings.tolist(), [[1.5, 1.0]])
+
+    def test_cached_and_repeated_texts_are_embedded_once(self):
+        engine = self.make_engine(cache=True)
+        engine.embed(['ab', 'abc', 'ab'])
+        engine.embed(['abc'])
+        self.assertEqual(engine.model.batches, [2])
+
+    def test_normalize_returns_unit_vectors(self):
+        embeddings = self.make_engine().embed('abc', normalize=True)
+        self.assertAlmostEqual(float((embeddings ** 2).sum()), 1.0, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# tests/test_inference_engine.py
+import time
+import unittest
+from types import SimpleNamespace
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+VOCAB_SIZE = 16
+EOS = 0
+TOKEN = 5
+BAD_TOKEN = 13
+
+
+class FakeTokenizer:
+    eos_token_id = EOS
+
+    def decode(self, ids, skip_special_tokens=True):
+        return ''.join(chr(ord('a') + i) for i in ids if i != EOS)
+
+
+class FakeModel:
+    """Always predicts TOKEN; fails any forward pass whose input contains BAD_TOKEN."""
+
+    config = SimpleNamespace(max_position_embeddings=128)
+
+    def __init__(self):
+        self.device = torch.device('cpu')
+
+    def __call__(self, input_ids, attention_mask=None, use_cache=True, **kwargs):
+        if BAD_TOKEN in input_ids.flatten().tolist():
+            raise ValueError("bad prompt")
+        batch, length = input_ids.shape
+        total = attention_mask.shape[1] if attention_mask is not None else length
+        kv = torch.zeros((batch, 2, total, 4))
+        logits = torch.zeros((batch, length, VOCAB_SIZE))
+        logits[..., TOKEN] = 100.0
+        return SimpleNamespace(logits=logits, past_key_values=((kv, kv),))
+
+
+@unittest.skipUnless(torch, "torch is not installed")
+class InferenceEngineTest(unittest.TestCase):
+    def setUp(self):
+        from ai_model.inference_engine import InferenceEngine
+        self.engine = InferenceEngine(FakeModel(), FakeTokenizer(), kv_cache_mb=1)
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_failed_prefill_finishes_only_that_request(self):
+        healthy = self.engine.submit([1, 2, 3], max_new_tokens=4, temperature=0)
+        broken = self.engine.submit([1, BAD_TOKEN], max_new_tokens=4, temperature=0)
+
+        with self.assertRaises(ValueError):
+            list(broken)
+        self.assertEqual(''.join(healthy), 'ffff')
+        stats = self.engine.stats()
+        self.assertEqual(stats['free_blocks'], stats['total_blocks'])
+
+    def test_decode_steps_reuse_the_batch_cache(self):
+        from ai_model.inference_engine import PagedKVCache
+        gather = PagedKVCache.gather
+        calls = []
+
+        def counting_gather(cache, block_tables, lengths):
+            calls.append(len(block_tables))
+            return gather(cache, block_tables, lengths)
+
+        PagedKVCache.gather = counting_gather
+        try:
+            self.assertEqual(''.join(self.engine.submit([1, 2, 3], max_new_tokens=8, temperature=0)), 'f' * 8)
+        finally:
+            PagedKVCache.gather = gather
+        # Gathered once when the sequence joins the batch, not once per token
+        self.assertEqual(calls, [1])
+
+    def test_scheduler_yields_between_decode_steps(self):
+        import threading
+        from unittest import mock
+        sleep = time.sleep
+        yields = []
+
+        def recording_sleep(seconds):
+            if threading.current_thread() is self.engine._thread:
+                yields.append(seconds)
+            sleep(seconds)
+
+        with mock.patch('time.sleep', recording_sleep):
+            self.assertEqual(''.join(self.engine.submit([1, 2, 3], max_new_tokens=4, temperature=0)), 'ffff')
+        # One yield per scheduler iteration lets gevent run other greenlets mid-generation
+        self.assertGreaterEqual(yields.count(0), 4)
+
+    def test_call_runs_on_the_scheduler_thread(self):
+        import threading
+        self.assertIs(self.engine.call(threading.current_thread), self.engine._thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
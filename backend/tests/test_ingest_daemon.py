@@ -0,0 +1,121 @@
+# tests/test_ingest_daemon.py
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from cortex.ingest_daemon import REMOVE, UPSERT, IngestDaemon, PollingWatcher, create_watcher
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class FakeRegistry:
+    def sources(self):
+        return []
+
+
+class FakeIngestion:
+    def __init__(self):
+        self.source_registry = FakeRegistry()
+        self.batches = []
+        self.removed = []
+
+    def ingest_batch(self, items):
+        self.batches.append([path for _, path, _ in items])
+        return [{'status': 'ok'} for _ in items]
+
+    def remove_document(self, path):
+        self.removed.append(path)
+
+
+class IngestDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.ki = FakeIngestion()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, name, text='x'):
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_burst_of_events_is_ingested_once(self):
+        daemon = IngestDaemon(self.ki, [self.root], debounce_seconds=0.2, force_polling=True)
+        daemon.start(initial_sync=False)
+        try:
+            path = self.write('notes.txt')
+            for _ in range(5):
+                daemon.on_event(UPSERT, path)
+                time.sleep(0.02)
+            daemon.on_event(UPSERT, self.write('image.bin'))
+            self.assertTrue(wait_for(lambda: self.ki.batches))
+            time.sleep(0.3)
+        finally:
+            daemon.stop()
+        self.assertEqual(self.ki.batches, [[path]])
+
+    def test_removed_file_is_dropped_from_the_store(self):
+        daemon = IngestDaemon(self.ki, [self.root], debounce_seconds=0.05, force_polling=True)
+        daemon.start(initial_sync=False)
+        try:
+            daemon.on_event(REMOVE, os.path.join(self.root, 'gone.txt'))
+            self.assertTrue(wait_for(lambda: self.ki.removed))
+        finally:
+            daemon.stop()
+        self.assertEqual(self.ki.removed, [os.path.join(self.root, 'gone.txt')])
+
+    def test_full_queue_holds_back_the_debouncer(self):
+        daemon = IngestDaemon(self.ki, [self.root], debounce_seconds=0.05, max_queue_size=1)
+        paths = [self.write(f'doc{i}.txt') for i in range(3)]
+        for path in paths:
+            daemon.on_event(UPSERT, path)
+        debouncer = threading.Thread(target=daemon._debounce, daemon=True)
+        debouncer.start()
+        try:
+            self.assertTrue(wait_for(daemon.queue.full))
+            time.sleep(0.2)
+            # Nothing is dropped: the queue stays at its bound and the rest wait their turn
+            self.assertEqual(daemon.metrics()['queue_depth'], 1)
+            received = []
+            while len(received) < 3:
+                received.append(daemon.queue.get(timeout=2)[1])
+            self.assertEqual(sorted(received), sorted(paths))
+        finally:
+            daemon._stop.set()
+            debouncer.join()
+
+
+class PollingWatcherTest(unittest.TestCase):
+    def test_polling_reports_created_modified_and_deleted_files(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.assertIsInstance(create_watcher([root], lambda *event: None, force_polling=True), PollingWatcher)
+            events = []
+            watcher = PollingWatcher([root], lambda action, path: events.append((action, path)), interval=0.05)
+            watcher.start()
+            try:
+                path = os.path.join(root, 'a.txt')
+                with open(path, 'w') as f:
+                    f.write('one')
+                self.assertTrue(wait_for(lambda: (UPSERT, path) in events))
+                events.clear()
+                with open(path, 'a') as f:
+                    f.write(' two')
+                self.assertTrue(wait_for(lambda: (UPSERT, path) in events))
+                os.remove(path)
+                self.assertTrue(wait_for(lambda: (REMOVE, path) in events))
+            finally:
+                watcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# tests/test_lexical_index.py
+import os
+import tempfile
+import unittest
+
+from cortex.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+class BM25IndexTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.index = BM25Index(os.path.join(self._tmp.name, 'lexical.db'))
+
+    def tearDown(self):
+        self.index._conn.close()
+        self._tmp.cleanup()
+
+    def test_compound_tokens_keep_their_parts(self):
+        self.assertEqual(tokenize('Try gpt-4o'), ['try', 'gpt-4o', 'gpt', '4o'])
+
+    def test_rare_term_ranks_its_document_first(self):
+        self.index.add(['a', 'b', 'c'], ['the cat sat', 'the dog sat', 'the ERR_42 crash'])
+        self.assertEqual(self.index.search('err_42 sat', k=3)['id'][0], 'c')
+
+    def test_readding_an_id_replaces_its_postings_and_stats(self):
+        self.index.add(['a', 'b'], ['apple apple pie', 'banana split'])
+        self.index.add(['a'], ['apple apple pie'])
+        self.index.add(['a', 'a'], ['cherry tart', 'cherry'])
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index._stat('total_length'), 3)
+        postings = self.index._conn.execute("SELECT term, tf FROM postings WHERE id = 'a'").fetchall()
+        self.assertEqual(postings, [('cherry', 1)])
+        self.assertEqual(self.index.search('apple')['id'], [])
+
+    def test_delete_removes_documents_from_results_and_stats(self):
+        self.index.add(['a', 'b'], ['red fox', 'red hen'])
+        self.index.delete(['a'])
+        self.assertEqual(self.index.search('red')['id'], ['b'])
+        self.assertEqual((len(self.index), self.index._stat('total_length')), (1, 2))
+
+
+class ReciprocalRankFusionTest(unittest.TestCase):
+    def test_records_found_by_both_searches_rank_first(self):
+        vector = {'id': ['x', 'y'], 'text': ['X', 'Y'], 'metadata': [{}, {}], 'score': [0.9, 0.8]}
+        keyword = {'id': ['y', 'z'], 'text': ['Y', 'Z'], 'metadata': [{}, {}], 'score': [7.0, 3.0]}
+        fused = reciprocal_rank_fusion([vector, keyword], k=3)
+        self.assertEqual(fused['id'][0], 'y')
+        self.assertEqual(set(fused['id']), {'x', 'y', 'z'})
+
+
+if __name__ == '__main__':
+    unittest.main()
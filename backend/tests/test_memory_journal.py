@@ -0,0 +1,86 @@
+# tests/test_memory_journal.py
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from cortex.memory_journal import MemoryJournal, WriteBehindMemory, open_write_behind_memory
+
+
+class RecordingStore:
+    def __init__(self):
+        self.texts = []
+        self.lock = threading.Lock()
+
+    def add(self, text, embedding_function=None, embedding_data=None, metadata=None):
+        with self.lock:
+            self.texts.extend(text)
+
+
+class WriteBehindMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self._tmp.name, 'memory.journal')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_single_turn_reaches_store_without_flush(self):
+        store = RecordingStore()
+        memory = WriteBehindMemory(store, lambda texts: texts, self.journal_path, batch_size=64, flush_interval=0.05)
+        try:
+            memory.append('hello', {'user_id': 'u1'})
+            deadline = time.monotonic() + 2
+            while not store.texts and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(store.texts, ['hello'])
+        finally:
+            memory.close(timeout=2)
+
+    def test_compact_resets_checkpoint_before_truncating(self):
+        journal = MemoryJournal(self.journal_path, fsync=False)
+        try:
+            offset = journal.append({'text': 'a', 'metadata': {}})
+            journal.write_checkpoint(offset)
+            truncate = journal._file.truncate
+
+            def crash(size=None):
+                raise OSError('simulated crash')
+
+            journal._file.truncate = crash
+            with self.assertRaises(OSError):
+                journal.compact()
+            journal._file.truncate = truncate
+            # The journal still holds the record and the checkpoint no longer skips it
+            self.assertEqual(journal.read_checkpoint(), 0)
+            self.assertEqual([record['text'] for record, _ in journal.pending()], ['a'])
+        finally:
+            journal.close()
+
+    def test_writers_are_shared_per_journal_path(self):
+        store = RecordingStore()
+        first = open_write_behind_memory(store, lambda texts: texts, self.journal_path, flush_interval=0.05)
+        second = open_write_behind_memory(store, lambda texts: texts, self.journal_path, flush_interval=0.05)
+        self.assertIs(first, second)
+        first.close(timeout=2)
+        # Still open for the other handle
+        second.append('hello', {})
+        self.assertTrue(second.flush(timeout=2))
+        second.close(timeout=2)
+        self.assertEqual(store.texts, ['hello'])
+        with self.assertRaises(RuntimeError):
+            second.append('late', {})
+
+    def test_second_journal_owner_is_refused(self):
+        journal = MemoryJournal(self.journal_path, fsync=False)
+        try:
+            with self.assertRaises(RuntimeError):
+                MemoryJournal(self.journal_path, fsync=False, lock_timeout=0.1)
+        finally:
+            journal.close()
+        MemoryJournal(self.journal_path, fsync=False, lock_timeout=0.1).close()
+
+
+if __name__ == '__main__':
+    unittest.main()
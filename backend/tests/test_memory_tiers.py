@@ -0,0 +1,152 @@
+# tests/test_memory_tiers.py
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from cortex.memory_consolidation import MemoryConsolidator, search_tiers
+from cortex.search_filter import apply_recency
+from cortex.vector_store import LocalVectorStore
+
+
+def results(ids, scores, vector_scores=None, metadata=None):
+    found = {
+        'id': list(ids),
+        'text': [f'text {record_id}' for record_id in ids],
+        'metadata': metadata or [{} for _ in ids],
+        'score': list(scores),
+    }
+    if vector_scores is not None:
+        found['vector_score'] = list(vector_scores)
+    return found
+
+
+class SearchTiersTest(unittest.TestCase):
+    def run_tiers(self, tier_results, **kwargs):
+        searched = []
+
+        def search(store, k):
+            searched.append(store)
+            return tier_results[store]
+
+        tiers = [(name, name) for name in tier_results]
+        return search_tiers(tiers, search, 2, **kwargs), searched
+
+    def test_hybrid_cutoff_uses_vector_similarity(self):
+        rrf = [1 / 61, 1 / 62]
+        found, searched = self.run_tiers({
+            'hot': results(['h1', 'h2'], rrf, vector_scores=[0.9, 0.8]),
+            'warm': results(['w1'], rrf[:1], vector_scores=[0.95]),
+            'cold': results(['c1'], rrf[:1], vector_scores=[0.95]),
+        }, min_score=0.5, by_tier=True)
+        self.assertEqual(searched, ['hot'])
+        self.assertEqual(found['id'], ['h1', 'h2'])
+
+    def test_keyword_only_hits_do_not_stop_the_cascade(self):
+        rrf = [1 / 61, 1 / 62]
+        _, searched = self.run_tiers({
+            'hot': results(['h1', 'h2'], rrf, vector_scores=[None, 0.1]),
+            'warm': results(['w1'], rrf[:1], vector_scores=[0.9]),
+            'cold': results(['c1'], rrf[:1], vector_scores=[0.9]),
+        }, min_score=0.5, by_tier=True)
+        self.assertEqual(searched, ['hot', 'warm', 'cold'])
+
+    def test_by_tier_keeps_warmer_tiers_first(self):
+        found, _ = self.run_tiers({
+            'hot': results(['h1'], [1 / 62]),
+            'warm': results(['w1'], [1 / 61]),
+        }, min_score=None, by_tier=True)
+        self.assertEqual(found['id'], ['h1', 'w1'])
+
+    def test_archived_originals_of_a_returned_summary_are_dropped(self):
+        found, _ = self.run_tiers({
+            'warm': results(['w1'], [0.7], metadata=[{'archived_ids': ['c1', 'c2']}]),
+            'cold': results(['c1', 'c3'], [0.9, 0.6]),
+        }, min_score=None)
+        self.assertEqual(found['id'], ['w1', 'c3'])
+
+
+class TierRecencyTest(unittest.TestCase):
+    def tiered_results(self):
+        now = datetime.now()
+        return {
+            'id': ['h1', 'h2', 'c1'],
+            'text': ['old hot turn', 'fresh hot turn', 'cold summary'],
+            'metadata': [
+                {'tier': 'hot', 'datetime': (now - timedelta(days=5)).isoformat()},
+                {'tier': 'hot', 'datetime': now.isoformat()},
+                {'tier': 'cold', 'datetime': now.isoformat()},
+            ],
+            'score': [1 / 61, 1 / 62, 1 / 60],
+        }, now
+
+    def test_recency_reorders_only_within_a_tier(self):
+        results, now = self.tiered_results()
+        ranked = apply_recency(results, now=now, group_by='tier')
+        self.assertEqual(ranked['id'], ['h2', 'h1', 'c1'])
+        self.assertEqual([metadata['tier'] for metadata in ranked['metadata']], ['hot', 'hot', 'cold'])
+
+    def test_mixed_tier_search_keeps_hot_ahead_after_recency(self):
+        results, now = self.tiered_results()
+        hot = {key: values[:2] for key, values in results.items()}
+        cold = {key: values[2:] for key, values in results.items()}
+        for tier in (hot, cold):
+            tier['metadata'] = [{k: v for k, v in metadata.items() if k != 'tier'} for metadata in tier['metadata']]
+
+        found = search_tiers([('hot', hot), ('cold', cold)], lambda store, k: store, 3, min_score=None, by_tier=True)
+        ranked = apply_recency(found, now=now, group_by='tier')
+        self.assertEqual([metadata['tier'] for metadata in ranked['metadata']], ['hot', 'hot', 'cold'])
+
+    def test_without_groups_scores_compete_globally(self):
+        results, now = self.tiered_results()
+        ranked = apply_recency(results, now=now)
+        self.assertEqual(ranked['id'][0], 'c1')
+
+
+class MemoryConsolidatorTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.hot, self.warm, self.cold = (
+            LocalVectorStore(f'{self._tmp.name}/{tier}', initial_capacity=8) for tier in ('hot', 'warm', 'cold')
+        )
+        old = datetime(2024, 1, 1)
+        vectors = np.eye(4, dtype=np.float32)
+        self.hot.add(
+            [f'turn {i}' for i in range(4)], embedding=vectors,
+            metadata=[{'datetime': (old + timedelta(minutes=i)).isoformat()} for i in range(4)]
+        )
+        self.consolidator = MemoryConsolidator(self.hot, self.warm, self.cold)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_old_turns_move_to_warm_and_cold(self):
+        self.assertEqual(self.consolidator.consolidate(datetime(2025, 1, 1)), {'turns': 4, 'summaries': 4})
+        self.assertEqual(len(self.hot.records()['id']), 0)
+        self.assertEqual(sorted(self.cold.records()['text']), [f'turn {i}' for i in range(4)])
+        self.assertEqual(len(self.warm.records()['id']), 4)
+
+    def test_rerun_after_interrupted_run_archives_each_turn_once(self):
+        add = self.warm.add
+
+        def crash(*args, **kwargs):
+            raise OSError('simulated crash')
+
+        self.warm.add = crash
+        with self.assertRaises(OSError):
+            self.consolidator.consolidate(datetime(2025, 1, 1))
+        self.warm.add = add
+        # The interrupted run archived the turns but left them in the hot tier
+        self.assertEqual(len(self.cold.records()['id']), 4)
+        self.assertEqual(len(self.hot.records()['id']), 4)
+
+        self.consolidator.consolidate(datetime(2025, 1, 1))
+        self.assertEqual(len(self.hot.records()['id']), 0)
+        self.assertEqual(sorted(self.cold.records()['text']), [f'turn {i}' for i in range(4)])
+        archived = {record_id for metadata in self.warm.records()['metadata'] for record_id in metadata['archived_ids']}
+        self.assertEqual(archived, set(self.cold.records()['id']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# tests/test_model_loader.py
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    import torch
+    import transformers
+except ImportError:
+    torch = None
+
+
+@unittest.skipUnless(torch, "torch and transformers are not installed")
+class ModelLoaderTest(unittest.TestCase):
+    def setUp(self):
+        from ai_model import model_loader
+        from utils.model_registry import ModelRegistry
+        self.loads = []
+        registry = ModelRegistry()
+        patches = [
+            mock.patch.object(model_loader.AutoTokenizer, 'from_pretrained', lambda *args, **kwargs: 'tokenizer'),
+            mock.patch.object(model_loader, 'load_pretrained', self.load_pretrained),
+            mock.patch.object(model_loader, 'get_model_registry', lambda: registry),
+            mock.patch.dict(model_loader.ModelLoader._model_cache, clear=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.ModelLoader = model_loader.ModelLoader
+
+    def load_pretrained(self, model_class, model_name, revision='main', torch_dtype=None):
+        model = object()
+        self.loads.append(model)
+        return model
+
+    def test_model_is_loaded_once_per_name_and_backend(self):
+        _, first = self.ModelLoader.load_base_model('fake/model', backend='torch')
+        _, second = self.ModelLoader.load_base_model('fake/model', backend='torch')
+        self.assertIs(first, second)
+        self.assertEqual(len(self.loads), 1)
+
+    def test_fresh_load_is_a_private_copy(self):
+        _, shared = self.ModelLoader.load_base_model('fake/model', backend='torch')
+        _, private = self.ModelLoader.load_base_model('fake/model', backend='torch', fresh=True)
+        self.assertIsNot(private, shared)
+        # The private copy is neither cached nor handed to later callers
+        _, again = self.ModelLoader.load_base_model('fake/model', backend='torch')
+        self.assertIs(again, shared)
+        self.assertEqual(len(self.loads), 2)
+
+    def test_unknown_backend_falls_back_to_torch(self):
+        _, model = self.ModelLoader.load_base_model('fake/model', backend='tpu')
+        self.assertIs(model, self.loads[0])
+        self.assertIn(('fake/model', 'torch'), self.ModelLoader._model_cache)
+
+
+@unittest.skipUnless(torch, "torch and transformers are not installed")
+class ResolveRevisionTest(unittest.TestCase):
+    def test_local_revision_changes_with_the_files(self):
+        from ai_model.model_loader import resolve_revision
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'config.json'), 'w') as f:
+                f.write('{}')
+            before = resolve_revision(tmp)
+            self.assertEqual(resolve_revision(tmp), before)
+            with open(os.path.join(tmp, 'model.safetensors'), 'wb') as f:
+                f.write(b'weights')
+            self.assertNotEqual(resolve_revision(tmp), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# tests/test_model_registry.py
+import json
+import os
+import struct
+import tempfile
+import threading
+import unittest
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+@unittest.skipUnless(torch, "torch is not installed")
+class ModelRegistryTest(unittest.TestCase):
+    def setUp(self):
+        from utils.model_registry import ModelRegistry
+        self.registry = ModelRegistry()
+        self.loads = []
+
+    def loader(self):
+        self.loads.append(threading.current_thread())
+        return object()
+
+    def test_model_is_loaded_on_first_get_only(self):
+        self.registry.register('base', self.loader)
+        self.assertFalse(self.registry.is_loaded('base'))
+        self.assertEqual(self.loads, [])
+        model = self.registry.get('base')
+        self.assertIs(self.registry.get('base'), model)
+        self.assertEqual(len(self.loads), 1)
+        self.assertTrue(self.registry.stats()['models']['base']['loaded'])
+
+    def test_concurrent_first_gets_share_one_load(self):
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(self.registry.get('base', self.loader))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual(len({id(model) for model in models}), 1)
+
+
+@unittest.skipUnless(torch, "torch is not installed")
+class LoadSafetensorsMmapTest(unittest.TestCase):
+    def test_tensors_match_the_checkpoint(self):
+        from utils.model_registry import load_safetensors_mmap
+        weight = torch.arange(6, dtype=torch.float32).reshape(2, 3)
+        bias = torch.tensor([7, 8], dtype=torch.int64)
+        header = {
+            '__metadata__': {'format': 'pt'},
+            'weight': {'dtype': 'F32', 'shape': [2, 3], 'data_offsets': [0, 24]},
+            'bias': {'dtype': 'I64', 'shape': [2], 'data_offsets': [24, 40]},
+        }
+        encoded = json.dumps(header).encode()
+        # Pad the header so the data section starts 8-byte aligned, as safetensors writers do
+        encoded += b' ' * (-len(encoded) % 8)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.safetensors')
+            with open(path, 'wb') as f:
+                f.write(struct.pack('<Q', len(encoded)) + encoded)
+                f.write(weight.numpy().tobytes() + bias.numpy().tobytes())
+            tensors = load_safetensors_mmap(path)
+            self.assertEqual(set(tensors), {'weight', 'bias'})
+            self.assertTrue(torch.equal(tensors['weight'], weight))
+            self.assertTrue(torch.equal(tensors['bias'], bias))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# tests/test_quantization.py
+import tempfile
+import unittest
+
+import numpy as np
+
+from cortex.quantization import VectorQuantizer
+from cortex.vector_store import LocalVectorStore
+
+
+def unit_rows(rng, count, dim=384):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class VectorQuantizerTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = unit_rows(rng, 2000)
+        self.query = unit_rows(rng, 1)[0]
+        self.exact = self.vectors @ self.query
+
+    def test_int8_scores_track_exact_similarity(self):
+        quantizer = VectorQuantizer('int8')
+        codes = quantizer.encode(self.vectors)
+        self.assertEqual(codes.shape, (2000, quantizer.code_width(384)))
+        approx = quantizer.scores(codes, self.query, block_rows=512)
+        self.assertLess(float(np.abs(approx - self.exact).max()), 0.01)
+        top = set(np.argsort(-self.exact)[:10].tolist())
+        self.assertGreaterEqual(len(top & set(np.argsort(-approx)[:10].tolist())), 9)
+
+    def test_binary_scores_prefer_the_query_itself(self):
+        quantizer = VectorQuantizer('binary')
+        codes = quantizer.encode(self.vectors)
+        self.assertEqual(codes.shape, (2000, 48))
+        self.assertEqual(int(np.argmax(quantizer.scores(codes, self.vectors[7]))), 7)
+
+
+class QuantizedStoreTest(unittest.TestCase):
+    def test_quantized_search_returns_the_exact_neighbour(self):
+        rng = np.random.default_rng(1)
+        vectors = unit_rows(rng, 300, dim=32)
+        with tempfile.TemporaryDirectory() as tmp:
+            for kind in ('int8', 'binary'):
+                store = LocalVectorStore(f'{tmp}/{kind}', quantization=kind, rerank_factor=5)
+                ids = store.add([str(i) for i in range(300)], embedding=vectors)
+                found = store.search(embedding=vectors[42], k=3)
+                self.assertEqual(found['id'][0], ids[42])
+                self.assertAlmostEqual(found['score'][0], 1.0, places=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# tests/test_search_filter.py
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from cortex.search_filter import SearchFilter, filter_columns, to_timestamp
+from cortex.vector_store import LocalVectorStore
+
+RECORDS = [
+    {'datetime': '2024-01-01T10:00:00', 'category': 'conversation', 'source': 'chat'},
+    {'datetime': '2024-02-01T10:00:00', 'category': 'document', 'source': 'notes.txt'},
+    {'datetime': '2024-03-01T10:00:00', 'category': 'conversation', 'source': 'chat'},
+    {'category': 'conversation'},
+]
+
+
+class SearchFilterTest(unittest.TestCase):
+    def test_timestamps_accept_iso_strings_datetimes_and_epochs(self):
+        moment = datetime(2024, 1, 1, 10)
+        self.assertEqual(to_timestamp('2024-01-01T10:00:00'), moment.timestamp())
+        self.assertEqual(to_timestamp(moment), moment.timestamp())
+        self.assertEqual(to_timestamp(12.5), 12.5)
+        self.assertIsNone(to_timestamp('yesterday'))
+
+    def test_sql_and_matches_select_the_same_records(self):
+        filters = [
+            SearchFilter(),
+            SearchFilter(category='conversation'),
+            SearchFilter(start='2024-01-15T00:00:00'),
+            SearchFilter(start=datetime(2024, 1, 1), end='2024-02-15T00:00:00', source='chat'),
+        ]
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE records (i INTEGER, ts REAL, category TEXT, source TEXT)")
+        conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?)",
+                         [(i, *filter_columns(metadata)) for i, metadata in enumerate(RECORDS)])
+        for search_filter in filters:
+            where, params = search_filter.sql()
+            selected = [i for (i,) in conn.execute(f"SELECT i FROM records WHERE {where} ORDER BY i", params)]
+            self.assertEqual(selected, [i for i, metadata in enumerate(RECORDS) if search_filter.matches(metadata)])
+        self.assertEqual(SearchFilter(start='2024-01-15T00:00:00').matches(RECORDS[3]), False)
+
+    def test_store_search_only_returns_matching_records(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = LocalVectorStore(tmp)
+            vectors = np.random.default_rng(0).standard_normal((len(RECORDS), 8)).astype(np.float32)
+            store.add([f'record {i}' for i in range(len(RECORDS))], embedding=vectors, metadata=RECORDS)
+            found = store.search(embedding=vectors[1], k=4, filter=SearchFilter(category='conversation', source='chat'))
+            self.assertEqual(sorted(found['text']), ['record 0', 'record 2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# tests/test_source_registry.py
+import os
+import tempfile
+import unittest
+
+from cortex.chunking import Chunk
+from cortex.source_registry import SourceRegistry, content_hash, diff_chunks
+
+
+def chunks(*texts):
+    return [Chunk(text, i, 0, len(text), 1) for i, text in enumerate(texts)]
+
+
+class SourceRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.registry = SourceRegistry(os.path.join(self._tmp.name, 'sources.db'))
+        self.path = os.path.join(self._tmp.name, 'doc.txt')
+        with open(self.path, 'w') as f:
+            f.write('first version')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_unchanged_file_is_detected_until_it_is_rewritten(self):
+        self.assertFalse(self.registry.is_unchanged_on_disk(self.path))
+        self.registry.record(self.path, content_hash('first version'), [('h0', 'r0', 0)])
+        self.assertTrue(self.registry.is_unchanged_on_disk(self.path))
+        with open(self.path, 'w') as f:
+            f.write('second, longer version')
+        self.assertFalse(self.registry.is_unchanged_on_disk(self.path))
+        self.registry.touch(self.path)
+        self.assertTrue(self.registry.is_unchanged_on_disk(self.path))
+
+    def test_record_replaces_chunks_and_remove_returns_their_ids(self):
+        self.registry.record(self.path, 'a', [('h0', 'r0', 0), ('h1', 'r1', 1)])
+        self.registry.record(self.path, 'b', [('h1', 'r1', 0)])
+        self.assertEqual(self.registry.get_chunks(self.path), [('h1', 'r1', 0)])
+        self.assertEqual(list(self.registry.sources()), [os.path.abspath(self.path)])
+        self.assertEqual(self.registry.remove(self.path), ['r1'])
+        self.assertIsNone(self.registry.get(self.path))
+
+
+class DiffChunksTest(unittest.TestCase):
+    def test_only_changed_chunks_are_embedded_again(self):
+        previous = [(content_hash(text), f'r{i}', i) for i, text in enumerate(['intro', 'body', 'outro'])]
+        diff = diff_chunks(previous, chunks('intro', 'new body', 'outro'))
+        self.assertEqual([chunk.text for chunk, _ in diff.new], ['new body'])
+        self.assertEqual([record_id for _, record_id, _ in diff.kept], ['r0', 'r2'])
+        self.assertEqual(diff.stale_ids, ['r1'])
+
+    def test_repeated_chunks_each_keep_one_record(self):
+        previous = [(content_hash('same'), 'r0', 0), (content_hash('same'), 'r1', 1)]
+        diff = diff_chunks(previous, chunks('same'))
+        self.assertEqual(len(diff.kept), 1)
+        self.assertEqual(len(diff.stale_ids), 1)
+        self.assertEqual(diff.new, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# tests/test_streaming.py
+import unittest
+
+try:
+    from ai_model.integrations_manager import AIAssistant
+except ImportError:
+    AIAssistant = None
+
+
+class RecordingContext:
+    def __init__(self):
+        self.history = []
+
+    def update_history(self, user_input, response):
+        self.history.append((user_input, response))
+
+
+class UpperCaseBehavior:
+    def apply_preferences(self, response):
+        return response.upper()
+
+
+@unittest.skipUnless(AIAssistant, "the model serving dependencies are not installed")
+class StreamResponseTest(unittest.TestCase):
+    def make_assistant(self, chunks):
+        # Built without __init__, which loads the user's model and memory stores
+        assistant = AIAssistant.__new__(AIAssistant)
+        assistant.user_id = 'u1'
+        assistant.context_manager = RecordingContext()
+        assistant.behavior_model = UpperCaseBehavior()
+        assistant.stream_ai_response = lambda user_input: iter(chunks)
+        return assistant
+
+    def test_chunks_are_yielded_as_generated_and_the_full_reply_enters_the_history(self):
+        assistant = self.make_assistant(['Hel', 'lo', '!'])
+        stream = assistant.stream_response('hi')
+        self.assertEqual(next(stream), 'Hel')
+        # Nothing is recorded until the reply is complete
+        self.assertEqual(assistant.context_manager.history, [])
+        self.assertEqual(list(stream), ['lo', '!'])
+        self.assertEqual(assistant.context_manager.history, [('hi', 'HELLO!')])
+
+    def test_generate_response_joins_the_stream(self):
+        assistant = self.make_assistant(['Hel', 'lo'])
+        self.assertEqual(assistant.generate_response('hi'), 'HELLO')
+        self.assertEqual(assistant.context_manager.history, [('hi', 'HELLO')])
+
+    def test_generation_errors_end_the_stream_with_an_apology(self):
+        assistant = AIAssistant.__new__(AIAssistant)
+
+        def broken_prompt(user_input):
+            raise RuntimeError('no memory store')
+
+        assistant.build_prompt = broken_prompt
+        chunks = list(assistant.stream_ai_response('hi'))
+        self.assertEqual(len(chunks), 1)
+        self.assertIn("unable to process your request", chunks[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
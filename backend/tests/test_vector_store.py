@@ -0,0 +1,84 @@
+# tests/test_vector_store.py
+import multiprocessing
+import tempfile
+import unittest
+
+import numpy as np
+
+from cortex.vector_store import LocalVectorStore, create_vector_store
+
+
+def unit(rng, dim=8):
+    vector = rng.standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def add_from_process(path, seed, count):
+    store = LocalVectorStore(path, initial_capacity=4)
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        store.add([f'{seed}-{i}'], embedding=unit(rng)[None, :])
+
+
+class LocalVectorStoreSharingTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = f'{self._tmp.name}/store'
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_create_vector_store_shares_one_instance_per_path(self):
+        first = create_vector_store(self.path, backend='local', lexical=False)
+        second = create_vector_store(self.path, backend='local', lexical=False)
+        self.assertIs(first, second)
+
+    def test_two_instances_on_one_path_do_not_overwrite_rows(self):
+        # Separate instances stand in for separate processes writing the same store
+        first = LocalVectorStore(self.path, initial_capacity=4)
+        second = LocalVectorStore(self.path, initial_capacity=4)
+        a, b, c = unit(self.rng), unit(self.rng), unit(self.rng)
+
+        [id_a] = first.add(['a'], embedding=a[None, :])
+        [id_b] = second.add(['b'], embedding=b[None, :])
+        [id_c] = first.add(['c'], embedding=c[None, :])
+
+        for store in (first, second):
+            self.assertEqual(len(store), 3)
+            for record_id, vector in ((id_a, a), (id_b, b), (id_c, c)):
+                results = store.search(embedding=vector, k=1)
+                self.assertEqual(results['id'], [record_id])
+                self.assertGreater(results['score'][0], 0.999)
+
+    def test_delete_in_one_instance_is_seen_by_another(self):
+        first = LocalVectorStore(self.path)
+        second = LocalVectorStore(self.path)
+        vector = unit(self.rng)
+        [record_id] = first.add(['a'], embedding=vector[None, :])
+        self.assertEqual(second.search(embedding=vector, k=1)['id'], [record_id])
+        first.delete([record_id])
+        self.assertEqual(second.search(embedding=vector, k=1)['id'], [])
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), "needs the fork start method")
+    def test_concurrent_writer_processes_keep_every_row(self):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=add_from_process, args=(self.path, seed, 20)) for seed in (1, 2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            self.assertEqual(worker.exitcode, 0)
+
+        store = LocalVectorStore(self.path)
+        self.assertEqual(len(store), 40)
+        for seed in (1, 2):
+            rng = np.random.default_rng(seed)
+            for i in range(20):
+                results = store.search(embedding=unit(rng), k=1)
+                self.assertEqual(results['text'], [f'{seed}-{i}'])
+                self.assertGreater(results['score'][0], 0.999)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+# utils/model_registry.py
+import glob
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+import torch
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+handler = logging.FileHandler('logs/model_registry.log')
+formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+# Map safetensors checkpoints into memory instead of reading them into private buffers
+MODEL_MMAP = os.getenv('MODEL_MMAP', 'true').lower() == 'true'
+
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+
+def resident_bytes():
+    """Resident set size of this process."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def load_safetensors_mmap(path):
+    """
+    Tensors of a safetensors file as views of one private memory mapping of the file.
+
+    Nothing is read up front: pages are faulted in on first access and, being clean file
+    pages, are shared through the page cache by every process that maps the same file.
+    """
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    data_start = 8 + header_size
+    nbytes = os.path.getsize(path)
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=nbytes)
+    data = torch.empty(0, dtype=torch.uint8).set_(storage)
+    tensors = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = SAFETENSORS_DTYPES[info['dtype']]
+        start, end = (data_start + offset for offset in info['data_offsets'])
+        chunk = data[start:end]
+        if start % torch.empty(0, dtype=dtype).element_size():
+            # Unaligned tensors cannot be viewed in place; copy just this one
+            chunk = chunk.clone()
+        tensors[name] = chunk.view(dtype).reshape(info['shape'])
+    return tensors
+
+
+def _checkpoint_dir(model_name, revision):
+    if os.path.isdir(model_name):
+        return model_name
+    from huggingface_hub import snapshot_download
+    return snapshot_download(model_name, revision=revision, allow_patterns=['*.json', '*.safetensors', '*.txt', '*.model'])
+
+
+def load_pretrained_mmap(model_class, model_name, revision='main', torch_dtype=None):
+    """
+    Builds model_class with memory-mapped safetensors weights.
+
+    Parameters are created on the meta device (buffers stay real), then the mapped tensors
+    are assigned in place with load_state_dict(assign=True), so no weight is allocated
+    or copied unless torch_dtype differs from the checkpoint's. Falls back to
+    from_pretrained for checkpoints without safetensors files.
+    """
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig
+
+    path = _checkpoint_dir(model_name, revision)
+    files = sorted(glob.glob(os.path.join(path, '*.safetensors')))
+    if not files:
+        logger.info(f"No safetensors weights for '{model_name}'; loading with from_pretrained.")
+        return model_class.from_pretrained(model_name, revision=revision, torch_dtype=torch_dtype)
+
+    config = AutoConfig.from_pretrained(path)
+    with init_empty_weights(include_buffers=False):
+        model = model_class.from_config(config)
+    state_dict = {}
+    for file in files:
+        state_dict.update(load_safetensors_mmap(file))
+    if torch_dtype is not None:
+        state_dict = {
+            name: tensor.to(torch_dtype) if tensor.is_floating_point() else tensor
+            for name, tensor in state_dict.items()
+        }
+    # Checkpoints may or may not carry the base model prefix (e.g. 'transformer.')
+    expected = set(model.state_dict())
+    prefix = f"{getattr(model, 'base_model_prefix', '')}."
+    renamed = {}
+    for name, tensor in state_dict.items():
+        if name not in expected and prefix + name in expected:
+            name = prefix + name
+        elif name not in expected and name.startswith(prefix) and name[len(prefix):] in expected:
+            name = name[len(prefix):]
+        renamed[name] = tensor
+    model.load_state_dict(renamed, strict=False, assign=True)
+    model.tie_weights()
+    missing = [name for name, param in model.named_parameters() if param.is_meta]
+    if missing:
+        raise ValueError(f"Checkpoint for '{model_name}' is missing weights: {missing[:5]}")
+    model.eval()
+    return model
+
+
+def load_pretrained(model_class, model_name, revision='main', torch_dtype=None):
+    """Loads with load_pretrained_mmap when MODEL_MMAP is on, falling back to from_pretrained."""
+    if MODEL_MMAP:
+        try:
+            return load_pretrained_mmap(model_class, model_name, revision=revision, torch_dtype=torch_dtype)
+        except Exception as e:
+            logger.warning(f"Memory-mapped load of '{model_name}' failed, loading normally: {e}")
+    return model_class.from_pretrained(model_name, revision=revision, torch_dtype=torch_dtype)
+
+
+class _Record:
+    def __init__(self, loader):
+        self.loader = loader
+        self.model = None
+        self.lock = threading.Lock()
+        self.load_seconds = None
+        self.resident_delta = None
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of lazily loaded models.
+
+    Models are registered with a loader and only built on their first get(), so a worker
+    starts without loading any weights and never loads models it does not serve. Each load
+    is timed and the process's resident size is sampled around it; with memory-mapped
+    weights the delta only counts the pages actually touched.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            if name not in self._records:
+                self._records[name] = _Record(loader)
+
+    def get(self, name, loader=None):
+        """Returns the model registered as name, loading it on first use; loader registers it if needed."""
+        if loader is not None:
+            self.register(name, loader)
+        record = self._records[name]
+        if record.model is None:
+            with record.lock:
+                if record.model is None:
+                    rss_before = resident_bytes()
+                    started = time.perf_counter()
+                    record.model = record.loader()
+                    record.load_seconds = time.perf_counter() - started
+                    record.resident_delta = resident_bytes() - rss_before
+                    logger.info(
+                        f"Loaded model '{name}' in {record.load_seconds:.1f}s "
+                        f"(+{record.resident_delta / 2 ** 20:.0f} MiB resident)."
+                    )
+        return record.model
+
+    def is_loaded(self, name):
+        record = self._records.get(name)
+        return record is not None and record.model is not None
+
+    def stats(self):
+        with self._lock:
+            records = dict(self._records)
+        return {
+            'resident_bytes': resident_bytes(),
+            'models': {
+                name: {
+                    'loaded': record.model is not None,
+                    'load_seconds': record.load_seconds,
+                    'resident_delta_bytes': record.resident_delta,
+                }
+                for name, record in records.items()
+            },
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry